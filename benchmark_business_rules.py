@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Benchmark business rule extraction on typical, long and adversarial texts.
+
+Compares the compiled, sentence-level BusinessRuleMatcher with the
+previous extraction loop (one re.finditer per pattern over the whole
+text) and writes timings and match counts to a JSON report. The
+adversarial texts target the (.+?) patterns, whose unanchored search is
+quadratic in the input length when no match exists.
+
+Usage:
+    python benchmark_business_rules.py [--typical 2000] [--long-sentences 50 200 1000]
+                                       [--adversarial-chars 2000 10000 50000]
+                                       [--output business_rules_report.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from src.jama_mcp_server.nlp_processor import BusinessRuleMatcher, BusinessRuleType, NLPProcessor
+
+REPORT_FORMAT = 1
+
+# Requirement sentences in the style of the mortgage projects the patterns were written for
+SENTENCE_TEMPLATES = [
+    "If the applicant's credit score is below {n} then the application shall be referred for manual review.",
+    "The system must not approve loans whose debt-to-income ratio exceeds {n} percent.",
+    "When the appraisal is received, the underwriter shall update the loan-to-value ratio.",
+    "The monthly payment is calculated as principal times rate divided by {n}.",
+    "The interest rate of the loan is fixed for the first {n} months.",
+    "Validate that the borrower's income documentation covers at least {n} months.",
+    "Provided that the down payment is at least {n} percent, mortgage insurance is not required.",
+    "According to policy {n} the lender requires two forms of identification.",
+    "The loan officer should be verified before the closing date.",
+    "Users can export the pipeline report to a spreadsheet with {n} columns.",
+    "The dashboard displays the number of open applications per branch.",
+    "In case of a rate lock expiry, the borrower may request an extension of {n} days.",
+]
+
+# (name, builder of a text of roughly the given length) for inputs that defeat naive backtracking
+ADVERSARIAL: List[Tuple[str, Callable[[int], str]]] = [
+    ("lazy_prefix_trailing_equals", lambda chars: "a " * (chars // 2) + "="),
+    ("lazy_prefix_trailing_must_be", lambda chars: "x " * (chars // 2 - 4) + "must be"),
+    ("repeated_if_without_then", lambda chars: "if x " * (chars // 5)),
+    ("repeated_when_without_comma", lambda chars: "when " * (chars // 5)),
+    ("unpunctuated_keywords", lambda chars: ("calculate the rate using " * (chars // 25 + 1))[:chars]),
+]
+
+
+def legacy_matches(patterns: Dict[BusinessRuleType, List[Dict]], text: str) -> int:
+    """Number of matches of the previous extraction loop: every pattern searched over the whole text."""
+    count = 0
+    for pattern_infos in patterns.values():
+        for pattern_info in pattern_infos:
+            for _ in re.finditer(pattern_info["pattern"], text):
+                count += 1
+    return count
+
+
+def compiled_matches(matcher: BusinessRuleMatcher, text: str) -> int:
+    return sum(1 for _ in matcher.matches(text))
+
+
+def sentences(rng: np.random.Generator, count: int) -> List[str]:
+    picks = rng.integers(len(SENTENCE_TEMPLATES), size=count)
+    return [SENTENCE_TEMPLATES[pick].format(n=int(rng.integers(1, 1000))) for pick in picks]
+
+
+def time_texts(function: Callable[[str], int], texts: List[str], repeat: int) -> Tuple[float, int]:
+    """Best total seconds over repeat passes through texts, and the match count."""
+    best = float("inf")
+    matches = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        matches = sum(function(text) for text in texts)
+        best = min(best, time.perf_counter() - started)
+    return best, matches
+
+
+def run_case(
+    name: str,
+    texts: List[str],
+    patterns: Dict[BusinessRuleType, List[Dict]],
+    matcher: BusinessRuleMatcher,
+    args: argparse.Namespace
+) -> Dict[str, Any]:
+    chars = sum(len(text) for text in texts)
+    result: Dict[str, Any] = {"case": name, "texts": len(texts), "chars": chars}
+
+    repeat = args.repeat if chars <= args.legacy_max_chars else 1
+    seconds, matches = time_texts(lambda text: compiled_matches(matcher, text), texts, repeat)
+    result["compiled"] = {"seconds": round(seconds, 6), "matches": matches}
+
+    if max(len(text) for text in texts) > args.legacy_max_chars:
+        result["legacy"] = None  # Quadratic; would dominate the run
+    else:
+        seconds, matches = time_texts(lambda text: legacy_matches(patterns, text), texts, repeat)
+        result["legacy"] = {"seconds": round(seconds, 6), "matches": matches}
+        if result["compiled"]["seconds"] > 0:
+            result["speedup"] = round(result["legacy"]["seconds"] / result["compiled"]["seconds"], 2)
+    return result
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def print_case(result: Dict[str, Any]) -> None:
+    legacy = result["legacy"]
+    legacy_text = (
+        f"legacy {legacy['seconds'] * 1000:10.2f} ms ({legacy['matches']:>6} matches)"
+        if legacy is not None else "legacy        skipped"
+    )
+    speedup = f" | {result['speedup']:>8.1f}x" if "speedup" in result else ""
+    print(
+        f"📊 {result['case']:<34} {result['chars']:>10,} chars | "
+        f"compiled {result['compiled']['seconds'] * 1000:10.2f} ms ({result['compiled']['matches']:>6} matches) | "
+        f"{legacy_text}{speedup}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark business rule extraction")
+    parser.add_argument("--typical", type=int, default=2000, help="Short requirement texts (1-3 sentences)")
+    parser.add_argument("--long-sentences", type=int, nargs="+", default=[50, 200, 1000],
+                        help="Sentences per long description")
+    parser.add_argument("--adversarial-chars", type=int, nargs="+", default=[2000, 10000, 50000])
+    parser.add_argument("--legacy-max-chars", type=int, default=20000,
+                        help="Longest text the legacy matcher is timed on")
+    parser.add_argument("--max-sentence-chars", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="business_rules_report.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    processor = NLPProcessor()
+    patterns = processor.business_rule_patterns
+    matcher = BusinessRuleMatcher(patterns, max_sentence_chars=args.max_sentence_chars)
+    rng = np.random.default_rng(args.seed)
+
+    report = {
+        "format": REPORT_FORMAT,
+        "generated_at": datetime.now().isoformat(),
+        "environment": environment(),
+        "parameters": {
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "max_sentence_chars": args.max_sentence_chars,
+            "legacy_max_chars": args.legacy_max_chars,
+        },
+        "results": [],
+    }
+
+    print("🏁 Benchmarking business rule extraction\n")
+    cases = [("typical", [" ".join(sentences(rng, int(rng.integers(1, 4)))) for _ in range(args.typical)])]
+    for count in args.long_sentences:
+        cases.append((f"long_{count}_sentences", [" ".join(sentences(rng, count))]))
+    for chars in args.adversarial_chars:
+        for name, build in ADVERSARIAL:
+            cases.append((f"{name}_{chars}", [build(chars)]))
+
+    for name, texts in cases:
+        result = run_case(name, texts, patterns, matcher, args)
+        report["results"].append(result)
+        print_case(result)
+
+    processor.executor.shutdown(wait=False)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vector store backends as the corpus grows.
+
+For every backend and corpus size this measures ingest throughput,
+unfiltered and filtered query latency (p50/p95/p99), recall@k against
+exact search, resident memory and on-disk size, and writes everything to
+a JSON report. Each run happens in its own process so memory figures are
+not polluted by earlier runs.
+
+The corpus is synthetic: clustered, unit-length embeddings with
+requirement-like metadata (skewed requirement types, Zipf-distributed
+projects, priorities and statuses). It is generated in deterministic
+chunks, so multi-million vector corpora never have to fit in memory and
+every backend sees exactly the same data.
+
+Usage:
+    python benchmark_vector_backends.py [--backends memory faiss-flat faiss-ivf chroma]
+                                        [--sizes 10000 100000 1000000 5000000]
+                                        [--output benchmark_report.json]
+                                        [--baseline previous_report.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.jama_mcp_server.vector_store import (
+    CHROMADB_AVAILABLE, FAISS_AVAILABLE, VectorDocument, VectorStoreConfig,
+    VectorStoreManager, VectorStoreType
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORT_FORMAT = 1
+
+REQUIREMENT_TYPES = ["functional", "non_functional", "business_rule", "constraint",
+                     "interface", "quality", "security", "performance"]
+REQUIREMENT_TYPE_WEIGHTS = [0.40, 0.12, 0.15, 0.08, 0.08, 0.07, 0.05, 0.05]
+PRIORITIES = ["high", "medium", "low"]
+PRIORITY_WEIGHTS = [0.2, 0.5, 0.3]
+STATUSES = ["draft", "approved", "implemented", "obsolete"]
+STATUS_WEIGHTS = [0.25, 0.45, 0.25, 0.05]
+NUM_PROJECTS = 50
+PROJECT_WEIGHTS = 1 / np.arange(1, NUM_PROJECTS + 1)
+PROJECT_WEIGHTS /= PROJECT_WEIGHTS.sum()
+NUM_CLUSTERS = 256
+
+# Store configuration per backend name
+BACKENDS: Dict[str, Dict[str, Any]] = {
+    "memory": {"store_type": VectorStoreType.MEMORY},
+    "faiss-flat": {"store_type": VectorStoreType.FAISS, "faiss_index_type": "Flat", "faiss_metric": "IP"},
+    "faiss-ivf": {"store_type": VectorStoreType.FAISS, "faiss_index_type": "IVF", "faiss_metric": "IP"},
+    "faiss-hnsw": {"store_type": VectorStoreType.FAISS, "faiss_index_type": "HNSW", "faiss_metric": "IP"},
+    "segmented": {"store_type": VectorStoreType.SEGMENTED},
+    "chroma": {"store_type": VectorStoreType.CHROMADB, "chroma_hnsw_space": "cosine"},
+}
+
+# (name, store filter, vectorized matcher over a chunk's metadata columns)
+FILTERS: List[Tuple[str, Dict[str, Any], Callable[[Dict[str, np.ndarray]], np.ndarray]]] = [
+    ("top_project", {"project_id": 1}, lambda columns: columns["project_id"] == 1),
+    ("security", {"requirement_type": "security"},
+     lambda columns: columns["requirement_type"] == REQUIREMENT_TYPES.index("security")),
+    ("functional_or_performance_high",
+     {"requirement_type": ["functional", "performance"], "priority": "high"},
+     lambda columns: np.isin(columns["requirement_type"], [REQUIREMENT_TYPES.index("functional"),
+                                                           REQUIREMENT_TYPES.index("performance")])
+     & (columns["priority"] == PRIORITIES.index("high"))),
+]
+
+
+def backend_available(backend: str) -> bool:
+    store_type = BACKENDS[backend]["store_type"]
+    if store_type in (VectorStoreType.FAISS, VectorStoreType.SEGMENTED):
+        return FAISS_AVAILABLE
+    if store_type == VectorStoreType.CHROMADB:
+        return CHROMADB_AVAILABLE
+    return True
+
+
+def centroids(seed: int, dimension: int) -> np.ndarray:
+    """Cluster centres shared by the corpus and the queries."""
+    rng = np.random.default_rng([seed, 0])
+    centres = rng.standard_normal((NUM_CLUSTERS, dimension)).astype(np.float32)
+    return centres / np.linalg.norm(centres, axis=1, keepdims=True)
+
+
+def clustered_vectors(rng: np.random.Generator, centres: np.ndarray, count: int, spread: float) -> np.ndarray:
+    """Unit vectors scattered around randomly chosen cluster centres."""
+    clusters = rng.integers(0, len(centres), count)
+    noise = rng.standard_normal((count, centres.shape[1])).astype(np.float32)
+    vectors = centres[clusters] + spread * noise / np.sqrt(centres.shape[1])
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def corpus_chunk(seed: int, start: int, count: int, centres: np.ndarray) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Vectors and metadata columns of rows [start, start + count), identical on every call."""
+    rng = np.random.default_rng([seed, 1, start])
+    vectors = clustered_vectors(rng, centres, count, spread=1.0)
+    columns = {
+        "requirement_type": rng.choice(len(REQUIREMENT_TYPES), count, p=REQUIREMENT_TYPE_WEIGHTS),
+        "project_id": rng.choice(NUM_PROJECTS, count, p=PROJECT_WEIGHTS) + 1,
+        "priority": rng.choice(len(PRIORITIES), count, p=PRIORITY_WEIGHTS),
+        "status": rng.choice(len(STATUSES), count, p=STATUS_WEIGHTS),
+    }
+    return vectors, columns
+
+
+def chunk_documents(start: int, vectors: np.ndarray, columns: Dict[str, np.ndarray]) -> List[VectorDocument]:
+    documents = []
+    for offset, vector in enumerate(vectors):
+        row = start + offset
+        requirement_type = REQUIREMENT_TYPES[columns["requirement_type"][offset]]
+        documents.append(VectorDocument(
+            id=f"REQ-{row}",
+            content=f"The system shall satisfy {requirement_type} requirement {row}.",
+            metadata={
+                "requirement_type": requirement_type,
+                "project_id": int(columns["project_id"][offset]),
+                "priority": PRIORITIES[columns["priority"][offset]],
+                "status": STATUSES[columns["status"][offset]],
+            },
+            embedding=vector
+        ))
+    return documents
+
+
+def queries(seed: int, count: int, centres: np.ndarray) -> np.ndarray:
+    return clustered_vectors(np.random.default_rng([seed, 2]), centres, count, spread=1.0)
+
+
+def exact_neighbours(args: argparse.Namespace, size: int, centres: np.ndarray, query_matrix: np.ndarray) -> Dict[str, np.ndarray]:
+    """Exact top-k row numbers per query, unfiltered and for each filter, streamed over the corpus."""
+    k = args.k
+    names = ["unfiltered"] + [name for name, _, _ in FILTERS]
+    best_scores = {name: np.full((len(query_matrix), k), -np.inf, dtype=np.float32) for name in names}
+    best_rows = {name: np.full((len(query_matrix), k), -1, dtype=np.int64) for name in names}
+
+    for start in range(0, size, args.batch_size):
+        count = min(args.batch_size, size - start)
+        vectors, columns = corpus_chunk(args.seed, start, count, centres)
+        scores = query_matrix @ vectors.T
+        masks = [("unfiltered", None)] + [(name, matcher(columns)) for name, _, matcher in FILTERS]
+        for name, mask in masks:
+            chunk_scores = scores if mask is None else np.where(mask, scores, -np.inf)
+            merged_scores = np.concatenate([best_scores[name], chunk_scores], axis=1)
+            merged_rows = np.concatenate(
+                [best_rows[name], np.broadcast_to(np.arange(start, start + count), chunk_scores.shape)], axis=1
+            )
+            top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores[name] = np.take_along_axis(merged_scores, top, axis=1)
+            best_rows[name] = np.take_along_axis(merged_rows, top, axis=1)
+
+    # Rows padding out filters with fewer than k matches are -1
+    return {name: np.where(np.isfinite(best_scores[name]), best_rows[name], -1) for name in names}
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, where the platform exposes it."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB on Linux
+
+
+def directory_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None}
+    values = np.percentile(samples, [50, 95, 99])
+    return {"p50": round(float(values[0]), 3), "p95": round(float(values[1]), 3), "p99": round(float(values[2]), 3)}
+
+
+def recall(results: List[List[str]], truth: np.ndarray) -> Optional[float]:
+    """Mean fraction of each query's exact neighbours that were returned."""
+    recalls = []
+    for ids, rows in zip(results, truth):
+        expected = {f"REQ-{row}" for row in rows if row >= 0}
+        if expected:
+            recalls.append(len(expected.intersection(ids)) / len(expected))
+    return round(float(np.mean(recalls)), 4) if recalls else None
+
+
+async def settle(store) -> None:
+    """Wait for background index training, compaction or merging to finish."""
+    if hasattr(store, "checkpoint"):
+        await store.checkpoint()
+    merge_task = getattr(store, "_merge_task", None)
+    if merge_task is not None:
+        await merge_task
+
+
+async def run_backend(args: argparse.Namespace, backend: str, size: int) -> Dict[str, Any]:
+    """Ingest, query and measure one backend at one corpus size (in this process)."""
+    centres = centroids(args.seed, args.dimension)
+    truth = np.load(os.path.join(args.workdir, f"truth-{size}.npz"))
+    query_matrix = truth["queries"]
+
+    persist_directory = os.path.join(args.workdir, f"{backend}-{size}")
+    shutil.rmtree(persist_directory, ignore_errors=True)
+    config = VectorStoreConfig(
+        persist_directory=persist_directory,
+        collection_name="benchmark",
+        embedding_dimension=args.dimension,
+        similarity_threshold=-1.0,  # Rank only; thresholds would distort recall
+        max_results=args.k,
+        faiss_wal_fsync=False,
+        **BACKENDS[backend]
+    )
+
+    rss_before = rss_bytes()
+    store = VectorStoreManager.create_store(config)
+    await store.initialize()
+
+    ingest_seconds = 0.0
+    for start in range(0, size, args.batch_size):
+        count = min(args.batch_size, size - start)
+        documents = chunk_documents(start, *corpus_chunk(args.seed, start, count, centres))
+        started = time.perf_counter()
+        await store.add_documents(documents)
+        ingest_seconds += time.perf_counter() - started
+    started = time.perf_counter()
+    await settle(store)
+    settle_seconds = time.perf_counter() - started
+    rss_after = rss_bytes()
+
+    # Warm caches and lazily built structures before timing
+    for query in query_matrix[:min(5, len(query_matrix))]:
+        await store.search(query, limit=args.k)
+
+    latencies: Dict[str, List[float]] = {"unfiltered": [], "filtered": []}
+    results: Dict[str, List[List[str]]] = {"unfiltered": []}
+    for query in query_matrix:
+        started = time.perf_counter()
+        hits = await store.search(query, limit=args.k)
+        latencies["unfiltered"].append((time.perf_counter() - started) * 1000)
+        results["unfiltered"].append([hit.document.id for hit in hits])
+
+    for name, filter_metadata, _ in FILTERS:
+        results[name] = []
+        for query in query_matrix:
+            started = time.perf_counter()
+            hits = await store.search(query, limit=args.k, filter_metadata=filter_metadata)
+            latencies["filtered"].append((time.perf_counter() - started) * 1000)
+            results[name].append([hit.document.id for hit in hits])
+
+    await store.close()
+
+    return {
+        "backend": backend,
+        "size": size,
+        "ingest_seconds": round(ingest_seconds, 3),
+        "ingest_docs_per_second": round(size / ingest_seconds, 1) if ingest_seconds else None,
+        "settle_seconds": round(settle_seconds, 3),
+        "latency_ms": {kind: percentiles(samples) for kind, samples in latencies.items()},
+        "recall_at_k": {name: recall(results[name], truth[name]) for name in results},
+        "rss_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "disk_bytes": directory_bytes(persist_directory),
+    }
+
+
+def run_isolated(args: argparse.Namespace, backend: str, size: int) -> Dict[str, Any]:
+    """Run one backend/size in a fresh interpreter and parse its JSON result."""
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        "--worker", backend, str(size),
+        "--workdir", args.workdir,
+        "--dimension", str(args.dimension),
+        "--queries", str(args.queries),
+        "--k", str(args.k),
+        "--batch-size", str(args.batch_size),
+        "--seed", str(args.seed),
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        return {"backend": backend, "size": size, "error": completed.stderr.strip().splitlines()[-1:]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment() -> Dict[str, Any]:
+    versions = {"numpy": np.__version__}
+    for module in ("faiss", "chromadb"):
+        try:
+            versions[module] = __import__(module).__version__
+        except Exception:
+            versions[module] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "packages": versions,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every metric that got worse than the baseline by more than tolerance."""
+    previous = {(run["backend"], run["size"]): run for run in baseline.get("results", []) if "error" not in run}
+    regressions = []
+    for run in report["results"]:
+        old = previous.get((run["backend"], run["size"]))
+        if old is None or "error" in run:
+            continue
+        label = f"{run['backend']} @ {run['size']:,}"
+
+        checks = [("ingest docs/s", old["ingest_docs_per_second"], run["ingest_docs_per_second"], False)]
+        for kind in ("unfiltered", "filtered"):
+            checks.append((f"{kind} p95 ms", old["latency_ms"][kind]["p95"], run["latency_ms"][kind]["p95"], True))
+        for name, value in run["recall_at_k"].items():
+            checks.append((f"recall@k {name}", old["recall_at_k"].get(name), value, False))
+        checks.append(("rss bytes", old["rss_bytes"], run["rss_bytes"], True))
+        checks.append(("disk bytes", old["disk_bytes"], run["disk_bytes"], True))
+
+        for metric, before, after, lower_is_better in checks:
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if (change > tolerance) if lower_is_better else (change < -tolerance):
+                regressions.append(f"{label}: {metric} {before} -> {after} ({change:+.0%})")
+    return regressions
+
+
+def print_run(run: Dict[str, Any]) -> None:
+    if "error" in run:
+        print(f"❌ {run['backend']:<11} {run['size']:>9,} vectors | failed: {run['error']}")
+        return
+    mb = lambda value: f"{value / 1e6:8.1f}" if value is not None else "     n/a"
+    print(
+        f"📊 {run['backend']:<11} {run['size']:>9,} vectors | "
+        f"ingest {run['ingest_docs_per_second']:>9,.0f} docs/s | "
+        f"p50/p95/p99 {run['latency_ms']['unfiltered']['p50']:.2f}/{run['latency_ms']['unfiltered']['p95']:.2f}/"
+        f"{run['latency_ms']['unfiltered']['p99']:.2f} ms | "
+        f"filtered p95 {run['latency_ms']['filtered']['p95']:.2f} ms | "
+        f"recall@k {run['recall_at_k']['unfiltered']} | "
+        f"RSS {mb(run['rss_bytes'])} MB | disk {mb(run['disk_bytes'])} MB"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark vector store backends")
+    parser.add_argument("--backends", nargs="+", choices=sorted(BACKENDS),
+                        default=["memory", "faiss-flat", "faiss-ivf", "chroma"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=10000, help="Documents generated and added per call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", help="Directory for stores and ground truth (temporary if omitted)")
+    parser.add_argument("--output", default="benchmark_report.json")
+    parser.add_argument("--baseline", help="Previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative change counted as a regression")
+    parser.add_argument("--worker", nargs=2, metavar=("BACKEND", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.worker:
+        backend, size = args.worker[0], int(args.worker[1])
+        print(json.dumps(asyncio.run(run_backend(args, backend, size))))
+        return 0
+
+    keep_workdir = args.workdir is not None
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix="vector-benchmark-")
+    os.makedirs(args.workdir, exist_ok=True)
+
+    backends = [backend for backend in args.backends if backend_available(backend)]
+    for backend in sorted(set(args.backends) - set(backends)):
+        print(f"⚠️  Skipping {backend}: its dependency is not installed")
+
+    print(f"🏁 Benchmarking {', '.join(backends)} at {', '.join(f'{size:,}' for size in args.sizes)} vectors\n")
+    centres = centroids(args.seed, args.dimension)
+    query_matrix = queries(args.seed, args.queries, centres)
+
+    report = {
+        "format": REPORT_FORMAT,
+        "generated_at": datetime.now().isoformat(),
+        "environment": environment(),
+        "parameters": {
+            "dimension": args.dimension,
+            "queries": args.queries,
+            "k": args.k,
+            "batch_size": args.batch_size,
+            "seed": args.seed,
+            "filters": {name: filter_metadata for name, filter_metadata, _ in FILTERS},
+        },
+        "results": [],
+    }
+
+    try:
+        for size in args.sizes:
+            started = time.perf_counter()
+            truth = exact_neighbours(args, size, centres, query_matrix)
+            np.savez(os.path.join(args.workdir, f"truth-{size}.npz"), queries=query_matrix, **truth)
+            print(f"🎯 Exact neighbours for {size:,} vectors in {time.perf_counter() - started:.1f}s")
+
+            for backend in backends:
+                run = run_isolated(args, backend, size)
+                report["results"].append(run)
+                print_run(run)
+    finally:
+        if not keep_workdir:
+            shutil.rmtree(args.workdir, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n🚨 {len(regressions)} regressions against {args.baseline}:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            return 1
+        print(f"\n✅ No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark the matrix-backed MemoryVectorStore search against the
+previous per-document Python loop.
+
+Usage:
+    python benchmark_vector_store.py [--sizes 10000 100000] [--queries 20]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from src.jama_mcp_server.vector_store import (
+    MemoryVectorStore, VectorDocument, VectorStoreConfig
+)
+
+
+def loop_search(
+    query: np.ndarray,
+    embeddings: Dict[str, np.ndarray],
+    threshold: float,
+    limit: int
+) -> List[str]:
+    """Reference implementation of the old per-document loop search."""
+    similarities = []
+    norm_q = np.linalg.norm(query)
+    for doc_id, embedding in embeddings.items():
+        norm_e = np.linalg.norm(embedding)
+        if norm_q == 0 or norm_e == 0:
+            similarity = 0.0
+        else:
+            similarity = np.dot(query, embedding) / (norm_q * norm_e)
+        if similarity >= threshold:
+            similarities.append((doc_id, similarity))
+    similarities.sort(key=lambda x: x[1], reverse=True)
+    return [doc_id for doc_id, _ in similarities[:limit]]
+
+
+async def benchmark_size(size: int, dimension: int, num_queries: int, limit: int) -> None:
+    """Run both search paths on a random corpus of the given size."""
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((size, dimension)).astype(np.float32)
+    queries = rng.standard_normal((num_queries, dimension)).astype(np.float32)
+
+    config = VectorStoreConfig(embedding_dimension=dimension, similarity_threshold=0.0)
+    store = MemoryVectorStore(config)
+    await store.initialize()
+
+    start = time.perf_counter()
+    await store.add_documents([
+        VectorDocument(id=f"req_{i}", content="", metadata={}, embedding=vectors[i])
+        for i in range(size)
+    ])
+    ingest_seconds = time.perf_counter() - start
+
+    embeddings = {f"req_{i}": vectors[i] for i in range(size)}
+
+    start = time.perf_counter()
+    loop_results = [loop_search(q, embeddings, 0.0, limit) for q in queries]
+    loop_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+    start = time.perf_counter()
+    matrix_results = [await store.search(q, limit=limit) for q in queries]
+    matrix_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+    agreement = np.mean([
+        loop_ids == [r.document.id for r in results]
+        for loop_ids, results in zip(loop_results, matrix_results)
+    ])
+
+    print(f"📊 {size:>9,} vectors | ingest {ingest_seconds:6.2f}s | "
+          f"loop {loop_ms:9.2f} ms/query | matrix {matrix_ms:7.2f} ms/query | "
+          f"speedup {loop_ms / matrix_ms:7.1f}x | top-{limit} agreement {agreement:.0%}")
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark MemoryVectorStore search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    print("🏁 Benchmarking MemoryVectorStore: per-document loop vs. matrix search\n")
+    for size in args.sizes:
+        await benchmark_size(size, args.dimension, args.queries, args.limit)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
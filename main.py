@@ -52,17 +52,64 @@ def load_config_from_env() -> Dict[str, Any]:
         "sentence_transformer_model": os.getenv("SENTENCE_TRANSFORMER_MODEL", "all-MiniLM-L6-v2"),
         "enable_gpu": os.getenv("ENABLE_GPU", "false").lower() == "true",
         "nlp_batch_size": int(os.getenv("NLP_BATCH_SIZE", "32")),
+        "nlp_n_process": int(os.getenv("NLP_N_PROCESS", "1")),
+        "enable_embedding_cache": os.getenv("ENABLE_EMBEDDING_CACHE", "true").lower() == "true",
+        "embedding_cache_path": os.getenv("EMBEDDING_CACHE_PATH", "./data/embedding_cache.db") or None,
+        "embedding_cache_size": int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
         
         # Vector database settings
         "enable_vector_db": os.getenv("ENABLE_VECTOR_DB", "true").lower() == "true",
         "vector_db_type": os.getenv("VECTOR_DB_TYPE", "memory"),
         "chroma_persist_directory": os.getenv("CHROMA_PERSIST_DIR", "./data/chroma_db"),
         "chroma_collection_name": os.getenv("CHROMA_COLLECTION", "jama_requirements"),
+        "chroma_batch_size": int(os.getenv("CHROMA_BATCH_SIZE", "1000")),
+        "chroma_ingest_concurrency": int(os.getenv("CHROMA_INGEST_CONCURRENCY", "4")),
+        "chroma_hnsw_space": os.getenv("CHROMA_HNSW_SPACE", "cosine"),
+        "chroma_hnsw_m": int(os.getenv("CHROMA_HNSW_M", "16")),
+        "chroma_hnsw_construction_ef": int(os.getenv("CHROMA_HNSW_CONSTRUCTION_EF", "100")),
+        "chroma_hnsw_search_ef": int(os.getenv("CHROMA_HNSW_SEARCH_EF", "100")),
         "embedding_dimension": int(os.getenv("EMBEDDING_DIMENSION", "384")),
         
+        # FAISS settings
+        "faiss_index_type": os.getenv("FAISS_INDEX_TYPE", "Flat"),
+        "faiss_metric": os.getenv("FAISS_METRIC", "L2"),
+        "faiss_hnsw_m": int(os.getenv("FAISS_HNSW_M", "32")),
+        "faiss_hnsw_ef_construction": int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "200")),
+        "faiss_hnsw_ef_search": int(os.getenv("FAISS_HNSW_EF_SEARCH", "64")),
+        "faiss_ivf_nlist": int(os.getenv("FAISS_IVF_NLIST")) if os.getenv("FAISS_IVF_NLIST", "").isdigit() else None,
+        "faiss_ivf_nprobe": int(os.getenv("FAISS_IVF_NPROBE", "8")),
+        "faiss_ivf_train_min_vectors": int(os.getenv("FAISS_IVF_TRAIN_MIN_VECTORS", "2048")),
+        "faiss_ivf_retrain_factor": float(os.getenv("FAISS_IVF_RETRAIN_FACTOR", "4.0")),
+        "faiss_snapshot_wal_bytes": int(os.getenv("FAISS_SNAPSHOT_WAL_BYTES", str(64 * 1024 * 1024))),
+        "faiss_wal_fsync": os.getenv("FAISS_WAL_FSYNC", "true").lower() == "true",
+        "verify_snapshot_checksums": os.getenv("VERIFY_SNAPSHOT_CHECKSUMS", "false").lower() == "true",
+        "content_store": os.getenv("CONTENT_STORE", "disk"),
+        "document_cache_size": int(os.getenv("DOCUMENT_CACHE_SIZE", "1024")),
+        "vector_compression": os.getenv("VECTOR_COMPRESSION", "none"),
+        "pq_m": int(os.getenv("PQ_M", "48")),
+        "pq_nbits": int(os.getenv("PQ_NBITS", "8")),
+        "rerank_factor": int(os.getenv("RERANK_FACTOR", "4")),
+        
+        # Segmented store settings
+        "segment_seal_rows": int(os.getenv("SEGMENT_SEAL_ROWS", "10000")),
+        "segment_merge_factor": int(os.getenv("SEGMENT_MERGE_FACTOR", "4")),
+        "segment_flat_max_rows": int(os.getenv("SEGMENT_FLAT_MAX_ROWS", "50000")),
+        "segment_ivf_min_rows": int(os.getenv("SEGMENT_IVF_MIN_ROWS", "500000")),
+        "segment_deleted_threshold": float(os.getenv("SEGMENT_DELETED_THRESHOLD", "0.2")),
+        
         # Search settings
         "similarity_threshold": float(os.getenv("SIMILARITY_THRESHOLD", "0.7")),
         "max_search_results": int(os.getenv("MAX_SEARCH_RESULTS", "50")),
+        "ingest_commit_batch_size": int(os.getenv("INGEST_COMMIT_BATCH_SIZE", "4096")),
+        "enable_text_search": os.getenv("ENABLE_TEXT_SEARCH", "true").lower() == "true",
+        "text_search_engine": os.getenv("TEXT_SEARCH_ENGINE", "bm25"),
+        "text_search_path": os.getenv("TEXT_SEARCH_DB_PATH", "./data/text_search.db"),
+        "bm25_k1": float(os.getenv("BM25_K1", "1.2")),
+        "bm25_b": float(os.getenv("BM25_B", "0.75")),
+        "hybrid_vector_weight": float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0")),
+        "hybrid_text_weight": float(os.getenv("HYBRID_TEXT_WEIGHT", "1.0")),
+        "rrf_k": int(os.getenv("RRF_K", "60")),
+        "facet_max_values": int(os.getenv("FACET_MAX_VALUES", "20")),
         
         # Processing settings
         "chunk_size": int(os.getenv("CHUNK_SIZE", "1000")),
@@ -0,0 +1,178 @@
+"""
+Content-Addressed Embedding Cache
+
+Sentence embeddings keyed by (model name, SHA-256 of the normalized text),
+so unchanged requirements, repeated queries and analysis fallbacks are
+encoded once:
+- In-process LRU of recently used embeddings
+- Persistent SQLite table of float32 vectors behind it (standard library only)
+- Rows of any other model are dropped on open, so changing the sentence
+  transformer invalidates the cache automatically
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def text_digest(text: str) -> bytes:
+    """SHA-256 of the text with whitespace runs collapsed and ends stripped."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache for one sentence transformer model.
+    
+    Lookups go to the LRU first, then to the SQLite table (promoting hits
+    into the LRU); misses are encoded by the caller and stored in both.
+    Without a path only the LRU tier is used. Safe to call from the NLP
+    executor threads.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS embeddings (
+            model TEXT NOT NULL,
+            digest BLOB NOT NULL,
+            vector BLOB NOT NULL,
+            PRIMARY KEY (model, digest)
+        ) WITHOUT ROWID;
+    """
+    
+    # SQLite's default limit on bound parameters is 999
+    LOOKUP_CHUNK = 500
+    
+    def __init__(self, model_name: str, path: Optional[str] = None, memory_size: int = 10000):
+        self.model_name = model_name
+        self.path = path
+        self.memory_size = memory_size
+        self.memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        
+        self.lock = threading.Lock()
+        self.connection: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(self.SCHEMA)
+            with self.connection:
+                stale = self.connection.execute(
+                    "DELETE FROM embeddings WHERE model != ?", (model_name,)
+                ).rowcount
+            if stale:
+                logger.info(f"Dropped {stale} cached embeddings of other models")
+            logger.info(f"Opened embedding cache at {path} for {model_name}")
+    
+    def _remember(self, digest: bytes, embedding: np.ndarray) -> None:
+        if self.memory_size <= 0:
+            return
+        self.memory[digest] = embedding
+        self.memory.move_to_end(digest)
+        if len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+    
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Cached embedding of text, or None."""
+        return self.get_many([text])[0]
+    
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached embeddings of texts, None where not cached."""
+        digests = [text_digest(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        
+        with self.lock:
+            missing: Dict[bytes, List[int]] = {}
+            for position, digest in enumerate(digests):
+                embedding = self.memory.get(digest)
+                if embedding is not None:
+                    self.memory.move_to_end(digest)
+                    self.memory_hits += 1
+                    results[position] = embedding.copy()
+                else:
+                    missing.setdefault(digest, []).append(position)
+            
+            if missing and self.connection is not None:
+                pending = list(missing)
+                for start in range(0, len(pending), self.LOOKUP_CHUNK):
+                    chunk = pending[start:start + self.LOOKUP_CHUNK]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self.connection.execute(
+                        f"SELECT digest, vector FROM embeddings WHERE model = ? AND digest IN ({placeholders})",
+                        (self.model_name, *chunk)
+                    ).fetchall()
+                    for digest, vector in rows:
+                        embedding = np.frombuffer(vector, dtype=np.float32)
+                        self._remember(digest, embedding)
+                        for position in missing.pop(digest):
+                            self.disk_hits += 1
+                            results[position] = embedding.copy()
+            
+            self.misses += sum(len(positions) for positions in missing.values())
+        return results
+    
+    def put(self, text: str, embedding: np.ndarray) -> None:
+        """Cache the embedding of text."""
+        self.put_many([text], [embedding])
+    
+    def put_many(self, texts: Sequence[str], embeddings: Sequence[np.ndarray]) -> None:
+        """Cache embeddings of texts, writing the persistent tier in one transaction."""
+        rows = []
+        with self.lock:
+            for text, embedding in zip(texts, embeddings):
+                digest = text_digest(text)
+                vector = np.array(embedding, dtype=np.float32).ravel()
+                self._remember(digest, vector)
+                rows.append((self.model_name, digest, vector.tobytes()))
+            
+            if rows and self.connection is not None:
+                with self.connection:
+                    self.connection.executemany(
+                        "INSERT OR REPLACE INTO embeddings (model, digest, vector) VALUES (?, ?, ?)",
+                        rows
+                    )
+    
+    def clear(self) -> None:
+        """Forget every cached embedding."""
+        with self.lock:
+            self.memory.clear()
+            if self.connection is not None:
+                with self.connection:
+                    self.connection.execute("DELETE FROM embeddings")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes."""
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            stats = {
+                "model": self.model_name,
+                "memory_entries": len(self.memory),
+                "memory_size": self.memory_size,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else None,
+                "path": self.path
+            }
+            if self.connection is not None:
+                stats["disk_entries"] = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return stats
+    
+    def close(self) -> None:
+        """Close the persistent tier."""
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
@@ -11,7 +11,7 @@ Main MCP server implementation providing intelligent tools for:
 import logging
 import asyncio
 import json
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 from datetime import datetime
 import os
 from dataclasses import asdict
@@ -23,7 +23,8 @@ import pandas as pd
 
 from .jama_client import JamaConnectClient, create_jama_client, JamaRequirement
 from .nlp_processor import NLPProcessor, create_nlp_processor, ProcessedRequirement, BusinessRule, RequirementType, BusinessRuleType
-from .vector_store import VectorStoreManager, VectorStoreConfig, VectorStoreType, VectorDocument, create_vector_store
+from .vector_store import VectorStoreManager, VectorStoreConfig, VectorStoreType, VectorDocument, SearchResult, FAISSStore, create_vector_store
+from .text_search import BM25Index, SQLiteFTSIndex, TextDocument, create_text_index, reciprocal_rank_fusion
 from .file_ingestion import FileIngestionProcessor, FileIngestionConfig, load_requirements_from_file
 
 logger = logging.getLogger(__name__)
@@ -44,17 +45,64 @@ class ServerConfig(BaseModel):
     sentence_transformer_model: str = Field("all-MiniLM-L6-v2", description="Sentence transformer model")
     enable_gpu: bool = Field(False, description="Enable GPU acceleration")
     nlp_batch_size: int = Field(32, description="NLP processing batch size")
+    nlp_n_process: int = Field(1, description="spaCy worker processes for batch processing (profiles without embeddings only)")
+    enable_embedding_cache: bool = Field(True, description="Cache embeddings by model and text hash")
+    embedding_cache_path: Optional[str] = Field("./data/embedding_cache.db", description="SQLite file for the persistent embedding cache (in-memory only if unset)")
+    embedding_cache_size: int = Field(10000, description="Embeddings kept in the in-memory LRU tier")
     
     # Vector database settings
     enable_vector_db: bool = Field(True, description="Enable vector database")
-    vector_db_type: str = Field("memory", description="Vector DB type (chroma, faiss, memory)")
+    vector_db_type: str = Field("memory", description="Vector DB type (chroma, faiss, segmented, memory)")
     chroma_persist_directory: Optional[str] = Field("./data/chroma_db", description="ChromaDB persistence directory")
     chroma_collection_name: str = Field("jama_requirements", description="ChromaDB collection name")
+    chroma_batch_size: int = Field(1000, description="Documents per ChromaDB upsert call")
+    chroma_ingest_concurrency: int = Field(4, description="ChromaDB upsert batches in flight during ingestion")
+    chroma_hnsw_space: str = Field("cosine", description="ChromaDB distance space for new collections (cosine, ip, l2)")
+    chroma_hnsw_m: int = Field(16, description="ChromaDB HNSW graph degree")
+    chroma_hnsw_construction_ef: int = Field(100, description="ChromaDB HNSW build-time candidate list size")
+    chroma_hnsw_search_ef: int = Field(100, description="ChromaDB HNSW query-time candidate list size")
     embedding_dimension: int = Field(384, description="Embedding vector dimension")
     
+    # FAISS settings
+    faiss_index_type: str = Field("Flat", description="FAISS index type (Flat, IVF, HNSW)")
+    faiss_metric: str = Field("L2", description="FAISS distance metric (L2, IP)")
+    faiss_hnsw_m: int = Field(32, description="HNSW graph degree")
+    faiss_hnsw_ef_construction: int = Field(200, description="HNSW build-time candidate list size")
+    faiss_hnsw_ef_search: int = Field(64, description="HNSW query-time candidate list size")
+    faiss_ivf_nlist: Optional[int] = Field(None, description="Fixed IVF cluster count (auto if not set)")
+    faiss_ivf_nprobe: int = Field(8, description="IVF clusters probed per query")
+    faiss_ivf_train_min_vectors: int = Field(2048, description="Vectors buffered before IVF training")
+    faiss_ivf_retrain_factor: float = Field(4.0, description="Corpus growth factor that triggers IVF retraining")
+    faiss_snapshot_wal_bytes: int = Field(64 * 1024 * 1024, description="Write-ahead log size that triggers a new snapshot")
+    vector_compression: str = Field("none", description="FAISS vector compression: none, fp16, int8, pq or opq")
+    pq_m: int = Field(48, description="PQ/OPQ sub-quantizers")
+    pq_nbits: int = Field(8, description="Bits per PQ sub-quantizer code")
+    rerank_factor: int = Field(4, description="Compressed candidates reranked per result (0 disables)")
+    
+    # Segmented store settings
+    segment_seal_rows: int = Field(10000, description="Memtable documents that trigger sealing into an immutable segment")
+    segment_merge_factor: int = Field(4, description="Segments of one size tier merged together")
+    segment_flat_max_rows: int = Field(50000, description="Largest segment kept as an exact Flat index")
+    segment_ivf_min_rows: int = Field(500000, description="Smallest segment indexed with IVF (HNSW in between)")
+    segment_deleted_threshold: float = Field(0.2, description="Deleted fraction at which a segment is rewritten on its own")
+    faiss_wal_fsync: bool = Field(True, description="fsync the write-ahead log after every write")
+    verify_snapshot_checksums: bool = Field(False, description="Verify persisted vector store snapshot checksums on startup")
+    content_store: str = Field("disk", description="Where bodies of unsnapshotted documents live: disk or memory")
+    document_cache_size: int = Field(1024, description="Hydrated documents kept in the vector store's LRU cache")
+    
     # Search settings
     similarity_threshold: float = Field(0.7, description="Minimum similarity threshold for search")
     max_search_results: int = Field(50, description="Maximum search results")
+    ingest_commit_batch_size: int = Field(4096, description="Documents per atomic vector store commit during ingestion")
+    enable_text_search: bool = Field(True, description="Enable keyword (BM25) search, fused with vector search when both are available")
+    text_search_engine: str = Field("bm25", description="Text search engine (bm25, sqlite_fts)")
+    text_search_path: str = Field("./data/text_search.db", description="SQLite FTS5 database file (sqlite_fts engine)")
+    bm25_k1: float = Field(1.2, description="BM25 term frequency saturation")
+    bm25_b: float = Field(0.75, description="BM25 document length normalization")
+    hybrid_vector_weight: float = Field(1.0, description="Weight of the vector ranking in reciprocal rank fusion")
+    hybrid_text_weight: float = Field(1.0, description="Weight of the keyword ranking in reciprocal rank fusion")
+    rrf_k: int = Field(60, description="Reciprocal rank fusion rank offset")
+    facet_max_values: int = Field(20, description="Most frequent values returned per facet key")
     
     # Processing settings
     chunk_size: int = Field(1000, description="Processing chunk size")
@@ -84,6 +132,7 @@ class JamaMCPServer:
         self.jama_client: Optional[JamaConnectClient] = None
         self.nlp_processor: Optional[NLPProcessor] = None
         self.vector_store = None
+        self.text_index: Optional[Union[BM25Index, SQLiteFTSIndex]] = None
         
         # Data storage
         self.processed_requirements: Dict[str, ProcessedRequirement] = {}
@@ -174,6 +223,11 @@ class JamaMCPServer:
                                     "default": 20,
                                     "minimum": 1,
                                     "maximum": 100
+                                },
+                                "facets": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "Metadata keys to count matching requirements by (no counts if omitted)"
                                 }
                             },
                             "required": ["query"]
@@ -276,7 +330,7 @@ class JamaMCPServer:
                     ),
                     Tool(
                         name="extract_entities",
-                        description="Extract entities and keywords from requirement text",
+                        description="Extract named entities from requirement text",
                         inputSchema={
                             "type": "object",
                             "properties": {
@@ -309,7 +363,7 @@ class JamaMCPServer:
                             "properties": {
                                 "include_performance": {
                                     "type": "boolean",
-                                    "description": "Include performance metrics",
+                                    "description": "Include performance metrics, including measured recall of compressed FAISS search",
                                     "default": false
                                 }
                             }
@@ -468,7 +522,12 @@ class JamaMCPServer:
             self.nlp_processor = await create_nlp_processor(
                 spacy_model=self.config.nlp_model,
                 sentence_model=self.config.sentence_transformer_model,
-                enable_gpu=self.config.enable_gpu
+                enable_gpu=self.config.enable_gpu,
+                batch_size=self.config.nlp_batch_size,
+                n_process=self.config.nlp_n_process,
+                enable_embedding_cache=self.config.enable_embedding_cache,
+                embedding_cache_path=self.config.embedding_cache_path,
+                embedding_cache_size=self.config.embedding_cache_size
             )
             logger.info("✓ NLP processor initialized")
             
@@ -480,13 +539,54 @@ class JamaMCPServer:
                     collection_name=self.config.chroma_collection_name,
                     embedding_dimension=self.config.embedding_dimension,
                     similarity_threshold=self.config.similarity_threshold,
-                    max_results=self.config.max_search_results
+                    max_results=self.config.max_search_results,
+                    ingest_commit_batch_size=self.config.ingest_commit_batch_size,
+                    facet_max_values=self.config.facet_max_values,
+                    chroma_batch_size=self.config.chroma_batch_size,
+                    chroma_ingest_concurrency=self.config.chroma_ingest_concurrency,
+                    chroma_hnsw_space=self.config.chroma_hnsw_space,
+                    chroma_hnsw_m=self.config.chroma_hnsw_m,
+                    chroma_hnsw_construction_ef=self.config.chroma_hnsw_construction_ef,
+                    chroma_hnsw_search_ef=self.config.chroma_hnsw_search_ef,
+                    faiss_index_type=self.config.faiss_index_type,
+                    faiss_metric=self.config.faiss_metric,
+                    faiss_hnsw_m=self.config.faiss_hnsw_m,
+                    faiss_hnsw_ef_construction=self.config.faiss_hnsw_ef_construction,
+                    faiss_hnsw_ef_search=self.config.faiss_hnsw_ef_search,
+                    faiss_ivf_nlist=self.config.faiss_ivf_nlist,
+                    faiss_ivf_nprobe=self.config.faiss_ivf_nprobe,
+                    faiss_ivf_train_min_vectors=self.config.faiss_ivf_train_min_vectors,
+                    faiss_ivf_retrain_factor=self.config.faiss_ivf_retrain_factor,
+                    faiss_snapshot_wal_bytes=self.config.faiss_snapshot_wal_bytes,
+                    faiss_wal_fsync=self.config.faiss_wal_fsync,
+                    verify_snapshot_checksums=self.config.verify_snapshot_checksums,
+                    content_store=self.config.content_store,
+                    document_cache_size=self.config.document_cache_size,
+                    vector_compression=self.config.vector_compression,
+                    pq_m=self.config.pq_m,
+                    pq_nbits=self.config.pq_nbits,
+                    rerank_factor=self.config.rerank_factor,
+                    segment_seal_rows=self.config.segment_seal_rows,
+                    segment_merge_factor=self.config.segment_merge_factor,
+                    segment_flat_max_rows=self.config.segment_flat_max_rows,
+                    segment_ivf_min_rows=self.config.segment_ivf_min_rows,
+                    segment_deleted_threshold=self.config.segment_deleted_threshold
                 )
                 
                 self.vector_store = VectorStoreManager.create_store(vector_config)
                 await self.vector_store.initialize()
                 logger.info(f"✓ Vector store initialized ({self.config.vector_db_type})")
             
+            # Initialize keyword search if enabled
+            if self.config.enable_text_search:
+                self.text_index = create_text_index(
+                    self.config.text_search_engine,
+                    k1=self.config.bm25_k1,
+                    b=self.config.bm25_b,
+                    path=self.config.text_search_path
+                )
+                logger.info(f"✓ Text search initialized ({self.text_index.engine})")
+            
             self.is_initialized = True
             logger.info("🚀 Jama Python MCP Server initialized successfully")
             
@@ -560,42 +660,107 @@ class JamaMCPServer:
         similarity_threshold = args.get("similarity_threshold", self.config.similarity_threshold)
         max_results = args.get("max_results", 20)
         project_id = args.get("project_id")
+        facet_keys = args.get("facets", [])
         
         logger.info(f"Searching requirements for query: {query}")
         
+        # Prepare metadata filter
+        filter_metadata = {}
+        if requirement_types:
+            filter_metadata["requirement_type"] = requirement_types
+        if project_id:
+            filter_metadata["project_id"] = project_id
+        
+        vector_hits: Dict[str, SearchResult] = {}
         if self.vector_store:
             # Use vector store for semantic search
             query_embedding = self.nlp_processor._generate_embedding(query)
             
-            # Prepare metadata filter
-            filter_metadata = {}
-            if requirement_types:
-                filter_metadata["requirement_type"] = requirement_types
-            if project_id:
-                filter_metadata["project_id"] = project_id
-            
-            search_results = await self.vector_store.search(
+            # The store applies the threshold itself, so nothing above it is cut off
+            search_results = await self.vector_store.range_search(
                 query_embedding=query_embedding,
+                min_similarity=similarity_threshold,
+                max_results=max_results,
+                filter_metadata=filter_metadata if filter_metadata else None
+            )
+            for search_result in search_results:
+                vector_hits[search_result.document.id] = search_result
+        
+        text_hits: Dict[str, float] = {}
+        if self.text_index is not None:
+            # Keyword search catches exact identifiers and regulation numbers
+            text_hits = dict(self.text_index.search(
+                query,
                 limit=max_results,
                 filter_metadata=filter_metadata if filter_metadata else None
+            ))
+        
+        fusion_weights = None
+        if self.vector_store and self.text_index is not None:
+            retrieval = "hybrid"
+            fusion_weights = {"vector": self.config.hybrid_vector_weight, "text": self.config.hybrid_text_weight}
+            ranked = reciprocal_rank_fusion(
+                {"vector": list(vector_hits), "text": list(text_hits)},
+                fusion_weights,
+                k=self.config.rrf_k
             )
+        elif self.vector_store:
+            retrieval = "vector"
+            ranked = [(doc_id, hit.score) for doc_id, hit in vector_hits.items()]
+        elif self.text_index is not None:
+            retrieval = "text"
+            ranked = list(text_hits.items())
+        else:
+            retrieval = "substring"
+            ranked = None
+        
+        if ranked is not None:
+            snippets = {}
+            if self.text_index is not None and text_hits:
+                snippets = self.text_index.snippets(query, [doc_id for doc_id, _ in ranked[:max_results] if doc_id in text_hits])
             
             # Format results
             results = []
-            for search_result in search_results:
-                if search_result.score >= similarity_threshold:
-                    doc = search_result.document
-                    result = {
-                        "id": doc.id,
-                        "content": doc.content[:500] + "..." if len(doc.content) > 500 else doc.content,
-                        "similarity_score": search_result.score,
-                        "rank": search_result.rank,
-                        "metadata": doc.metadata
-                    }
-                    results.append(result)
+            for rank, (doc_id, fusion_score) in enumerate(ranked[:max_results], start=1):
+                vector_hit = vector_hits.get(doc_id)
+                if vector_hit:
+                    content = vector_hit.document.content
+                    metadata = vector_hit.document.metadata
+                else:
+                    # Keyword-only hit: the in-memory BM25 index keeps no text,
+                    # so fall back to the requirement cache, then the vector store
+                    processed_req = self.processed_requirements.get(doc_id)
+                    stored = None
+                    if processed_req is None and self.vector_store:
+                        stored = await self.vector_store.get_document(doc_id)
+                    if processed_req is not None:
+                        content = processed_req.text
+                    elif stored is not None:
+                        content = stored.content
+                    else:
+                        # A persistent text index can answer before anything is reprocessed
+                        content = self.text_index.get_text(doc_id) or ""
+                    metadata = stored.metadata if stored is not None else self.text_index.get_metadata(doc_id)
+                
+                result = {
+                    "id": doc_id,
+                    "content": content[:500] + "..." if len(content) > 500 else content,
+                    "similarity_score": vector_hit.score if vector_hit else None,
+                    "rank": rank,
+                    "metadata": metadata
+                }
+                if self.text_index is not None:
+                    result["bm25_score"] = text_hits.get(doc_id)
+                    if doc_id in snippets:
+                        result["snippet"] = snippets[doc_id]
+                if retrieval == "hybrid":
+                    result["fusion_score"] = fusion_score
+                results.append(result)
             
         else:
-            # Fallback to basic text search
+            # Substring matching over processed requirements, used only when
+            # both the vector store and keyword search are disabled or failed
+            # to initialize (ENABLE_VECTOR_DB=false and ENABLE_TEXT_SEARCH=false)
             results = []
             query_lower = query.lower()
             
@@ -619,18 +784,76 @@ class JamaMCPServer:
                     if len(results) >= max_results:
                         break
         
+        # Counts over every stored requirement matching the filter, for narrowing.
+        # Only on request: Chroma has no posting lists and counts by paging.
+        facets = None
+        if self.vector_store and facet_keys:
+            facets = await self.vector_store.facet_counts(facet_keys, filter_metadata if filter_metadata else None)
+        
         return {
             "query": query,
             "results": results,
             "total_found": len(results),
+            "facets": facets,
             "search_parameters": {
                 "similarity_threshold": similarity_threshold,
                 "requirement_types": requirement_types,
                 "max_results": max_results,
-                "vector_search_enabled": self.vector_store is not None
+                "vector_search_enabled": self.vector_store is not None,
+                "text_search_enabled": self.text_index is not None,
+                "retrieval": retrieval,
+                "fusion_weights": fusion_weights
             }
         }
     
+    def _index_requirement_text(
+        self,
+        processed_reqs: List[ProcessedRequirement],
+        extra_metadata: Optional[Dict[str, Any]] = None,
+        sources: Optional[Dict[str, Tuple[str, str]]] = None,
+        replace_scope: bool = False
+    ) -> List[str]:
+        """
+        Add processed requirements to the keyword index.
+        
+        Args:
+            processed_reqs: Requirements to add or replace
+            extra_metadata: Metadata shared by all of them (e.g. project_id)
+            sources: Requirement id -> (name, tags) from the source system
+            replace_scope: Remove previously indexed requirements that share
+                extra_metadata but are no longer present (re-ingestion)
+            
+        Returns:
+            Ids of the requirements removed by replace_scope, for the caller
+            to drop from the vector store as well
+        """
+        if self.text_index is None or not processed_reqs:
+            return []
+        
+        extra_metadata = extra_metadata or {}
+        sources = sources or {}
+        documents = []
+        for processed_req in processed_reqs:
+            name, tags = sources.get(processed_req.original_id, ("", ""))
+            documents.append(TextDocument(
+                id=processed_req.original_id,
+                text=processed_req.text,
+                name=name if isinstance(name, str) else "",  # Missing DataFrame values are NaN
+                tags=tags if isinstance(tags, str) else "",
+                rules=" ".join(rule.text for rule in processed_req.business_rules),
+                metadata={"requirement_type": processed_req.classification.value, **extra_metadata}
+            ))
+        self.text_index.add_documents(documents)
+        
+        stale = []
+        if replace_scope and extra_metadata:
+            current = {document.id for document in documents}
+            stale = [doc_id for doc_id in self.text_index.ids_matching(extra_metadata) if doc_id not in current]
+            if stale:
+                self.text_index.remove_documents(stale)
+                logger.info(f"Removed {len(stale)} requirements no longer present from the text index")
+        return stale
+    
     async def _handle_analyze_requirement(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Handle individual requirement analysis."""
         requirement_id = args["requirement_id"]
@@ -662,6 +885,7 @@ class JamaMCPServer:
                 
                 # Store for future use
                 self.processed_requirements[requirement_id] = processed_req
+                self._index_requirement_text([processed_req])
         
         # Build analysis result
         analysis = {
@@ -708,9 +932,9 @@ class JamaMCPServer:
         
         logger.info(f"Classifying {len(requirement_texts)} requirements")
         
-        # Process requirements in batch
+        # Process requirements in batch, computing only what the results report
         batch_data = [(text, f"req_{i}") for i, text in enumerate(requirement_texts)]
-        processed_reqs = await self.nlp_processor.process_requirements_batch(batch_data)
+        processed_reqs = await self.nlp_processor.process_requirements_batch(batch_data, profile="classify")
         
         # Format results
         results = []
@@ -782,12 +1006,33 @@ class JamaMCPServer:
             # Update processed requirements storage
             for processed_req in processed_reqs:
                 self.processed_requirements[processed_req.original_id] = processed_req
+            scope = {"project_id": project_id}
+            if item_type:
+                scope["item_type"] = item_type
+            stale = self._index_requirement_text(
+                processed_reqs,
+                scope,
+                sources={
+                    str(row["id"]): (row.get("name", ""), row.get("tags", ""))
+                    for _, row in self.requirements_df.iterrows()
+                },
+                replace_scope=True
+            )
+            if stale and self.vector_store:
+                # Keep the vector side of hybrid search in step with the text index
+                await self.vector_store.delete_documents(stale)
             
             # Store in vector database if enabled
             vector_stats = {}
             if enable_vector_storage and self.vector_store:
                 logger.info("Storing processed requirements in vector database...")
                 
+                priorities = {
+                    str(row["id"]): row["priority"]
+                    for _, row in self.requirements_df.iterrows()
+                    if pd.notna(row.get("priority"))
+                }
+                
                 vector_docs = []
                 for processed_req in processed_reqs:
                     if processed_req.embedding is not None:
@@ -802,6 +1047,8 @@ class JamaMCPServer:
                             "entity_count": len(processed_req.entities),
                             "keyword_count": len(processed_req.keywords)
                         }
+                        if processed_req.original_id in priorities:
+                            metadata["priority"] = priorities[processed_req.original_id]
                         
                         doc = VectorDocument(
                             id=processed_req.original_id,
@@ -994,8 +1241,8 @@ class JamaMCPServer:
         
         logger.info("Extracting entities from text")
         
-        # Process text to extract entities
-        processed_req = await self.nlp_processor.process_requirement(text, "temp_id")
+        # Only NER and the entity ruler run; the tagger, parser and lemmatizer stay off
+        processed_req = await self.nlp_processor.process_requirement(text, "temp_id", profile="entities")
         
         # Format entity results
         entities = []
@@ -1012,11 +1259,7 @@ class JamaMCPServer:
         
         return {
             "text": text,
-            "entities": entities,
-            "keywords": processed_req.keywords,
-            "classification": processed_req.classification.value,
-            "sentiment": processed_req.sentiment,
-            "complexity_score": processed_req.complexity_score
+            "entities": entities
         }
     
     async def _handle_test_jama_connection(self, args: Dict[str, Any]) -> Dict[str, Any]:
@@ -1062,6 +1305,11 @@ class JamaMCPServer:
                     "enabled": self.config.enable_vector_db,
                     "initialized": self.vector_store is not None,
                     "type": self.config.vector_db_type
+                },
+                "text_search": {
+                    "enabled": self.config.enable_text_search,
+                    "initialized": self.text_index is not None,
+                    "engine": self.config.text_search_engine
                 }
             },
             "data": {
@@ -1081,11 +1329,21 @@ class JamaMCPServer:
         # Add vector store stats if available
         if self.vector_store:
             try:
-                vector_stats = await self.vector_store.get_stats()
+                if include_performance and isinstance(self.vector_store, FAISSStore):
+                    # Exact-scan recall is only worth its cost when asked for
+                    vector_stats = await self.vector_store.get_stats(measure_recall=True)
+                else:
+                    vector_stats = await self.vector_store.get_stats()
                 status["vector_store_stats"] = vector_stats
             except Exception as e:
                 status["vector_store_stats"] = {"error": str(e)}
         
+        if self.text_index is not None:
+            status["text_search_stats"] = self.text_index.get_stats()
+        
+        if self.nlp_processor is not None and self.nlp_processor.embedding_cache is not None:
+            status["embedding_cache_stats"] = self.nlp_processor.embedding_cache.get_stats()
+        
         # Add performance metrics if requested
         if include_performance:
             status["performance"] = {
@@ -1108,23 +1366,23 @@ class JamaMCPServer:
             # Use vector store for similarity search
             query_embedding = self.nlp_processor._generate_embedding(text)
             
-            search_results = await self.vector_store.search(
+            search_results = await self.vector_store.range_search(
                 query_embedding=query_embedding,
-                limit=max_results
+                min_similarity=similarity_threshold,
+                max_results=max_results
             )
             
             results = []
             for search_result in search_results:
-                if search_result.score >= similarity_threshold:
-                    doc = search_result.document
-                    result = {
-                        "id": doc.id,
-                        "content": doc.content[:300] + "..." if len(doc.content) > 300 else doc.content,
-                        "similarity_score": search_result.score,
-                        "rank": search_result.rank,
-                        "metadata": doc.metadata
-                    }
-                    results.append(result)
+                doc = search_result.document
+                result = {
+                    "id": doc.id,
+                    "content": doc.content[:300] + "..." if len(doc.content) > 300 else doc.content,
+                    "similarity_score": search_result.score,
+                    "rank": search_result.rank,
+                    "metadata": doc.metadata
+                }
+                results.append(result)
             
         else:
             # Fallback: use processed requirements similarity
@@ -1224,6 +1482,15 @@ class JamaMCPServer:
                 # Update processed requirements storage
                 for processed_req in processed_reqs:
                     self.processed_requirements[processed_req.original_id] = processed_req
+                stale = self._index_requirement_text(
+                    processed_reqs,
+                    {"file_source": file_path},
+                    sources={req.global_id: (req.name, ", ".join(req.tags or [])) for req in requirements},
+                    replace_scope=True
+                )
+                if stale and self.vector_store:
+                    # Keep the vector side of hybrid search in step with the text index
+                    await self.vector_store.delete_documents(stale)
                 
                 logger.info(f"Processed {len(processed_reqs)} requirements with NLP")
             
@@ -1358,6 +1625,10 @@ class JamaMCPServer:
         if self.vector_store:
             await self.vector_store.close()
         
+        # Close text index
+        if self.text_index is not None:
+            self.text_index.close()
+        
         # Close Jama client (handled by context manager)
         
         logger.info("Server shutdown complete")
@@ -10,10 +10,12 @@ Comprehensive natural language processing for:
 
 import logging
 import re
-from typing import List, Dict, Any, Tuple, Optional, Set
+from typing import List, Dict, Any, Iterator, Tuple, Optional, Set
 from dataclasses import dataclass, field
 from enum import Enum
 import asyncio
+import dataclasses
+import itertools
 from concurrent.futures import ThreadPoolExecutor
 
 import spacy
@@ -30,6 +32,8 @@ from nltk.corpus import stopwords
 from nltk.tokenize import sent_tokenize, word_tokenize
 from textblob import TextBlob
 
+from .embedding_cache import EmbeddingCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -79,6 +83,7 @@ class BusinessRule:
     entities: List[ExtractedEntity] = field(default_factory=list)
     confidence: float = 0.0
     source_requirement_id: Optional[str] = None
+    embedding: Optional[np.ndarray] = None  # Of the lowercased rule text, set at extraction
 
 
 @dataclass
@@ -96,6 +101,214 @@ class ProcessedRequirement:
     similar_requirements: List[str] = field(default_factory=list)
 
 
+@dataclass(frozen=True)
+class AnalysisProfile:
+    """NLP stages computed for a requirement; skipped stages keep their defaults."""
+    name: str
+    entities: bool = False
+    business_rules: bool = False
+    classification: bool = False
+    keywords: bool = False
+    sentiment: bool = False
+    complexity: bool = False
+    embedding: bool = False
+    
+    @property
+    def needs_doc(self) -> bool:
+        """Whether any stage reads the spaCy doc."""
+        return any(getattr(self, stage) for stage in SPACY_STAGE_PIPES)
+
+
+# spaCy pipes each doc-based stage relies on; known pipes no enabled stage needs are disabled
+SPACY_STAGE_PIPES: Dict[str, Set[str]] = {
+    "entities": {"tok2vec", "entity_ruler", "ner"},
+    "keywords": {"tok2vec", "tagger", "attribute_ruler", "lemmatizer", "parser"},
+    "complexity": {"tok2vec", "tagger", "attribute_ruler", "lemmatizer", "parser"},
+}
+
+# Named profiles; MCP tools request the cheapest one covering the fields they return
+ANALYSIS_PROFILES: Dict[str, AnalysisProfile] = {
+    "full": AnalysisProfile(
+        "full", entities=True, business_rules=True, classification=True,
+        keywords=True, sentiment=True, complexity=True, embedding=True
+    ),
+    "classify": AnalysisProfile(
+        "classify", business_rules=True, classification=True, keywords=True, complexity=True
+    ),
+    "entities": AnalysisProfile("entities", entities=True),
+    "embed": AnalysisProfile("embed", embedding=True),
+}
+
+
+class BusinessRuleIndex:
+    """
+    Business rules of a set of processed requirements, laid out for search.
+    
+    Rule embeddings are stacked into one L2-normalized matrix with parallel
+    rule-type and confidence arrays, and rule tokens into an inverted
+    index, so scoring a query against every rule is one matrix-vector
+    product plus vectorized masks. The layout is rebuilt only when the
+    set of requirements changes.
+    """
+    
+    RULE_TYPES = list(BusinessRuleType)
+    
+    def __init__(self):
+        self.requirements: List[ProcessedRequirement] = []
+        self.rules: List[BusinessRule] = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.rule_types = np.zeros(0, dtype=np.int8)
+        self.confidences = np.zeros(0, dtype=np.float64)
+        self.token_rows: Dict[str, np.ndarray] = {}
+    
+    def __len__(self) -> int:
+        return len(self.rules)
+    
+    def is_current(self, processed_requirements: List[ProcessedRequirement]) -> bool:
+        """Whether the index was built from these same requirement objects."""
+        return len(processed_requirements) == len(self.requirements) and all(
+            current is previous for current, previous in zip(processed_requirements, self.requirements)
+        )
+    
+    def sync(self, processed_requirements: List[ProcessedRequirement]) -> None:
+        """Rebuild unless the index is current for these requirements."""
+        if self.is_current(processed_requirements):
+            return
+        self.requirements = list(processed_requirements)
+        self._build()
+    
+    def _build(self) -> None:
+        self.rules = [rule for req in self.requirements for rule in req.business_rules]
+        
+        dimension = next((len(rule.embedding) for rule in self.rules if rule.embedding is not None), 0)
+        matrix = np.zeros((len(self.rules), dimension), dtype=np.float32)
+        for row, rule in enumerate(self.rules):
+            if rule.embedding is not None:
+                matrix[row] = rule.embedding
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+        
+        self.rule_types = np.array([self.RULE_TYPES.index(rule.rule_type) for rule in self.rules], dtype=np.int8)
+        self.confidences = np.array([rule.confidence for rule in self.rules], dtype=np.float64)
+        
+        postings: Dict[str, List[int]] = {}
+        for row, rule in enumerate(self.rules):
+            for token in set(rule.text.lower().split()):
+                postings.setdefault(token, []).append(row)
+        self.token_rows = {token: np.array(rows, dtype=np.int64) for token, rows in postings.items()}
+        
+        logger.debug(f"Built business rule index with {len(self.rules)} rules")
+    
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        query: str,
+        rule_types: Optional[List[BusinessRuleType]] = None,
+        min_confidence: float = 0.5,
+        min_score: float = 0.3
+    ) -> List[Tuple[BusinessRule, float]]:
+        """
+        Rules scoring above min_score, best first.
+        
+        The score is 0.7 * cosine similarity to the query embedding plus
+        0.3 * the fraction of query tokens that occur in the rule text.
+        """
+        if not self.rules:
+            return []
+        
+        mask = self.confidences >= min_confidence
+        if rule_types:
+            mask &= np.isin(self.rule_types, [self.RULE_TYPES.index(rule_type) for rule_type in rule_types])
+        
+        query_vector = np.asarray(query_embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query_vector)
+        if norm > 0 and self.matrix.shape[1] == len(query_vector):
+            similarity = self.matrix @ (query_vector / norm)
+        else:
+            similarity = np.zeros(len(self.rules), dtype=np.float32)
+        
+        overlap = np.zeros(len(self.rules))
+        query_tokens = set(query.lower().split())
+        for token in query_tokens:
+            rows = self.token_rows.get(token)
+            if rows is not None:
+                overlap[rows] += 1
+        if query_tokens:
+            overlap /= len(query_tokens)
+        
+        scores = similarity * 0.7 + overlap * 0.3
+        rows = np.flatnonzero(mask & (scores > min_score))
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        return [(self.rules[row], float(scores[row])) for row in rows]
+
+
+class BusinessRuleMatcher:
+    """
+    Business rule patterns compiled once and matched sentence by sentence.
+    
+    Text is split into sentences (and line breaks), so every regex runs on
+    a short input, and a pattern only runs on sentences containing its
+    keywords. Sentences longer than max_sentence_chars are split at
+    whitespace to bound the backtracking of the (.+?) patterns. Patterns
+    that open with a lazy (.+?) group are matched anchored at the scan
+    position instead of searched: on a single line, if no match starts
+    there, none starts later, so the quadratic retry at every offset is
+    skipped without changing the result.
+    """
+    
+    SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|[\r\n]+")
+    LEADING_LAZY_GROUP = re.compile(r"^(?:\(\?[a-zA-Z]+\))?\(\.\+\?\)")
+    
+    def __init__(self, patterns: Dict[BusinessRuleType, List[Dict]], max_sentence_chars: int = 2000):
+        self.max_sentence_chars = max_sentence_chars
+        # (rule type, compiled pattern, group names, keyword groups, anchored)
+        self.patterns: List[Tuple[BusinessRuleType, "re.Pattern", List[str], List[Tuple[str, ...]], bool]] = []
+        for rule_type, pattern_infos in patterns.items():
+            for pattern_info in pattern_infos:
+                pattern = pattern_info["pattern"]
+                self.patterns.append((
+                    rule_type,
+                    re.compile(pattern),
+                    pattern_info["groups"],
+                    [tuple(group) for group in pattern_info.get("keywords", [])],
+                    self.LEADING_LAZY_GROUP.match(pattern) is not None
+                ))
+    
+    def sentences(self, text: str) -> List[str]:
+        """Sentences of text, each at most max_sentence_chars long."""
+        sentences = []
+        for sentence in self.SENTENCE_BOUNDARY.split(text):
+            sentence = sentence.strip()
+            while len(sentence) > self.max_sentence_chars:
+                cut = sentence.rfind(" ", 0, self.max_sentence_chars)
+                if cut <= 0:
+                    cut = self.max_sentence_chars
+                sentences.append(sentence[:cut])
+                sentence = sentence[cut:].lstrip()
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+    
+    def matches(self, text: str) -> Iterator[Tuple[BusinessRuleType, List[str], "re.Match"]]:
+        """(rule type, group names, match) for every pattern match, by pattern, then position."""
+        sentences = [(sentence, sentence.lower()) for sentence in self.sentences(text)]
+        for rule_type, regex, groups, keywords, anchored in self.patterns:
+            for sentence, lowered in sentences:
+                if not all(any(keyword in lowered for keyword in group) for group in keywords):
+                    continue
+                if not anchored:
+                    for match in regex.finditer(sentence):
+                        yield rule_type, groups, match
+                    continue
+                position = 0
+                while position < len(sentence):
+                    match = regex.match(sentence, position)
+                    if match is None:
+                        break
+                    yield rule_type, groups, match
+                    position = max(match.end(), position + 1)
+
+
 class NLPProcessor:
     """
     Comprehensive NLP processor for Jama requirements analysis.
@@ -113,21 +326,32 @@ class NLPProcessor:
         spacy_model: str = "en_core_web_sm",
         sentence_model: str = "all-MiniLM-L6-v2",
         enable_gpu: bool = False,
-        batch_size: int = 32
+        batch_size: int = 32,
+        n_process: int = 1,
+        enable_embedding_cache: bool = True,
+        embedding_cache_path: Optional[str] = None,
+        embedding_cache_size: int = 10000
     ):
         self.spacy_model_name = spacy_model
         self.sentence_model_name = sentence_model
         self.enable_gpu = enable_gpu
         self.batch_size = batch_size
+        self.n_process = n_process  # spaCy worker processes for batch processing
+        self.enable_embedding_cache = enable_embedding_cache
+        self.embedding_cache_path = embedding_cache_path
+        self.embedding_cache_size = embedding_cache_size
         
         # Model placeholders
         self.nlp = None
         self.sentence_model = None
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        self.rule_index = BusinessRuleIndex()
         self.classifier = None
         self.executor = ThreadPoolExecutor(max_workers=4)
         
         # Business rule patterns
         self.business_rule_patterns = self._load_business_rule_patterns()
+        self.rule_matcher = BusinessRuleMatcher(self.business_rule_patterns)
         
         # Domain-specific entities for requirements
         self.domain_entities = {
@@ -179,6 +403,14 @@ class NLPProcessor:
             logger.error(f"Failed to load sentence transformer: {e}")
             raise
         
+        # Embedding cache, keyed by model so a model change starts it afresh
+        if self.enable_embedding_cache:
+            self.embedding_cache = EmbeddingCache(
+                self.sentence_model_name,
+                path=self.embedding_cache_path,
+                memory_size=self.embedding_cache_size
+            )
+        
         # Initialize classification pipeline
         try:
             self.classifier = pipeline(
@@ -193,32 +425,53 @@ class NLPProcessor:
         logger.info("NLP processor initialized successfully")
 
     def _load_business_rule_patterns(self) -> Dict[BusinessRuleType, List[Dict]]:
-        """Load business rule extraction patterns."""
+        """
+        Load business rule extraction patterns.
+        
+        "keywords" lists groups of lowercase literals; a sentence can only
+        match the pattern if it contains one literal of every group, which
+        lets the matcher skip the regex for most sentences.
+        """
         return {
             BusinessRuleType.CONDITIONAL: [
-                {"pattern": r"(?i)if\s+(.+?)\s+then\s+(.+)", "groups": ["condition", "action"]},
-                {"pattern": r"(?i)when\s+(.+?),?\s+(?:then\s+)?(.+)", "groups": ["condition", "action"]},
-                {"pattern": r"(?i)provided\s+that\s+(.+?),?\s+(.+)", "groups": ["condition", "action"]},
-                {"pattern": r"(?i)in\s+case\s+(?:of\s+)?(.+?),?\s+(.+)", "groups": ["condition", "action"]},
+                {"pattern": r"(?i)if\s+(.+?)\s+then\s+(.+)", "groups": ["condition", "action"],
+                 "keywords": [["if"], ["then"]]},
+                {"pattern": r"(?i)when\s+(.+?),?\s+(?:then\s+)?(.+)", "groups": ["condition", "action"],
+                 "keywords": [["when"]]},
+                {"pattern": r"(?i)provided\s+that\s+(.+?),?\s+(.+)", "groups": ["condition", "action"],
+                 "keywords": [["provided"], ["that"]]},
+                {"pattern": r"(?i)in\s+case\s+(?:of\s+)?(.+?),?\s+(.+)", "groups": ["condition", "action"],
+                 "keywords": [["case"]]},
             ],
             BusinessRuleType.CONSTRAINT: [
-                {"pattern": r"(?i)must\s+not\s+(.+)", "groups": ["constraint"]},
-                {"pattern": r"(?i)(?:shall|must|required to)\s+(.+)", "groups": ["constraint"]},
-                {"pattern": r"(?i)(?:minimum|maximum|at least|no more than)\s+(.+)", "groups": ["constraint"]},
-                {"pattern": r"(?i)(?:prohibited|not allowed|forbidden)\s+(.+)", "groups": ["constraint"]},
+                {"pattern": r"(?i)must\s+not\s+(.+)", "groups": ["constraint"],
+                 "keywords": [["must"], ["not"]]},
+                {"pattern": r"(?i)(?:shall|must|required to)\s+(.+)", "groups": ["constraint"],
+                 "keywords": [["shall", "must", "required to"]]},
+                {"pattern": r"(?i)(?:minimum|maximum|at least|no more than)\s+(.+)", "groups": ["constraint"],
+                 "keywords": [["minimum", "maximum", "at least", "no more than"]]},
+                {"pattern": r"(?i)(?:prohibited|not allowed|forbidden)\s+(.+)", "groups": ["constraint"],
+                 "keywords": [["prohibited", "not allowed", "forbidden"]]},
             ],
             BusinessRuleType.CALCULATION: [
-                {"pattern": r"(?i)(?:calculate|compute|determine)\s+(.+?)\s+(?:as|by|using)\s+(.+)", "groups": ["target", "formula"]},
-                {"pattern": r"(?i)(.+?)\s+(?:is calculated as|equals|=)\s+(.+)", "groups": ["target", "formula"]},
-                {"pattern": r"(?i)(?:interest rate|rate|percentage)\s+(?:of|is)\s+(.+)", "groups": ["formula"]},
+                {"pattern": r"(?i)(?:calculate|compute|determine)\s+(.+?)\s+(?:as|by|using)\s+(.+)", "groups": ["target", "formula"],
+                 "keywords": [["calculate", "compute", "determine"]]},
+                {"pattern": r"(?i)(.+?)\s+(?:is calculated as|equals|=)\s+(.+)", "groups": ["target", "formula"],
+                 "keywords": [["is calculated as", "equals", "="]]},
+                {"pattern": r"(?i)(?:interest rate|rate|percentage)\s+(?:of|is)\s+(.+)", "groups": ["formula"],
+                 "keywords": [["rate", "percentage"]]},
             ],
             BusinessRuleType.VALIDATION: [
-                {"pattern": r"(?i)(?:validate|verify|check)\s+(?:that\s+)?(.+)", "groups": ["validation"]},
-                {"pattern": r"(?i)(.+?)\s+(?:must be|should be)\s+(?:valid|verified|checked)", "groups": ["validation"]},
+                {"pattern": r"(?i)(?:validate|verify|check)\s+(?:that\s+)?(.+)", "groups": ["validation"],
+                 "keywords": [["validate", "verify", "check"]]},
+                {"pattern": r"(?i)(.+?)\s+(?:must be|should be)\s+(?:valid|verified|checked)", "groups": ["validation"],
+                 "keywords": [["must be", "should be"], ["valid", "verified", "checked"]]},
             ],
             BusinessRuleType.POLICY: [
-                {"pattern": r"(?i)(?:policy|rule|regulation)\s+(?:states|requires|mandates)\s+(?:that\s+)?(.+)", "groups": ["policy"]},
-                {"pattern": r"(?i)according\s+to\s+(?:policy|regulation|rule)\s+(.+)", "groups": ["policy"]},
+                {"pattern": r"(?i)(?:policy|rule|regulation)\s+(?:states|requires|mandates)\s+(?:that\s+)?(.+)", "groups": ["policy"],
+                 "keywords": [["policy", "rule", "regulation"], ["states", "requires", "mandates"]]},
+                {"pattern": r"(?i)according\s+to\s+(?:policy|regulation|rule)\s+(.+)", "groups": ["policy"],
+                 "keywords": [["according"]]},
             ]
         }
 
@@ -248,47 +501,91 @@ class NLPProcessor:
         patterns.extend(rule_indicators)
         ruler.add_patterns(patterns)
 
-    async def process_requirement(self, text: str, requirement_id: str) -> ProcessedRequirement:
+    async def process_requirement(
+        self,
+        text: str,
+        requirement_id: str,
+        profile: str = "full"
+    ) -> ProcessedRequirement:
         """
         Process a single requirement with comprehensive NLP analysis.
         
         Args:
             text: Requirement text to process
             requirement_id: Unique identifier for the requirement
+            profile: Analysis profile naming the stages to run (see ANALYSIS_PROFILES)
             
         Returns:
-            ProcessedRequirement with all analysis results
+            ProcessedRequirement with the profile's analysis results
         """
+        analysis = self._get_profile(profile)
+        
         # Run NLP processing in thread pool to avoid blocking
         loop = asyncio.get_event_loop()
         
-        # Process with spaCy
-        doc = await loop.run_in_executor(self.executor, self._process_with_spacy, text)
+        # Process with spaCy, running only the pipes the profile needs
+        doc = None
+        if analysis.needs_doc:
+            doc = await loop.run_in_executor(
+                self.executor,
+                self._process_with_spacy,
+                text,
+                self._disabled_pipes(analysis)
+            )
+        
+        # Generate embedding
+        embedding = None
+        if analysis.embedding:
+            embedding = await loop.run_in_executor(
+                self.executor, 
+                self._generate_embedding, 
+                text
+            )
         
+        processed = await self._build_processed_requirement(text, requirement_id, doc, embedding, analysis)
+        if analysis.embedding:
+            await self._embed_business_rules([processed])
+        return processed
+
+    def _get_profile(self, profile: str) -> AnalysisProfile:
+        if profile not in ANALYSIS_PROFILES:
+            raise ValueError(f"Unknown analysis profile '{profile}'. Available: {', '.join(ANALYSIS_PROFILES)}")
+        return ANALYSIS_PROFILES[profile]
+
+    def _disabled_pipes(self, profile: AnalysisProfile) -> List[str]:
+        """Known spaCy pipes that none of the profile's stages use."""
+        needed = set().union(*(pipes for stage, pipes in SPACY_STAGE_PIPES.items() if getattr(profile, stage)))
+        known = set().union(*SPACY_STAGE_PIPES.values())
+        return [name for name in self.nlp.pipe_names if name in known and name not in needed]
+
+    async def _build_processed_requirement(
+        self,
+        text: str,
+        requirement_id: str,
+        doc: Optional[Doc],
+        embedding: Optional[np.ndarray],
+        profile: AnalysisProfile = ANALYSIS_PROFILES["full"]
+    ) -> ProcessedRequirement:
+        """Run the profile's text analyses on an already parsed doc and assemble the result."""
         # Extract entities
-        entities = self._extract_entities(doc)
+        entities = self._extract_entities(doc) if profile.entities else []
         
         # Extract business rules
-        business_rules = await self._extract_business_rules(text, requirement_id)
+        business_rules = await self._extract_business_rules(text, requirement_id) if profile.business_rules else []
         
         # Classify requirement type
-        classification = await self._classify_requirement(text, doc)
+        classification = (
+            await self._classify_requirement(text, doc) if profile.classification else RequirementType.UNKNOWN
+        )
         
         # Generate keywords
-        keywords = self._extract_keywords(doc)
+        keywords = self._extract_keywords(doc) if profile.keywords else []
         
         # Analyze sentiment
-        sentiment = self._analyze_sentiment(text)
+        sentiment = self._analyze_sentiment(text) if profile.sentiment else 0.0
         
         # Calculate complexity
-        complexity = self._calculate_complexity(doc)
-        
-        # Generate embedding
-        embedding = await loop.run_in_executor(
-            self.executor, 
-            self._generate_embedding, 
-            text
-        )
+        complexity = self._calculate_complexity(doc) if profile.complexity else 0.0
         
         return ProcessedRequirement(
             original_id=requirement_id,
@@ -303,9 +600,9 @@ class NLPProcessor:
             similar_requirements=[]  # Will be populated during similarity analysis
         )
 
-    def _process_with_spacy(self, text: str) -> Doc:
-        """Process text with spaCy model."""
-        return self.nlp(text)
+    def _process_with_spacy(self, text: str, disable: Optional[List[str]] = None) -> Doc:
+        """Process text with spaCy model, skipping the disabled pipes."""
+        return self.nlp(text, disable=disable or [])
 
     def _extract_entities(self, doc: Doc) -> List[ExtractedEntity]:
         """Extract entities from spaCy doc."""
@@ -333,47 +630,41 @@ class NLPProcessor:
         return context_span.text
 
     async def _extract_business_rules(self, text: str, requirement_id: str) -> List[BusinessRule]:
-        """Extract business rules using pattern matching and NLP."""
+        """Extract business rules with the compiled, sentence-level rule matcher."""
         rules = []
         
-        for rule_type, patterns in self.business_rule_patterns.items():
-            for pattern_info in patterns:
-                pattern = pattern_info["pattern"]
-                groups = pattern_info["groups"]
-                
-                matches = re.finditer(pattern, text)
-                for match in matches:
-                    rule_text = match.group(0)
-                    
-                    # Extract condition and action based on groups
-                    condition = None
-                    action = None
-                    
-                    if "condition" in groups and len(match.groups()) >= 1:
-                        condition = match.group(1).strip()
-                    if "action" in groups and len(match.groups()) >= 2:
-                        action = match.group(2).strip()
-                    elif "constraint" in groups and len(match.groups()) >= 1:
-                        action = match.group(1).strip()
-                    elif "formula" in groups:
-                        if len(match.groups()) >= 2:
-                            action = match.group(2).strip()
-                        else:
-                            action = match.group(1).strip()
-                    
-                    # Calculate confidence based on pattern strength
-                    confidence = self._calculate_rule_confidence(rule_text, rule_type)
-                    
-                    rule = BusinessRule(
-                        text=rule_text,
-                        rule_type=rule_type,
-                        condition=condition,
-                        action=action,
-                        confidence=confidence,
-                        source_requirement_id=requirement_id
-                    )
-                    
-                    rules.append(rule)
+        for rule_type, groups, match in self.rule_matcher.matches(text):
+            rule_text = match.group(0)
+            
+            # Extract condition and action based on groups
+            condition = None
+            action = None
+            
+            if "condition" in groups and len(match.groups()) >= 1:
+                condition = match.group(1).strip()
+            if "action" in groups and len(match.groups()) >= 2:
+                action = match.group(2).strip()
+            elif "constraint" in groups and len(match.groups()) >= 1:
+                action = match.group(1).strip()
+            elif "formula" in groups:
+                if len(match.groups()) >= 2:
+                    action = match.group(2).strip()
+                else:
+                    action = match.group(1).strip()
+            
+            # Calculate confidence based on pattern strength
+            confidence = self._calculate_rule_confidence(rule_text, rule_type)
+            
+            rule = BusinessRule(
+                text=rule_text,
+                rule_type=rule_type,
+                condition=condition,
+                action=action,
+                confidence=confidence,
+                source_requirement_id=requirement_id
+            )
+            
+            rules.append(rule)
         
         return rules
 
@@ -507,45 +798,129 @@ class NLPProcessor:
         return depth
 
     def _generate_embedding(self, text: str) -> np.ndarray:
-        """Generate semantic embedding for the text."""
+        """Generate semantic embedding for the text, reusing a cached one if present."""
+        if self.embedding_cache is not None:
+            embedding = self.embedding_cache.get(text)
+            if embedding is not None:
+                return embedding
+        
         try:
             embedding = self.sentence_model.encode([text])[0]
-            return embedding
         except Exception as e:
             logger.error(f"Failed to generate embedding: {e}")
             # Return zero vector as fallback
             return np.zeros(384)  # Default dimension for all-MiniLM-L6-v2
+        
+        if self.embedding_cache is not None:
+            self.embedding_cache.put(text, embedding)
+        return embedding
+
+    def _generate_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Generate semantic embeddings for several texts, encoding only uncached ones in one call."""
+        if self.embedding_cache is None:
+            cached = [None] * len(texts)
+        else:
+            cached = self.embedding_cache.get_many(texts)
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        if not missing:
+            return np.stack(cached) if texts else np.zeros((0, 384))
+        
+        unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+        try:
+            encoded = self.sentence_model.encode(unique_texts, batch_size=self.batch_size)
+        except Exception as e:
+            logger.error(f"Failed to generate embeddings: {e}")
+            # Return zero vectors as fallback
+            encoded = np.zeros((len(unique_texts), 384))
+        else:
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many(unique_texts, encoded)
+        
+        by_text = dict(zip(unique_texts, encoded))
+        for i in missing:
+            cached[i] = by_text[texts[i]]
+        return np.stack(cached)
+
+    async def _embed_business_rules(self, processed_requirements: List[ProcessedRequirement]) -> None:
+        """Embed the rules of these requirements that have no embedding yet, in one call."""
+        rules = [
+            rule for req in processed_requirements for rule in req.business_rules
+            if rule.embedding is None
+        ]
+        if not rules:
+            return
+        
+        embeddings = await asyncio.get_event_loop().run_in_executor(
+            self.executor,
+            self._generate_embeddings,
+            [rule.text.lower() for rule in rules]
+        )
+        for rule, embedding in zip(rules, embeddings):
+            rule.embedding = embedding
 
     async def process_requirements_batch(
         self, 
-        requirements: List[Tuple[str, str]]  # (text, id) pairs
+        requirements: List[Tuple[str, str]],  # (text, id) pairs
+        profile: str = "full"
     ) -> List[ProcessedRequirement]:
         """
         Process multiple requirements in batch for efficiency.
         
+        All texts stream through a single spaCy nlp.pipe (batch_size texts
+        at a time), and each batch is embedded with one encode call while
+        spaCy parses it. Only one batch of parsed docs is held at a time.
+        Parsing and encoding are skipped when the profile needs no doc or
+        no embedding. spaCy only uses n_process worker processes when no
+        embedding is encoded alongside: forking them from an executor
+        thread while torch is encoding is unsafe.
+        
         Args:
             requirements: List of (text, requirement_id) tuples
+            profile: Analysis profile naming the stages to run (see ANALYSIS_PROFILES)
             
         Returns:
             List of ProcessedRequirement objects
         """
-        logger.info(f"Processing batch of {len(requirements)} requirements")
+        analysis = self._get_profile(profile)
+        logger.info(f"Processing batch of {len(requirements)} requirements (profile '{analysis.name}')")
         
-        tasks = []
-        for text, req_id in requirements:
-            task = self.process_requirement(text, req_id)
-            tasks.append(task)
-        
-        # Process in smaller batches to manage memory
-        batch_size = self.batch_size
+        loop = asyncio.get_event_loop()
+        batch_size = max(1, self.batch_size)
+        texts = [text for text, _ in requirements]
+        docs = None
+        if analysis.needs_doc:
+            docs = self.nlp.pipe(
+                texts,
+                batch_size=batch_size,
+                n_process=1 if analysis.embedding else self.n_process,
+                disable=self._disabled_pipes(analysis)
+            )
         results = []
         
-        for i in range(0, len(tasks), batch_size):
-            batch_tasks = tasks[i:i + batch_size]
-            batch_results = await asyncio.gather(*batch_tasks)
+        for i in range(0, len(requirements), batch_size):
+            batch = requirements[i:i + batch_size]
+            batch_texts = texts[i:i + batch_size]
+            
+            # Parse and embed the batch concurrently
+            parse = None
+            if docs is not None:
+                parse = loop.run_in_executor(self.executor, lambda: list(itertools.islice(docs, len(batch))))
+            encode = None
+            if analysis.embedding:
+                encode = loop.run_in_executor(self.executor, self._generate_embeddings, batch_texts)
+            outputs = iter(await asyncio.gather(*(stage for stage in (parse, encode) if stage is not None)))
+            batch_docs = next(outputs) if parse is not None else [None] * len(batch)
+            embeddings = next(outputs) if encode is not None else [None] * len(batch)
+            
+            batch_results = [
+                await self._build_processed_requirement(text, req_id, doc, embedding, analysis)
+                for (text, req_id), doc, embedding in zip(batch, batch_docs, embeddings)
+            ]
+            if analysis.embedding:
+                await self._embed_business_rules(batch_results)
             results.extend(batch_results)
             
-            logger.debug(f"Processed batch {i//batch_size + 1}/{(len(tasks)-1)//batch_size + 1}")
+            logger.debug(f"Processed batch {i//batch_size + 1}/{(len(requirements)-1)//batch_size + 1}")
         
         logger.info(f"Completed processing {len(results)} requirements")
         return results
@@ -612,53 +987,26 @@ class NLPProcessor:
         """
         logger.info(f"Searching business rules for query: {query}")
         
+        if not self.rule_index.is_current(processed_requirements):
+            # Rules are embedded at extraction; this only covers ones built elsewhere
+            await self._embed_business_rules(processed_requirements)
+            self.rule_index.sync(processed_requirements)
+        
         # Generate query embedding
         query_embedding = self._generate_embedding(query.lower())
         
+        # Score every rule in one pass, keeping those with a combined score above the relevance threshold
         matching_rules = []
-        
-        for req in processed_requirements:
-            for rule in req.business_rules:
-                # Filter by rule type if specified
-                if rule_types and rule.rule_type not in rule_types:
-                    continue
-                
-                # Filter by confidence
-                if rule.confidence < min_confidence:
-                    continue
-                
-                # Calculate semantic similarity with query
-                rule_embedding = self._generate_embedding(rule.text.lower())
-                similarity = cosine_similarity(
-                    query_embedding.reshape(1, -1),
-                    rule_embedding.reshape(1, -1)
-                )[0][0]
-                
-                # Also check for keyword matches
-                query_tokens = set(query.lower().split())
-                rule_tokens = set(rule.text.lower().split())
-                keyword_overlap = len(query_tokens.intersection(rule_tokens)) / len(query_tokens)
-                
-                # Combined score
-                combined_score = (similarity * 0.7) + (keyword_overlap * 0.3)
-                
-                if combined_score > 0.3:  # Threshold for relevance
-                    # Add the combined score to the rule for ranking
-                    rule_copy = BusinessRule(
-                        text=rule.text,
-                        rule_type=rule.rule_type,
-                        condition=rule.condition,
-                        action=rule.action,
-                        entities=rule.entities,
-                        confidence=rule.confidence,
-                        source_requirement_id=rule.source_requirement_id
-                    )
-                    # Store the search relevance score
-                    rule_copy.search_score = combined_score
-                    matching_rules.append(rule_copy)
-        
-        # Sort by relevance score
-        matching_rules.sort(key=lambda r: getattr(r, 'search_score', 0), reverse=True)
+        for rule, combined_score in self.rule_index.search(
+            query_embedding,
+            query,
+            rule_types=rule_types,
+            min_confidence=min_confidence
+        ):
+            rule_copy = dataclasses.replace(rule)
+            # Store the search relevance score
+            rule_copy.search_score = combined_score
+            matching_rules.append(rule_copy)
         
         logger.info(f"Found {len(matching_rules)} matching business rules")
         return matching_rules
@@ -667,6 +1015,8 @@ class NLPProcessor:
         """Clean up resources."""
         if self.executor:
             self.executor.shutdown(wait=True)
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
         logger.info("NLP processor closed")
 
 
@@ -675,7 +1025,12 @@ class NLPProcessor:
 async def create_nlp_processor(
     spacy_model: str = "en_core_web_sm",
     sentence_model: str = "all-MiniLM-L6-v2",
-    enable_gpu: bool = False
+    enable_gpu: bool = False,
+    batch_size: int = 32,
+    n_process: int = 1,
+    enable_embedding_cache: bool = True,
+    embedding_cache_path: Optional[str] = None,
+    embedding_cache_size: int = 10000
 ) -> NLPProcessor:
     """
     Create and initialize NLP processor.
@@ -684,6 +1039,11 @@ async def create_nlp_processor(
         spacy_model: spaCy model name
         sentence_model: Sentence transformer model name  
         enable_gpu: Whether to use GPU acceleration
+        batch_size: Texts per spaCy and embedding batch
+        n_process: spaCy worker processes for batch processing
+        enable_embedding_cache: Whether to cache embeddings by model and text
+        embedding_cache_path: SQLite file for the persistent cache tier (in-memory LRU only if None)
+        embedding_cache_size: Embeddings kept in the in-memory LRU
         
     Returns:
         Initialized NLPProcessor
@@ -691,7 +1051,12 @@ async def create_nlp_processor(
     processor = NLPProcessor(
         spacy_model=spacy_model,
         sentence_model=sentence_model,
-        enable_gpu=enable_gpu
+        enable_gpu=enable_gpu,
+        batch_size=batch_size,
+        n_process=n_process,
+        enable_embedding_cache=enable_embedding_cache,
+        embedding_cache_path=embedding_cache_path,
+        embedding_cache_size=embedding_cache_size
     )
     
     await processor.initialize()
@@ -0,0 +1,350 @@
+"""
+Memory-mapped, columnar segment format for persisted vector store documents.
+
+A segment is an immutable directory of flat files that can be opened in
+constant time and read lazily through np.memmap, so startup does not
+depend on corpus size and several server processes share the page cache:
+
+    segment.json          format version, row count, dimension, attributes, checksums
+    vectors.npy           (rows, dimension) float32 embeddings (optional)
+    norms.npy             (rows,) float32 L2 norms of the embeddings
+    keys.npy              (rows,) int64 store keys (e.g. faiss ids), ascending
+    id_hash.npy           (rows,) uint64 hashes of document ids, ascending
+    id_rows.npy           (rows,) int64 row of each id_hash entry
+    <column>.blob         utf-8 bytes of the ids / content / metadata (JSON)
+    <column>.offsets.npy  (rows + 1,) uint64 offsets into <column>.blob
+    created_at.npy        (rows,) float64 POSIX timestamps (NaN if unknown)
+    postings.json         metadata key -> JSON value -> [start, end)
+    postings.npy          rows of every posting list, concatenated
+    extra.<name>.npy      store-specific arrays (e.g. tombstones)
+
+Everything is plain numpy, UTF-8 and JSON, so a segment can be read
+without this code and survives changes to the document classes. The
+header is written last and carries the format version and a CRC-32 of
+every other file (format 2 onwards), which verify() checks. Readers may
+open a segment partially: without the content column or the vectors,
+those files are never opened.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_FORMAT_VERSION = 2
+SUPPORTED_FORMAT_VERSIONS = (1, 2)  # 1: no checksums
+STRING_COLUMNS = ("ids", "content", "metadata")
+
+
+def id_hash(document_id: str) -> int:
+    """Stable 64-bit hash of a document id."""
+    return int.from_bytes(hashlib.blake2b(document_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _fsync_file(path: str) -> None:
+    with open(path, "rb+") as f:
+        os.fsync(f.fileno())
+
+
+def file_checksum(path: str) -> str:
+    """CRC-32 of a file's contents, as 8 hex digits."""
+    checksum = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            checksum = zlib.crc32(block, checksum)
+    return f"{checksum:08x}"
+
+
+class SegmentWriter:
+    """
+    Streams rows into a new segment directory.
+    
+    Rows must be appended in ascending key order. The directory is written
+    under a temporary name and renamed into place by close(), so a crash
+    never leaves a partial segment behind.
+    """
+    
+    def __init__(self, path: str, rows: int, dimension: int, with_vectors: bool = True):
+        self.path = path
+        self.rows = rows
+        self.dimension = dimension
+        self.with_vectors = with_vectors
+        self.tmp_path = path + ".tmp"
+        
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+        
+        self.vectors = None
+        if with_vectors:
+            self.vectors = np.lib.format.open_memmap(
+                self._file("vectors.npy"), mode="w+", dtype=np.float32, shape=(rows, dimension)
+            )
+        self.norms = np.zeros(rows, dtype=np.float32)
+        self.keys = np.zeros(rows, dtype=np.int64)
+        self.hashes = np.zeros(rows, dtype=np.uint64)
+        self.created_at = np.full(rows, np.nan, dtype=np.float64)
+        
+        self.blobs = {column: open(self._file(f"{column}.blob"), "wb") for column in STRING_COLUMNS}
+        self.offsets = {column: np.zeros(rows + 1, dtype=np.uint64) for column in STRING_COLUMNS}
+        
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        self.row = 0
+    
+    def _file(self, name: str) -> str:
+        return os.path.join(self.tmp_path, name)
+    
+    def append(
+        self,
+        document_id: str,
+        key: int,
+        content: str,
+        metadata: Dict[str, Any],
+        created_at: Optional[datetime] = None,
+        vector: Optional[np.ndarray] = None,
+        metadata_json: Optional[bytes] = None
+    ) -> None:
+        """Append one row. metadata_json may pass pre-encoded metadata through unchanged."""
+        row = self.row
+        if row >= self.rows:
+            raise ValueError(f"Segment was sized for {self.rows} rows")
+        if row and key <= self.keys[row - 1]:
+            raise ValueError("Segment rows must be appended in ascending key order")
+        
+        if metadata_json is None:
+            metadata_json = json.dumps(metadata, default=json_default).encode("utf-8")
+        values = {
+            "ids": document_id.encode("utf-8"),
+            "content": (content or "").encode("utf-8"),
+            "metadata": metadata_json
+        }
+        for column, data in values.items():
+            self.blobs[column].write(data)
+            self.offsets[column][row + 1] = self.offsets[column][row] + len(data)
+        
+        if self.vectors is not None and vector is not None:
+            self.vectors[row] = vector
+            self.norms[row] = np.linalg.norm(vector)
+        self.keys[row] = key
+        self.hashes[row] = id_hash(document_id)
+        if created_at is not None:
+            self.created_at[row] = created_at.timestamp()
+        
+        # Posting lists by JSON-encoded value; unhashable values are posted too
+        for meta_key, value in metadata.items():
+            encoded = json.dumps(value, sort_keys=True, default=json_default)
+            self.postings.setdefault(meta_key, {}).setdefault(encoded, []).append(row)
+        
+        self.row += 1
+    
+    def close(self, attributes: Optional[Dict[str, Any]] = None, extras: Optional[Dict[str, np.ndarray]] = None) -> None:
+        """Finish the segment and atomically move it into place."""
+        if self.row != self.rows:
+            raise ValueError(f"Segment expected {self.rows} rows, got {self.row}")
+        
+        for column in STRING_COLUMNS:
+            self.blobs[column].close()
+            np.save(self._file(f"{column}.offsets.npy"), self.offsets[column])
+        
+        if self.vectors is not None:
+            self.vectors.flush()
+            del self.vectors
+        np.save(self._file("norms.npy"), self.norms)
+        np.save(self._file("keys.npy"), self.keys)
+        np.save(self._file("created_at.npy"), self.created_at)
+        
+        order = np.argsort(self.hashes, kind="stable")
+        np.save(self._file("id_hash.npy"), self.hashes[order])
+        np.save(self._file("id_rows.npy"), order.astype(np.int64))
+        
+        posting_ranges: Dict[str, Dict[str, List[int]]] = {}
+        posting_rows = []
+        position = 0
+        for meta_key, values in self.postings.items():
+            posting_ranges[meta_key] = {}
+            for encoded, rows in values.items():
+                posting_ranges[meta_key][encoded] = [position, position + len(rows)]
+                posting_rows.append(np.asarray(rows, dtype=np.int64))
+                position += len(rows)
+        np.save(
+            self._file("postings.npy"),
+            np.concatenate(posting_rows) if posting_rows else np.zeros(0, dtype=np.int64)
+        )
+        with open(self._file("postings.json"), "w") as f:
+            json.dump(posting_ranges, f)
+        
+        for name, array in (extras or {}).items():
+            np.save(self._file(f"extra.{name}.npy"), np.asarray(array))
+        
+        checksums = {}
+        for name in sorted(os.listdir(self.tmp_path)):
+            _fsync_file(self._file(name))
+            checksums[name] = file_checksum(self._file(name))
+        
+        header = {
+            "format": SEGMENT_FORMAT_VERSION,
+            "rows": self.rows,
+            "dimension": self.dimension,
+            "has_vectors": self.with_vectors,
+            "attributes": attributes or {},
+            "checksums": checksums,
+            "created_at": datetime.now().isoformat()
+        }
+        with open(self._file("segment.json"), "w") as f:
+            json.dump(header, f, indent=2)
+        _fsync_file(self._file("segment.json"))
+        
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.tmp_path, self.path)
+    
+    def abort(self) -> None:
+        for blob in self.blobs.values():
+            blob.close()
+        self.vectors = None
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+class Segment:
+    """
+    Read-only view of a segment directory.
+    
+    Opening only parses segment.json and maps the arrays; rows are decoded
+    on access. Id lookups binary-search the sorted id hashes.
+    
+    With content=False or vectors=False those files are left unopened
+    (content() then raises and vector() returns None), for readers that
+    only need ids and metadata. verify=True checks every file's checksum
+    first, which reads the whole segment once.
+    """
+    
+    def __init__(self, path: str, content: bool = True, vectors: bool = True, verify: bool = False):
+        self.path = path
+        with open(os.path.join(path, "segment.json")) as f:
+            header = json.load(f)
+        
+        if header.get("format") not in SUPPORTED_FORMAT_VERSIONS:
+            raise ValueError(f"Unsupported segment format {header.get('format')} in {path}")
+        
+        self.format: int = header["format"]
+        self.rows: int = header["rows"]
+        self.dimension: int = header["dimension"]
+        self.attributes: Dict[str, Any] = header.get("attributes", {})
+        self.checksums: Dict[str, str] = header.get("checksums", {})
+        if verify:
+            self.verify()
+        
+        self.vectors = self._load("vectors.npy") if header.get("has_vectors") and vectors else None
+        self.norms = self._load("norms.npy")
+        self.keys = self._load("keys.npy")
+        self.created_at = self._load("created_at.npy")
+        self.hashes = self._load("id_hash.npy")
+        self.hash_rows = self._load("id_rows.npy")
+        
+        self.blobs = {}
+        self.offsets = {}
+        for column in STRING_COLUMNS:
+            if column == "content" and not content:
+                continue
+            blob_path = os.path.join(path, f"{column}.blob")
+            # np.memmap cannot map an empty file
+            self.blobs[column] = (
+                np.memmap(blob_path, dtype=np.uint8, mode="r") if os.path.getsize(blob_path) else np.zeros(0, np.uint8)
+            )
+            self.offsets[column] = self._load(f"{column}.offsets.npy")
+    
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, name), mmap_mode="r")
+    
+    def verify(self) -> None:
+        """Check every file against the checksums in segment.json. Raises ValueError on a mismatch."""
+        if self.format < 2:
+            logger.warning(f"Segment {self.path} predates checksums; not verified")
+            return
+        for name, expected in self.checksums.items():
+            path = os.path.join(self.path, name)
+            if not os.path.exists(path):
+                raise ValueError(f"Segment {self.path} is missing {name}")
+            if file_checksum(path) != expected:
+                raise ValueError(f"Checksum mismatch for {name} in segment {self.path}")
+    
+    def __len__(self) -> int:
+        return self.rows
+    
+    def _string(self, column: str, row: int) -> str:
+        if column not in self.blobs:
+            raise ValueError(f"Segment {self.path} was opened without its {column} column")
+        start, end = int(self.offsets[column][row]), int(self.offsets[column][row + 1])
+        return bytes(self.blobs[column][start:end]).decode("utf-8")
+    
+    def document_id(self, row: int) -> str:
+        return self._string("ids", row)
+    
+    def content(self, row: int) -> str:
+        return self._string("content", row)
+    
+    def metadata_json(self, row: int) -> bytes:
+        start, end = int(self.offsets["metadata"][row]), int(self.offsets["metadata"][row + 1])
+        return bytes(self.blobs["metadata"][start:end])
+    
+    def metadata(self, row: int) -> Dict[str, Any]:
+        return json.loads(self.metadata_json(row))
+    
+    def created(self, row: int) -> Optional[datetime]:
+        timestamp = float(self.created_at[row])
+        return None if np.isnan(timestamp) else datetime.fromtimestamp(timestamp)
+    
+    def vector(self, row: int) -> Optional[np.ndarray]:
+        return None if self.vectors is None else np.array(self.vectors[row])
+    
+    def row_of_id(self, document_id: str) -> Optional[int]:
+        """Row holding document_id, or None."""
+        target = np.uint64(id_hash(document_id))
+        start = int(np.searchsorted(self.hashes, target, side="left"))
+        end = int(np.searchsorted(self.hashes, target, side="right"))
+        for position in range(start, end):
+            row = int(self.hash_rows[position])
+            if self.document_id(row) == document_id:
+                return row
+        return None
+    
+    def row_of_key(self, key: int) -> Optional[int]:
+        """Row stored under key, or None."""
+        row = int(np.searchsorted(self.keys, key))
+        if row < self.rows and self.keys[row] == key:
+            return row
+        return None
+    
+    def rows_of_keys(self, keys: np.ndarray) -> np.ndarray:
+        """Rows for keys known to be in the segment."""
+        return np.searchsorted(self.keys, keys)
+    
+    def postings(self) -> Iterable[Tuple[str, Any, np.ndarray]]:
+        """Yield (metadata key, value, rows) for every stored posting list."""
+        with open(os.path.join(self.path, "postings.json")) as f:
+            ranges = json.load(f)
+        rows = self._load("postings.npy")
+        for meta_key, values in ranges.items():
+            for encoded, (start, end) in values.items():
+                yield meta_key, json.loads(encoded), rows[start:end]
+    
+    def extra(self, name: str) -> Optional[np.ndarray]:
+        path = os.path.join(self.path, f"extra.{name}.npy")
+        return np.load(path) if os.path.exists(path) else None
+
+
+def json_default(value: Any) -> Any:
+    """JSON fallback for numpy scalars/arrays and datetimes in metadata."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,482 @@
+"""
+Lexical Search for Requirements
+
+Keyword search that complements vector similarity:
+- BM25 scoring over an inverted index that is updated as requirements are ingested
+- Persistent SQLite FTS5 backend with ranking and snippet highlighting
+- Tokenization that keeps identifiers and regulation numbers (REQ-1042, 21.CFR.11) whole
+- Reciprocal rank fusion for combining lexical and vector rankings
+"""
+
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .segment import json_default
+from .vector_store import matches_filter
+
+logger = logging.getLogger(__name__)
+
+# Word or identifier: alphanumeric runs joined by . - _ / (e.g. "req-1042", "21.cfr.11")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._\-/][a-z0-9]+)*")
+PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+def _fts5_available() -> bool:
+    try:
+        with sqlite3.connect(":memory:") as connection:
+            connection.execute("CREATE VIRTUAL TABLE probe USING fts5(text)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+FTS5_AVAILABLE = _fts5_available()
+
+STOP_WORDS = frozenset("""
+    a an and are as at be by for from has have if in into is it its of on or
+    shall should that the their then there these this to was were will with
+""".split())
+
+
+@dataclass
+class TextDocument:
+    """Searchable text of one requirement."""
+    id: str
+    text: str
+    name: str = ""
+    tags: str = ""
+    rules: str = ""  # Text of extracted business rules
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase terms of a text.
+    
+    Compound identifiers are emitted whole and as their parts, so
+    "REQ-1042" matches both "REQ-1042" and "1042".
+    """
+    terms = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        parts = PART_PATTERN.findall(token)
+        if len(parts) > 1:
+            terms.append(token)
+        terms.extend(part for part in parts if part not in STOP_WORDS)
+    return terms
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring.
+    
+    Documents can be added, replaced and removed at any time; document
+    frequencies and the average length are maintained incrementally, so no
+    rebuild is needed. Search only touches the posting lists of the query
+    terms.
+    """
+    
+    engine = "bm25"
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}  # term -> document_id -> term frequency
+        self.doc_terms: Dict[str, Counter] = {}  # document_id -> term frequencies
+        self.doc_lengths: Dict[str, int] = {}
+        self.metadata: Dict[str, Dict[str, Any]] = {}
+        self.total_length = 0
+    
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+    
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self.doc_lengths
+    
+    def add_documents(self, documents: Iterable[TextDocument]) -> None:
+        """Add or replace documents."""
+        for document in documents:
+            self.add(document)
+    
+    def add(self, document: TextDocument) -> None:
+        """Add or replace one document; name, tags and rule text are indexed with the body."""
+        document_id = document.id
+        if document_id in self.doc_lengths:
+            self.remove(document_id)
+        
+        text = " ".join(part for part in (document.name, document.text, document.tags, document.rules) if part)
+        terms = Counter(tokenize(text))
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[document_id] = frequency
+        
+        length = sum(terms.values())
+        self.doc_terms[document_id] = terms
+        self.doc_lengths[document_id] = length
+        self.metadata[document_id] = dict(document.metadata)
+        self.total_length += length
+    
+    def remove(self, document_id: str) -> bool:
+        """Remove a document. Returns False if it was not indexed."""
+        terms = self.doc_terms.pop(document_id, None)
+        if terms is None:
+            return False
+        
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(document_id, None)
+                if not postings:
+                    del self.postings[term]
+        
+        self.total_length -= self.doc_lengths.pop(document_id)
+        self.metadata.pop(document_id, None)
+        return True
+    
+    def remove_documents(self, document_ids: Iterable[str]) -> int:
+        """Remove documents. Returns how many were indexed."""
+        return sum(self.remove(document_id) for document_id in document_ids)
+    
+    def ids_matching(self, filter_metadata: Dict[str, Any]) -> List[str]:
+        """Ids of all documents whose metadata matches the filter."""
+        return [
+            document_id for document_id, metadata in self.metadata.items()
+            if matches_filter(metadata, filter_metadata)
+        ]
+    
+    def get_metadata(self, document_id: str) -> Dict[str, Any]:
+        return self.metadata.get(document_id, {})
+    
+    def get_text(self, document_id: str) -> Optional[str]:
+        """Stored text of a document (the in-memory index does not keep it)."""
+        return None
+    
+    def snippets(self, query: str, document_ids: Sequence[str]) -> Dict[str, str]:
+        """Highlighted excerpts per document (not available without stored text)."""
+        return {}
+    
+    def idf(self, term: str) -> float:
+        """BM25 inverse document frequency (always positive)."""
+        df = len(self.postings.get(term, ()))
+        n = len(self.doc_lengths)
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+    
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float]]:
+        """Return up to limit (document_id, BM25 score) pairs, best first."""
+        if not self.doc_lengths:
+            return []
+        
+        average_length = self.total_length / len(self.doc_lengths) or 1.0
+        scores: Dict[str, float] = {}
+        
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for document_id, frequency in postings.items():
+                norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[document_id] / average_length)
+                scores[document_id] = scores.get(document_id, 0.0) + idf * frequency * (self.k1 + 1.0) / (frequency + norm)
+        
+        if filter_metadata:
+            scores = {
+                document_id: score for document_id, score in scores.items()
+                if matches_filter(self.metadata[document_id], filter_metadata)
+            }
+        
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Index statistics."""
+        return {
+            "engine": self.engine,
+            "document_count": len(self.doc_lengths),
+            "term_count": len(self.postings),
+            "average_length": round(self.total_length / len(self.doc_lengths), 2) if self.doc_lengths else 0.0,
+            "k1": self.k1,
+            "b": self.b
+        }
+    
+    def close(self) -> None:
+        """Release resources (nothing to do for the in-memory index)."""
+
+
+class SQLiteFTSIndex:
+    """
+    Persistent text index on SQLite FTS5 (standard library only).
+    
+    Requirement name, text, tags and business rule text are kept in a
+    documents table mirrored into an external-content FTS5 table by
+    triggers, so upserts and deletes stay incremental and the index
+    survives restarts without reprocessing. Ranking uses FTS5's bm25()
+    with per-column weights; snippets highlight matches with **...**.
+    """
+    
+    engine = "sqlite_fts"
+    
+    # bm25() weights for name, content, tags, rules
+    COLUMN_WEIGHTS = (2.0, 1.0, 1.5, 1.0)
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            doc_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL DEFAULT '',
+            content TEXT NOT NULL DEFAULT '',
+            tags TEXT NOT NULL DEFAULT '',
+            rules TEXT NOT NULL DEFAULT '',
+            metadata TEXT NOT NULL DEFAULT '{}'
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+            name, content, tags, rules,
+            content='documents', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+            INSERT INTO documents_fts(rowid, name, content, tags, rules)
+            VALUES (new.rowid, new.name, new.content, new.tags, new.rules);
+        END;
+        CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+            INSERT INTO documents_fts(documents_fts, rowid, name, content, tags, rules)
+            VALUES ('delete', old.rowid, old.name, old.content, old.tags, old.rules);
+        END;
+        CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
+            INSERT INTO documents_fts(documents_fts, rowid, name, content, tags, rules)
+            VALUES ('delete', old.rowid, old.name, old.content, old.tags, old.rules);
+            INSERT INTO documents_fts(rowid, name, content, tags, rules)
+            VALUES (new.rowid, new.name, new.content, new.tags, new.rules);
+        END;
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+        logger.info(f"Opened SQLite FTS5 text index at {path} ({len(self)} documents)")
+    
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    
+    def __contains__(self, document_id: str) -> bool:
+        with self.lock:
+            row = self.connection.execute("SELECT 1 FROM documents WHERE doc_id = ?", (document_id,)).fetchone()
+        return row is not None
+    
+    def add_documents(self, documents: Iterable[TextDocument]) -> None:
+        """Add or replace documents in one transaction."""
+        rows = [
+            (
+                document.id,
+                document.name or "",
+                document.text or "",
+                document.tags or "",
+                document.rules or "",
+                json.dumps(document.metadata, default=json_default)
+            )
+            for document in documents
+        ]
+        if not rows:
+            return
+        
+        with self.lock, self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO documents (doc_id, name, content, tags, rules, metadata)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(doc_id) DO UPDATE SET
+                    name = excluded.name, content = excluded.content, tags = excluded.tags,
+                    rules = excluded.rules, metadata = excluded.metadata
+                """,
+                rows
+            )
+    
+    def add(self, document: TextDocument) -> None:
+        self.add_documents([document])
+    
+    def remove_documents(self, document_ids: Iterable[str]) -> int:
+        """Remove documents. Returns how many were stored."""
+        with self.lock, self.connection:
+            cursor = self.connection.executemany(
+                "DELETE FROM documents WHERE doc_id = ?",
+                [(document_id,) for document_id in document_ids]
+            )
+        return cursor.rowcount
+    
+    def remove(self, document_id: str) -> bool:
+        return self.remove_documents([document_id]) > 0
+    
+    def ids_matching(self, filter_metadata: Dict[str, Any]) -> List[str]:
+        """Ids of all documents whose metadata matches the filter."""
+        with self.lock:
+            rows = self.connection.execute("SELECT doc_id, metadata FROM documents").fetchall()
+        return [doc_id for doc_id, metadata in rows if matches_filter(json.loads(metadata), filter_metadata)]
+    
+    def get_metadata(self, document_id: str) -> Dict[str, Any]:
+        with self.lock:
+            row = self.connection.execute("SELECT metadata FROM documents WHERE doc_id = ?", (document_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+    
+    def get_text(self, document_id: str) -> Optional[str]:
+        with self.lock:
+            row = self.connection.execute("SELECT content FROM documents WHERE doc_id = ?", (document_id,)).fetchone()
+        return row[0] if row else None
+    
+    @staticmethod
+    def match_expression(query: str) -> Optional[str]:
+        """
+        FTS5 query matching any query term.
+        
+        Each term is quoted, so identifiers such as REQ-1042 become a phrase
+        of their parts and FTS5 operators in user input are not interpreted.
+        """
+        terms = []
+        for match in TOKEN_PATTERN.finditer(query.lower()):
+            token = match.group()
+            if token not in STOP_WORDS and token not in terms:
+                terms.append(token)
+        return " OR ".join(f'"{term}"' for term in terms) or None
+    
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float]]:
+        """Return up to limit (document_id, score) pairs, best first (score = -bm25)."""
+        expression = self.match_expression(query)
+        if expression is None or limit <= 0:
+            return []
+        
+        rank = f"bm25(documents_fts, {', '.join(str(w) for w in self.COLUMN_WEIGHTS)})"
+        sql = f"""
+            SELECT d.doc_id, -{rank}, d.metadata
+            FROM documents_fts JOIN documents d ON d.rowid = documents_fts.rowid
+            WHERE documents_fts MATCH ?
+            ORDER BY {rank}
+            LIMIT ?
+        """
+        
+        # Filters are checked on the ranked matches; widen until limit pass
+        fetch = limit * 4 if filter_metadata else limit
+        while True:
+            with self.lock:
+                rows = self.connection.execute(sql, (expression, fetch)).fetchall()
+            hits = [
+                (doc_id, score) for doc_id, score, metadata in rows
+                if not filter_metadata or matches_filter(json.loads(metadata), filter_metadata)
+            ]
+            if len(hits) >= limit or len(rows) < fetch:
+                return hits[:limit]
+            fetch *= 4
+    
+    def snippets(self, query: str, document_ids: Sequence[str]) -> Dict[str, str]:
+        """Highlighted excerpts (matches wrapped in **) from each document's best column."""
+        expression = self.match_expression(query)
+        if expression is None or not document_ids:
+            return {}
+        
+        placeholders = ", ".join("?" for _ in document_ids)
+        with self.lock:
+            rows = self.connection.execute(
+                f"""
+                SELECT d.doc_id, snippet(documents_fts, -1, '**', '**', '...', 16)
+                FROM documents_fts JOIN documents d ON d.rowid = documents_fts.rowid
+                WHERE documents_fts MATCH ? AND d.doc_id IN ({placeholders})
+                """,
+                (expression, *document_ids)
+            ).fetchall()
+        return dict(rows)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Index statistics."""
+        return {
+            "engine": self.engine,
+            "document_count": len(self),
+            "path": self.path,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+    
+    def close(self) -> None:
+        """Optimize the FTS index segments and close the database."""
+        with self.lock:
+            try:
+                with self.connection:
+                    self.connection.execute("INSERT INTO documents_fts(documents_fts) VALUES ('optimize')")
+            finally:
+                self.connection.close()
+
+
+def reciprocal_rank_fusion(
+    rankings: Dict[str, Sequence[str]],
+    weights: Optional[Dict[str, float]] = None,
+    k: int = 60
+) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked id lists by weighted reciprocal rank.
+    
+    Each list contributes weight / (k + rank) for every id it ranks (rank
+    starting at 1), so ids ranked well by several retrievers rise to the
+    top regardless of how the retrievers scale their scores.
+    
+    Args:
+        rankings: Retriever name -> ids, best first
+        weights: Retriever name -> weight (default 1.0)
+        k: Rank offset damping the influence of top ranks
+    
+    Returns:
+        (id, fused score) pairs, best first
+    """
+    weights = weights or {}
+    fused: Dict[str, float] = {}
+    for name, ranking in rankings.items():
+        weight = weights.get(name, 1.0)
+        if weight <= 0:
+            continue
+        for rank, item_id in enumerate(ranking, start=1):
+            fused[item_id] = fused.get(item_id, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def create_text_index(
+    engine: str = "bm25",
+    k1: float = 1.2,
+    b: float = 0.75,
+    path: str = "./data/text_search.db"
+) -> Union[BM25Index, "SQLiteFTSIndex"]:
+    """
+    Create a lexical index for the configured engine.
+    
+    Args:
+        engine: Text search engine name (bm25 or sqlite_fts)
+        k1: BM25 term frequency saturation (bm25 only)
+        b: BM25 length normalization (bm25 only)
+        path: Database file (sqlite_fts only)
+    
+    Returns:
+        Text index; a sqlite_fts index reopens what was stored before
+    """
+    if engine == "sqlite_fts":
+        if FTS5_AVAILABLE:
+            return SQLiteFTSIndex(path)
+        logger.warning("SQLite was built without FTS5, falling back to in-memory bm25")
+    elif engine != "bm25":
+        logger.warning(f"Unknown text search engine '{engine}', using bm25")
+    return BM25Index(k1=k1, b=b)
@@ -12,18 +12,32 @@ Supports semantic search, similarity analysis, and knowledge base creation.
 import logging
 import os
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Tuple, Union
+from collections import OrderedDict
+from typing import Callable, Iterator, List, Dict, Any, Optional, Set, Tuple, Union
 from dataclasses import dataclass, asdict
 from enum import Enum
 import asyncio
+import contextlib
+import dataclasses
 import json
+import math
+import operator
 import pickle
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import numpy as np
 import pandas as pd
 from pydantic import BaseModel, Field
 
+from .segment import Segment, SegmentWriter, file_checksum, json_default
+
 # Optional imports with fallbacks
 try:
     import chromadb
@@ -42,12 +56,15 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+CHROMA_SPACES = ("cosine", "ip", "l2")
+
 
 class VectorStoreType(Enum):
     """Available vector store backends."""
     CHROMADB = "chroma"
     FAISS = "faiss"
     MEMORY = "memory"
+    SEGMENTED = "segmented"
 
 
 @dataclass
@@ -80,563 +97,4343 @@ class VectorStoreConfig(BaseModel):
     embedding_dimension: int = Field(384, description="Dimension of embeddings")
     similarity_threshold: float = Field(0.7, description="Minimum similarity for search results")
     max_results: int = Field(50, description="Maximum search results")
+    ingest_commit_batch_size: int = Field(4096, description="Documents per atomic commit during ingestion; searches run between commits")
+    facet_max_values: int = Field(20, description="Most frequent values returned per facet key")
+    verify_snapshot_checksums: bool = Field(False, description="Verify persisted snapshot checksums on startup (reads every snapshot file once)")
+    content_store: str = Field("disk", description="Where bodies of documents not yet in a snapshot segment live: disk (scratch file, hydrated on demand) or memory")
+    document_cache_size: int = Field(1024, description="Hydrated documents kept in an LRU cache")
     
     # ChromaDB specific
     chroma_host: Optional[str] = Field(None, description="ChromaDB server host")
     chroma_port: Optional[int] = Field(None, description="ChromaDB server port")
+    chroma_batch_size: int = Field(1000, description="Documents per ChromaDB upsert call (capped at the server's maximum)")
+    chroma_ingest_concurrency: int = Field(4, description="ChromaDB upsert batches kept in flight during ingestion")
+    chroma_hnsw_space: str = Field("cosine", description="Distance space for new ChromaDB collections (cosine, ip, l2)")
+    chroma_hnsw_m: int = Field(16, description="HNSW graph degree for new ChromaDB collections")
+    chroma_hnsw_construction_ef: int = Field(100, description="HNSW build-time candidate list size for new ChromaDB collections")
+    chroma_hnsw_search_ef: int = Field(100, description="HNSW query-time candidate list size for ChromaDB")
     
     # FAISS specific
     faiss_index_type: str = Field("Flat", description="FAISS index type (Flat, IVF, HNSW)")
     faiss_metric: str = Field("L2", description="FAISS distance metric")
-
-
-class BaseVectorStore(ABC):
-    """Abstract base class for vector stores."""
-    
-    def __init__(self, config: VectorStoreConfig):
-        self.config = config
-        self.is_initialized = False
-    
-    @abstractmethod
-    async def initialize(self) -> None:
-        """Initialize the vector store."""
-        pass
+    faiss_hnsw_m: int = Field(32, description="HNSW graph degree (neighbors per node)")
+    faiss_hnsw_ef_construction: int = Field(200, description="HNSW candidate list size while building")
+    faiss_hnsw_ef_search: int = Field(64, description="Default HNSW candidate list size per query")
+    faiss_ivf_nlist: Optional[int] = Field(None, description="Fixed IVF cluster count (chosen from corpus size if None)")
+    faiss_ivf_nprobe: int = Field(8, description="Default number of IVF clusters probed per query")
+    faiss_ivf_train_min_vectors: int = Field(2048, description="Vectors buffered in an exact index before IVF training")
+    faiss_ivf_train_sample_size: int = Field(65536, description="Reservoir sample size used to train IVF centroids")
+    faiss_ivf_retrain_factor: float = Field(4.0, description="Corpus growth factor since last training that triggers retraining")
+    faiss_compaction_threshold: float = Field(0.2, description="Deleted fraction that triggers a background IVF/HNSW rebuild")
+    faiss_background_training: bool = Field(True, description="Keep a training reservoir and train/retrain IVF and codecs in the background as the corpus grows")
+    vector_compression: str = Field("none", description="FAISS vector compression: none, fp16, int8, pq or opq")
+    pq_m: int = Field(48, description="PQ/OPQ sub-quantizers (must divide the embedding dimension)")
+    pq_nbits: int = Field(8, description="Bits per PQ sub-quantizer code")
+    rerank_factor: int = Field(4, description="Rerank limit*factor compressed candidates against full-precision vectors (0 disables)")
+    recall_sample_queries: int = Field(32, description="Sampled queries used to measure recall of a compressed index")
+    faiss_prefilter_selectivity: float = Field(0.1, description="Filter selectivity below which search is restricted to matching ids up front")
+    faiss_snapshot_wal_bytes: int = Field(64 * 1024 * 1024, description="Write-ahead log size that triggers a new snapshot")
+    faiss_wal_fsync: bool = Field(True, description="fsync the write-ahead log after every write")
     
-    @abstractmethod
-    async def add_documents(self, documents: List[VectorDocument]) -> None:
-        """Add documents to the store."""
-        pass
+    # Segmented store specific
+    segment_seal_rows: int = Field(10000, description="Memtable documents that trigger sealing into an immutable segment")
+    segment_merge_factor: int = Field(4, description="Segments of one size tier merged together")
+    segment_flat_max_rows: int = Field(50000, description="Largest segment kept as an exact Flat index")
+    segment_ivf_min_rows: int = Field(500000, description="Smallest segment indexed with IVF (HNSW in between)")
+    segment_deleted_threshold: float = Field(0.2, description="Deleted fraction at which a segment is rewritten on its own")
     
-    @abstractmethod
-    async def search(
-        self, 
-        query_embedding: np.ndarray, 
-        limit: int = None,
-        filter_metadata: Optional[Dict[str, Any]] = None
-    ) -> List[SearchResult]:
-        """Search for similar documents."""
-        pass
+    # Memory store specific
+    memory_initial_capacity: int = Field(1024, description="Initial row capacity of the in-memory embedding matrix")
+    memory_compaction_ratio: float = Field(0.25, description="Tombstone fraction that triggers matrix compaction")
+
+
+class EmbeddingMatrix:
+    """
+    Contiguous, pre-normalized float32 embedding matrix with a row-id map.
     
-    @abstractmethod
-    async def delete_documents(self, document_ids: List[str]) -> None:
-        """Delete documents from the store."""
-        pass
+    Rows are appended into an over-allocated buffer (amortized doubling
+    growth) and deleted by tombstoning, so a cosine search over the whole
+    store is a single matrix-vector product over the used prefix.
+    """
     
-    @abstractmethod
-    async def get_document(self, document_id: str) -> Optional[VectorDocument]:
-        """Get a specific document by ID."""
-        pass
+    def __init__(self, dimension: int, initial_capacity: int = 1024, compaction_ratio: float = 0.25):
+        self.dimension = dimension
+        self.compaction_ratio = compaction_ratio
+        capacity = max(1, initial_capacity)
+        self.vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.row_ids: List[Optional[str]] = []  # row -> document_id (None for tombstones)
+        self.id_to_row: Dict[str, int] = {}  # document_id -> row
+        self.size = 0  # Rows in use, tombstones included
+        self.tombstones = 0
     
-    @abstractmethod
-    async def get_stats(self) -> Dict[str, Any]:
-        """Get store statistics."""
-        pass
+    def __len__(self) -> int:
+        return len(self.id_to_row)
     
-    @abstractmethod
-    async def close(self) -> None:
-        """Close the vector store."""
-        pass
-
-
-class ChromaDBStore(BaseVectorStore):
-    """ChromaDB implementation of vector store."""
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self.id_to_row
     
-    def __init__(self, config: VectorStoreConfig):
-        super().__init__(config)
-        if not CHROMADB_AVAILABLE:
-            raise ImportError("ChromaDB is not available. Install with: pip install chromadb")
-        
-        self.client = None
-        self.collection = None
+    @property
+    def capacity(self) -> int:
+        return self.vectors.shape[0]
     
-    async def initialize(self) -> None:
-        """Initialize ChromaDB client and collection."""
-        try:
-            if self.config.chroma_host and self.config.chroma_port:
-                # Remote ChromaDB instance
-                self.client = chromadb.HttpClient(
-                    host=self.config.chroma_host,
-                    port=self.config.chroma_port
-                )
-            else:
-                # Local persistent client
-                settings = Settings()
-                if self.config.persist_directory:
-                    settings.persist_directory = self.config.persist_directory
-                    settings.is_persistent = True
-                
-                self.client = chromadb.Client(settings)
-            
-            # Get or create collection
-            try:
-                self.collection = self.client.get_collection(
-                    name=self.config.collection_name
-                )
-                logger.info(f"Connected to existing ChromaDB collection: {self.config.collection_name}")
-            except:
-                self.collection = self.client.create_collection(
-                    name=self.config.collection_name,
-                    metadata={"description": "Jama requirements vector store"}
-                )
-                logger.info(f"Created new ChromaDB collection: {self.config.collection_name}")
-            
-            self.is_initialized = True
-            logger.info("ChromaDB store initialized successfully")
-            
-        except Exception as e:
-            logger.error(f"Failed to initialize ChromaDB: {e}")
-            raise
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        """Return a float32 (N, D) copy of vectors scaled to unit length."""
+        array = np.array(vectors, dtype=np.float32, ndmin=2)
+        norms = np.linalg.norm(array, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        array /= norms
+        return array
     
-    async def add_documents(self, documents: List[VectorDocument]) -> None:
-        """Add documents to ChromaDB collection."""
-        if not self.is_initialized:
-            await self.initialize()
-        
-        if not documents:
+    def _reserve(self, extra: int) -> None:
+        """Grow the buffer geometrically so appends stay amortized O(1)."""
+        required = self.size + extra
+        if required <= self.capacity:
             return
         
-        ids = []
-        embeddings = []
-        documents_content = []
-        metadatas = []
-        
-        for doc in documents:
-            ids.append(doc.id)
-            embeddings.append(doc.embedding.tolist())
-            documents_content.append(doc.content)
-            
-            # Prepare metadata (ChromaDB requires JSON-serializable values)
-            metadata = dict(doc.metadata)
-            metadata['created_at'] = doc.created_at.isoformat() if doc.created_at else datetime.now().isoformat()
-            metadatas.append(metadata)
-        
-        # Add to collection
-        await asyncio.get_event_loop().run_in_executor(
-            None,
-            self.collection.add,
-            ids,
-            embeddings,
-            documents_content,
-            metadatas
-        )
+        new_capacity = self.capacity
+        while new_capacity < required:
+            new_capacity *= 2
         
-        logger.info(f"Added {len(documents)} documents to ChromaDB")
+        vectors = np.zeros((new_capacity, self.dimension), dtype=np.float32)
+        vectors[:self.size] = self.vectors[:self.size]
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self.size] = self.alive[:self.size]
+        self.vectors = vectors
+        self.alive = alive
     
-    async def search(
-        self,
-        query_embedding: np.ndarray,
-        limit: int = None,
-        filter_metadata: Optional[Dict[str, Any]] = None
-    ) -> List[SearchResult]:
-        """Search ChromaDB for similar documents."""
-        if not self.is_initialized:
-            await self.initialize()
-        
-        limit = limit or self.config.max_results
-        
-        # Prepare query
-        query_params = {
-            "query_embeddings": [query_embedding.tolist()],
-            "n_results": limit,
-            "include": ["documents", "metadatas", "distances"]
-        }
+    def add(self, document_ids: List[str], vectors: np.ndarray) -> None:
+        """Append vectors, replacing (tombstoning) existing rows for repeated ids."""
+        if not document_ids:
+            return
         
-        if filter_metadata:
-            query_params["where"] = filter_metadata
+        normalized = self.normalize(vectors)
+        if normalized.shape != (len(document_ids), self.dimension):
+            raise ValueError(
+                f"Expected embeddings of shape ({len(document_ids)}, {self.dimension}), got {normalized.shape}"
+            )
         
-        # Execute search
-        results = await asyncio.get_event_loop().run_in_executor(
-            None,
-            self.collection.query,
-            **query_params
-        )
+        # Later occurrences of an id within the batch win
+        self.remove(document_ids)
+        last_position = {doc_id: i for i, doc_id in enumerate(document_ids)}
+        positions = sorted(last_position.values())
         
-        # Process results
-        search_results = []
+        self._reserve(len(positions))
+        start = self.size
+        end = start + len(positions)
+        self.vectors[start:end] = normalized[positions]
+        self.alive[start:end] = True
         
-        for i, (doc_id, distance, document, metadata) in enumerate(zip(
-            results["ids"][0],
-            results["distances"][0], 
-            results["documents"][0],
-            results["metadatas"][0]
-        )):
-            # Convert distance to similarity (ChromaDB uses cosine distance)
-            similarity = 1 - distance
-            
-            if similarity >= self.config.similarity_threshold:
-                # Recreate document
-                created_at = None
-                if metadata.get("created_at"):
-                    try:
-                        created_at = datetime.fromisoformat(metadata["created_at"])
-                    except:
-                        pass
-                
-                vector_doc = VectorDocument(
-                    id=doc_id,
-                    content=document,
-                    metadata=metadata,
-                    created_at=created_at
-                )
-                
-                search_results.append(SearchResult(
-                    document=vector_doc,
-                    score=similarity,
-                    rank=i + 1
-                ))
+        for row, position in enumerate(positions, start=start):
+            doc_id = document_ids[position]
+            self.row_ids.append(doc_id)
+            self.id_to_row[doc_id] = row
+        self.size = end
+    
+    def remove(self, document_ids: List[str]) -> int:
+        """Tombstone rows for the given ids. Returns the number of rows removed."""
+        removed = 0
+        for doc_id in document_ids:
+            row = self.id_to_row.pop(doc_id, None)
+            if row is None:
+                continue
+            self.alive[row] = False
+            self.row_ids[row] = None
+            removed += 1
         
-        logger.debug(f"ChromaDB search returned {len(search_results)} results")
-        return search_results
+        self.tombstones += removed
+        if removed and self.tombstones > self.compaction_ratio * self.size:
+            self.compact()
+        return removed
     
-    async def delete_documents(self, document_ids: List[str]) -> None:
-        """Delete documents from ChromaDB."""
-        if not self.is_initialized:
-            await self.initialize()
+    def compact(self) -> None:
+        """Drop tombstoned rows and rebuild the row-id map."""
+        live_rows = np.flatnonzero(self.alive[:self.size])
+        count = len(live_rows)
         
-        await asyncio.get_event_loop().run_in_executor(
-            None,
-            self.collection.delete,
-            ids=document_ids
-        )
+        self.vectors[:count] = self.vectors[live_rows]
+        self.alive[:count] = True
+        self.alive[count:] = False
+        self.row_ids = [self.row_ids[row] for row in live_rows]
+        self.id_to_row = {doc_id: row for row, doc_id in enumerate(self.row_ids)}
+        self.size = count
+        self.tombstones = 0
+    
+    def scores(self, query_embedding: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query against every row (-inf for tombstones)."""
+        query = self.normalize(query_embedding)[0]
+        scores = self.vectors[:self.size] @ query
+        if self.tombstones:
+            scores[~self.alive[:self.size]] = -np.inf
+        return scores
+    
+    def scores_batch(self, query_embeddings: np.ndarray) -> np.ndarray:
+        """(Q, rows) cosine similarities for a matrix of queries in one product."""
+        queries = self.normalize(query_embeddings)
+        scores = queries @ self.vectors[:self.size].T
+        if self.tombstones:
+            scores[:, ~self.alive[:self.size]] = -np.inf
+        return scores
+    
+    @staticmethod
+    def top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> np.ndarray:
+        """Return the k rows with the highest scores, best first."""
+        if k <= 0 or len(rows) == 0:
+            return rows[:0]
+        if len(rows) > k:
+            partition = np.argpartition(-scores[rows], k - 1)[:k]
+            rows = rows[partition]
+        return rows[np.argsort(-scores[rows], kind="stable")]
+    
+    def nbytes(self) -> int:
+        """Bytes allocated for the vector buffer."""
+        return self.vectors.nbytes
+
+
+class VectorFile:
+    """
+    Full-precision float32 vectors addressed by slot, kept in a file on disk.
+    
+    Compressed indexes keep only codes in RAM; this holds the exact vectors
+    for reranking and for rebuilding/retraining. Slots are written in place,
+    so replaying a write is harmless. Without a path the vectors are kept in
+    memory instead.
+    """
+    
+    def __init__(self, dimension: int, path: Optional[str] = None):
+        self.dimension = dimension
+        self.path = path
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
         
-        logger.info(f"Deleted {len(document_ids)} documents from ChromaDB")
+        if path and os.path.exists(path):
+            capacity = os.path.getsize(path) // (dimension * 4)
+            if capacity:
+                self.vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, dimension))
     
-    async def get_document(self, document_id: str) -> Optional[VectorDocument]:
-        """Get a specific document from ChromaDB."""
-        if not self.is_initialized:
-            await self.initialize()
+    @property
+    def capacity(self) -> int:
+        return self.vectors.shape[0]
+    
+    def _reserve(self, slots: int) -> None:
+        """Grow geometrically so in-place writes stay amortized O(1)."""
+        if slots <= self.capacity:
+            return
         
-        try:
-            results = await asyncio.get_event_loop().run_in_executor(
-                None,
-                self.collection.get,
-                ids=[document_id],
-                include=["documents", "metadatas"]
-            )
-            
-            if results["ids"]:
-                doc_id = results["ids"][0]
-                content = results["documents"][0]
-                metadata = results["metadatas"][0]
-                
-                created_at = None
-                if metadata.get("created_at"):
-                    try:
-                        created_at = datetime.fromisoformat(metadata["created_at"])
-                    except:
-                        pass
-                
-                return VectorDocument(
-                    id=doc_id,
-                    content=content,
-                    metadata=metadata,
-                    created_at=created_at
-                )
-        except Exception as e:
-            logger.error(f"Error retrieving document {document_id}: {e}")
+        new_capacity = max(slots, 2 * self.capacity, 1024)
+        if not self.path:
+            vectors = np.zeros((new_capacity, self.dimension), dtype=np.float32)
+            vectors[:self.capacity] = self.vectors
+            self.vectors = vectors
+            return
         
-        return None
+        self.flush()
+        self.vectors = None
+        with open(self.path, "ab") as f:
+            f.truncate(new_capacity * self.dimension * 4)
+        self.vectors = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(new_capacity, self.dimension))
     
-    async def get_stats(self) -> Dict[str, Any]:
-        """Get ChromaDB collection statistics."""
-        if not self.is_initialized:
-            await self.initialize()
-        
-        try:
-            count = await asyncio.get_event_loop().run_in_executor(
-                None,
-                self.collection.count
-            )
-            
-            return {
-                "store_type": "chromadb",
-                "collection_name": self.config.collection_name,
-                "document_count": count,
-                "embedding_dimension": self.config.embedding_dimension
-            }
-        except Exception as e:
-            logger.error(f"Error getting ChromaDB stats: {e}")
-            return {"error": str(e)}
+    def write(self, slots: List[int], vectors: np.ndarray) -> None:
+        if not len(slots):
+            return
+        self._reserve(max(slots) + 1)
+        self.vectors[np.asarray(slots, dtype=np.int64)] = vectors
     
-    async def close(self) -> None:
-        """Close ChromaDB connection."""
-        # ChromaDB client doesn't require explicit closing
-        self.is_initialized = False
-        logger.info("ChromaDB store closed")
+    def read(self, slots: List[int]) -> np.ndarray:
+        return np.asarray(self.vectors[np.asarray(slots, dtype=np.int64)], dtype=np.float32)
+    
+    def flush(self) -> None:
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+    
+    def nbytes(self) -> int:
+        return self.capacity * self.dimension * 4
 
 
-class FAISSStore(BaseVectorStore):
-    """FAISS implementation of vector store."""
+class ContentStore:
+    """
+    Bodies of documents not yet in a segment, in an append-only scratch file.
     
-    def __init__(self, config: VectorStoreConfig):
-        super().__init__(config)
-        if not FAISS_AVAILABLE:
-            raise ImportError("FAISS is not available. Install with: pip install faiss-cpu")
-        
-        self.index = None
-        self.documents = {}  # id -> VectorDocument mapping
-        self.id_to_index = {}  # document_id -> faiss_index mapping
-        self.index_to_id = {}  # faiss_index -> document_id mapping
-        self.next_index = 0
+    Each record holds a document's id, metadata, content and embedding and
+    is read back with a positional read when the document is hydrated (a
+    search's top-k, a filter check, a snapshot). Only an offset and length
+    per store key stay resident, in two int64 arrays indexed by key, so
+    memory no longer grows with document size. Replaced and removed records
+    become dead space until compact().
     
-    async def initialize(self) -> None:
-        """Initialize FAISS index."""
+    The file is not durable and starts empty: the write-ahead log or the
+    close-time segment is what survives a restart. Without a path it is an
+    anonymous temporary file.
+    
+    Record: <IIId header (id, metadata and content byte lengths, created_at
+    timestamp or NaN), utf-8 id, JSON metadata, utf-8 content, then the
+    float32 embedding if there is one.
+    """
+    
+    _RECORD_HEADER = struct.Struct("<IIId")
+    
+    def __init__(self, dimension: int, path: Optional[str] = None):
+        self.dimension = dimension
+        self.path = path
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "w+b") if path else tempfile.TemporaryFile()
+        self._lock = threading.Lock()  # Only needed where os.pread/pwrite are missing
+        # Executor threads (snapshots, rebuilds, hydration) read while the loop
+        # writes; compaction and reset wait for in-flight reads to drain
+        self._readers = 0
+        self._drained = threading.Condition()
+        
+        self.offsets = np.zeros(1024, dtype=np.int64)
+        self.lengths = np.zeros(1024, dtype=np.int64)  # 0: no record; negative: record without embedding
+        self.end = 0
+        self.live_bytes = 0
+        self.live_records = 0
+    
+    def __len__(self) -> int:
+        return self.live_records
+    
+    def _reserve(self, key: int) -> None:
+        if key < len(self.offsets):
+            return
+        capacity = max(key + 1, 2 * len(self.offsets))
+        self.offsets = np.concatenate([self.offsets, np.zeros(capacity - len(self.offsets), dtype=np.int64)])
+        self.lengths = np.concatenate([self.lengths, np.zeros(capacity - len(self.lengths), dtype=np.int64)])
+    
+    def _write(self, data: bytes, offset: int) -> None:
+        if hasattr(os, "pwrite"):
+            os.pwrite(self._file.fileno(), data, offset)
+            return
+        with self._lock:
+            self._file.seek(offset)
+            self._file.write(data)
+            self._file.flush()
+    
+    def _read(self, offset: int, length: int) -> bytes:
+        if hasattr(os, "pread"):
+            return os.pread(self._file.fileno(), length, offset)
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(length)
+    
+    @contextlib.contextmanager
+    def _reading(self):
+        """Pin the current file and offsets for the duration of a read."""
+        with self._drained:
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._drained:
+                self._readers -= 1
+                if not self._readers:
+                    self._drained.notify_all()
+    
+    def put(
+        self,
+        key: int,
+        document_id: str,
+        content: Optional[str],
+        metadata: Dict[str, Any],
+        created_at: Optional[datetime] = None,
+        embedding: Optional[np.ndarray] = None
+    ) -> None:
+        """Append a record for key, replacing any previous one."""
+        self.discard(key)
+        id_bytes = document_id.encode("utf-8")
+        metadata_bytes = json.dumps(metadata, default=json_default).encode("utf-8")
+        content_bytes = (content or "").encode("utf-8")
+        timestamp = created_at.timestamp() if created_at is not None else float("nan")
+        parts = [
+            self._RECORD_HEADER.pack(len(id_bytes), len(metadata_bytes), len(content_bytes), timestamp),
+            id_bytes, metadata_bytes, content_bytes
+        ]
+        if embedding is not None:
+            parts.append(np.asarray(embedding, dtype=np.float32).reshape(self.dimension).tobytes())
+        record = b"".join(parts)
+        
+        self._reserve(key)
+        self._write(record, self.end)
+        self.offsets[key] = self.end
+        self.lengths[key] = len(record) if embedding is not None else -len(record)
+        self.end += len(record)
+        self.live_bytes += len(record)
+        self.live_records += 1
+    
+    def discard(self, key: int) -> None:
+        """Forget key's record (its bytes stay until compaction)."""
+        if key < len(self.lengths) and self.lengths[key]:
+            self.live_bytes -= abs(int(self.lengths[key]))
+            self.live_records -= 1
+            self.lengths[key] = 0
+    
+    def __contains__(self, key: int) -> bool:
+        return key < len(self.lengths) and bool(self.lengths[key])
+    
+    def _record(self, key: int) -> Tuple[bytes, bool]:
+        with self._reading():
+            length = int(self.lengths[key]) if key < len(self.lengths) else 0
+            if not length:
+                raise KeyError(key)
+            return self._read(int(self.offsets[key]), abs(length)), length > 0
+    
+    def get(self, key: int) -> Tuple[str, str, Dict[str, Any], Optional[datetime], Optional[np.ndarray]]:
+        """(id, content, metadata, created_at, embedding) stored under key."""
+        record, has_embedding = self._record(key)
+        id_length, metadata_length, content_length, timestamp = self._RECORD_HEADER.unpack_from(record)
+        position = self._RECORD_HEADER.size
+        document_id = record[position:position + id_length].decode("utf-8")
+        position += id_length
+        metadata = json.loads(record[position:position + metadata_length])
+        position += metadata_length
+        content = record[position:position + content_length].decode("utf-8")
+        position += content_length
+        embedding = np.frombuffer(record, dtype=np.float32, offset=position).copy() if has_embedding else None
+        created_at = None if np.isnan(timestamp) else datetime.fromtimestamp(timestamp)
+        return document_id, content, metadata, created_at, embedding
+    
+    def metadata(self, key: int) -> Dict[str, Any]:
+        """Metadata stored under key, reading only the record's header, id and metadata."""
+        with self._reading():
+            offset = int(self.offsets[key])
+            id_length, metadata_length, _, _ = self._RECORD_HEADER.unpack(self._read(offset, self._RECORD_HEADER.size))
+            metadata_bytes = self._read(offset + self._RECORD_HEADER.size + id_length, metadata_length)
+        return json.loads(metadata_bytes)
+    
+    def embedding(self, key: int) -> Optional[np.ndarray]:
+        """Embedding stored under key (None if it was stored without one)."""
+        vector_bytes = 4 * self.dimension
+        with self._reading():
+            length = int(self.lengths[key])
+            if length <= 0:
+                return None
+            data = self._read(int(self.offsets[key]) + length - vector_bytes, vector_bytes)
+        return np.frombuffer(data, dtype=np.float32).copy()
+    
+    def maybe_compact(self) -> None:
+        """Rewrite the live records once dead space outweighs them."""
+        dead = self.end - self.live_bytes
+        if dead > max(self.live_bytes, 16 * 1024 * 1024):
+            self.compact()
+    
+    def compact(self) -> None:
+        """Rewrite the file with only the live records, in key order."""
+        keys = np.flatnonzero(self.lengths)
+        replacement = open(self.path + ".tmp", "w+b") if self.path else tempfile.TemporaryFile()
+        offsets = np.zeros_like(self.offsets)
+        end = 0
+        for key in keys.tolist():
+            record = self._read(int(self.offsets[key]), abs(int(self.lengths[key])))
+            replacement.write(record)
+            offsets[key] = end
+            end += len(record)
+        replacement.flush()
+        
+        with self._drained:
+            self._drained.wait_for(lambda: not self._readers)
+            retired = self._file
+            if self.path:
+                os.replace(self.path + ".tmp", self.path)
+            self._file = replacement
+            self.offsets = offsets
+            self.end = end
+        retired.close()
+        logger.debug(f"Compacted content store to {end} bytes ({len(keys)} records)")
+    
+    def reset(self) -> None:
+        """Drop every record (after they have been written to a segment)."""
+        with self._drained:
+            self._drained.wait_for(lambda: not self._readers)
+            self._file.truncate(0)
+            self.offsets[:] = 0
+            self.lengths[:] = 0
+        self.end = 0
+        self.live_bytes = 0
+        self.live_records = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "records": self.live_records,
+            "live_bytes": self.live_bytes,
+            "file_bytes": self.end,
+            "resident_bytes": self.offsets.nbytes + self.lengths.nbytes
+        }
+    
+    def close(self) -> None:
+        self._file.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _filter_values(value: Any) -> List[Any]:
+    """Values a filter entry accepts: list-like filter values mean IN."""
+    return list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+
+
+def _same_value(actual: Any, expected: Any) -> bool:
+    """Filter equality, as posting lists key values: 1 equals 1.0, but not True."""
+    return actual == expected and isinstance(actual, (bool, np.bool_)) == isinstance(expected, (bool, np.bool_))
+
+
+def _any_value(actual: Any, values: List[Any]) -> bool:
+    return any(_same_value(actual, value) for value in values)
+
+
+# Operators allowed in a filter condition dict, e.g. {"complexity_score": {"$gte": 0.5}}
+FILTER_COMPARISONS = {
+    "$eq": _same_value,
+    "$ne": lambda actual, operand: not _same_value(actual, operand),
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le
+}
+FILTER_OPERATORS = set(FILTER_COMPARISONS) | {"$in", "$nin"}
+
+
+def _condition_matches(actual: Any, condition: Any) -> bool:
+    """
+    Check one metadata value against one filter condition.
+    
+    A condition is a value (equality), a list of values (any of), or a
+    dict of operators, all of which must hold.
+    """
+    if not isinstance(condition, dict):
+        return _any_value(actual, _filter_values(condition))
+    
+    for op, operand in condition.items():
+        if op == "$in":
+            matched = _any_value(actual, _filter_values(operand))
+        elif op == "$nin":
+            matched = not _any_value(actual, _filter_values(operand))
+        elif op in FILTER_COMPARISONS:
+            try:
+                matched = FILTER_COMPARISONS[op](actual, operand)
+            except TypeError:
+                matched = False  # e.g. a range over a string value
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if not matched:
+            return False
+    return True
+
+
+def matches_filter(metadata: Dict[str, Any], filter_dict: Dict[str, Any]) -> bool:
+    """Check metadata against a filter dict; every condition must hold."""
+    for key, condition in filter_dict.items():
+        if key not in metadata or not _condition_matches(metadata[key], condition):
+            return False
+    return True
+
+
+def _chroma_value(value: Any) -> Any:
+    """Chroma only accepts plain str/int/float/bool operands."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _filter_excludes_all(filter_dict: Optional[Dict[str, Any]]) -> bool:
+    """True if some condition accepts no value at all (an empty IN list)."""
+    for condition in (filter_dict or {}).values():
+        if isinstance(condition, dict):
+            condition = condition.get("$in", [None])
+        if isinstance(condition, (list, tuple, set, frozenset)) and not condition:
+            return True
+    return False
+
+
+def _chroma_where(filter_dict: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Compile a filter dict into a Chroma where clause ($eq/$in/ranges joined by $and)."""
+    clauses = []
+    for key, condition in (filter_dict or {}).items():
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op not in FILTER_OPERATORS:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+                if op in ("$in", "$nin"):
+                    operand = [_chroma_value(v) for v in _filter_values(operand)]
+                    if not operand:
+                        continue  # Chroma rejects empty lists; see _filter_excludes_all for $in
+                else:
+                    operand = _chroma_value(operand)
+                clauses.append({key: {op: operand}})
+        elif isinstance(condition, (list, tuple, set, frozenset)):
+            clauses.append({key: {"$in": [_chroma_value(v) for v in condition]}})
+        else:
+            clauses.append({key: {"$eq": _chroma_value(condition)}})
+    
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _popcount(words: np.ndarray) -> int:
+    """Number of set bits in a packed bitmap."""
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return int(np.bitwise_count(words).sum())
+    return int(np.unpackbits(words.view(np.uint8)).sum())
+
+
+def _bitmap_ids(words: np.ndarray) -> np.ndarray:
+    """Ascending ids of the set bits of a packed bitmap."""
+    return np.flatnonzero(np.unpackbits(words.view(np.uint8), bitorder="little"))
+
+
+def _ids_bitmap(ids: np.ndarray, size: int = 0) -> np.ndarray:
+    """Pack an int64 id array into a bitmap of at least size words."""
+    words = np.zeros(max(size, (int(ids.max()) >> 6) + 1 if len(ids) else 0), dtype=np.uint64)
+    np.bitwise_or.at(words, ids >> 6, np.left_shift(np.uint64(1), (ids & 63).astype(np.uint64)))
+    return words
+
+
+def _bitmap_contains(words: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Boolean mask of which ids are set in a packed bitmap."""
+    slots = ids >> 6
+    inside = slots < len(words)
+    mask = np.zeros(len(ids), dtype=bool)
+    mask[inside] = (words[slots[inside]] >> (ids[inside] & 63).astype(np.uint64)) & np.uint64(1) == 1
+    return mask
+
+
+class PostingList:
+    """
+    Ids of the items holding one metadata value.
+    
+    A list starts as a set and is packed into a bitmap (one bit per id in
+    little-endian uint64 words) once it covers more than 1/DENSE_RATIO of
+    its id range. Values of low-cardinality keys (requirement type, project,
+    priority) therefore cost one bit per document however many documents
+    they cover, and unions, intersections and counts run a word at a time,
+    while unique values (requirement ids) stay small sets.
+    """
+    
+    DENSE_RATIO = 256
+    MIN_DENSE = 64
+    
+    __slots__ = ("ids", "words", "count", "high")
+    
+    def __init__(self, ids: Optional[Set[int]] = None, words: Optional[np.ndarray] = None):
+        self.ids = ids if ids is not None or words is not None else set()
+        self.words = words
+        if words is not None:
+            self.count = _popcount(words)
+            self.high = 64 * len(words) - 1
+        else:
+            self.count = len(self.ids)
+            self.high = max(self.ids, default=-1)
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __contains__(self, item_id: int) -> bool:
+        if self.words is None:
+            return item_id in self.ids
+        slot = item_id >> 6
+        return slot < len(self.words) and bool((int(self.words[slot]) >> (item_id & 63)) & 1)
+    
+    @property
+    def dense(self) -> bool:
+        return self.words is not None
+    
+    def add(self, item_id: int) -> None:
+        if self.words is None:
+            if item_id not in self.ids:
+                self.ids.add(item_id)
+                self.count += 1
+                self.high = max(self.high, item_id)
+                self._maybe_pack()
+            return
+        
+        slot = item_id >> 6
+        if slot >= len(self.words):
+            # Amortized doubling, like EmbeddingMatrix rows
+            grown = np.zeros(max(slot + 1, 2 * len(self.words)), dtype=np.uint64)
+            grown[:len(self.words)] = self.words
+            self.words = grown
+        bit = np.uint64(1 << (item_id & 63))
+        if not self.words[slot] & bit:
+            self.words[slot] |= bit
+            self.count += 1
+    
+    def discard(self, item_id: int) -> None:
+        if self.words is None:
+            if item_id in self.ids:
+                self.ids.discard(item_id)
+                self.count -= 1
+            return
+        
+        if item_id in self:
+            self.words[item_id >> 6] &= ~np.uint64(1 << (item_id & 63))
+            self.count -= 1
+    
+    def update(self, item_ids: np.ndarray) -> None:
+        """Add many ids at once."""
+        if not len(item_ids):
+            return
+        item_ids = np.asarray(item_ids, dtype=np.int64)
+        if self.words is None:
+            self.ids.update(item_ids.tolist())
+            self.count = len(self.ids)
+            self.high = max(self.high, int(item_ids.max()))
+            self._maybe_pack()
+            return
+        
+        words = _ids_bitmap(item_ids, len(self.words))
+        words[:len(self.words)] |= self.words
+        self.words = words
+        self.count = _popcount(words)
+    
+    def _maybe_pack(self) -> None:
+        if self.count >= self.MIN_DENSE and self.count * self.DENSE_RATIO > self.high:
+            self.words = self.bitmap()
+            self.ids = None
+    
+    def copy(self) -> "PostingList":
+        if self.words is not None:
+            return PostingList(words=self.words.copy())
+        return PostingList(set(self.ids))
+    
+    def bitmap(self, size: int = 0) -> np.ndarray:
+        """The ids as packed words, padded to at least size words."""
+        if self.words is not None:
+            if len(self.words) >= size:
+                return self.words
+            return np.concatenate([self.words, np.zeros(size - len(self.words), dtype=np.uint64)])
+        return _ids_bitmap(self.to_array(), size)
+    
+    def to_array(self) -> np.ndarray:
+        """Ascending int64 array of the ids."""
+        if self.words is not None:
+            return _bitmap_ids(self.words)
+        return np.sort(np.fromiter(self.ids, dtype=np.int64, count=len(self.ids)))
+    
+    @staticmethod
+    def union(lists: List["PostingList"]) -> "PostingList":
+        """Ids in any of the lists."""
+        lists = [posting for posting in lists if posting.count]
+        if not lists:
+            return PostingList()
+        if len(lists) == 1:
+            return lists[0]
+        if not any(posting.dense for posting in lists):
+            return PostingList(set().union(*(posting.ids for posting in lists)))
+        
+        size = max(len(posting.words) if posting.dense else (posting.high >> 6) + 1 for posting in lists)
+        words = np.zeros(size, dtype=np.uint64)
+        for posting in lists:
+            packed = posting.bitmap()
+            words[:len(packed)] |= packed
+        return PostingList(words=words)
+    
+    def intersection(self, other: "PostingList") -> "PostingList":
+        """Ids in both lists; sparse when either side is."""
+        if self.dense and other.dense:
+            size = min(len(self.words), len(other.words))
+            return PostingList(words=self.words[:size] & other.words[:size])
+        sparse, probe = (self, other) if not self.dense and (other.dense or self.count <= other.count) else (other, self)
+        if not probe.dense:
+            return PostingList(sparse.ids & probe.ids)
+        ids = sparse.to_array()
+        return PostingList(set(ids[_bitmap_contains(probe.words, ids)].tolist()))
+    
+    def intersection_count(self, other: "PostingList") -> int:
+        """Size of the intersection, without materializing sparse results."""
+        if self.dense and other.dense:
+            size = min(len(self.words), len(other.words))
+            return _popcount(self.words[:size] & other.words[:size])
+        sparse, probe = (self, other) if not self.dense else (other, self)
+        if not probe.dense:
+            small, large = sorted((sparse.ids, probe.ids), key=len)
+            return sum(1 for item_id in small if item_id in large)
+        return int(_bitmap_contains(probe.words, sparse.to_array()).sum())
+    
+    def nbytes(self) -> int:
+        return self.words.nbytes if self.words is not None else 64 * self.count  # Rough set overhead
+
+
+def _posting_key(value: Any) -> str:
+    """
+    Key a scalar metadata value is posted and counted under: its JSON encoding.
+    
+    Segments store posting lists by the same encoding, so raw values from
+    the overlay and JSON-decoded ones from a segment share a key, while
+    True and 1 (equal and equally hashed in Python) stay apart. Integral
+    floats are keyed as ints, as dict lookups matched them before. Lists,
+    dicts and arrays raise TypeError and are left unindexed.
+    """
+    if isinstance(value, (list, tuple, set, frozenset, dict, np.ndarray)):
+        raise TypeError(f"Cannot post a {type(value).__name__} metadata value")
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return json.dumps(value, default=json_default)
+
+
+def _facet_label(value: Any) -> Any:
+    """Facet count key of a metadata value: strings as-is, anything else as its JSON encoding ("true", "1")."""
+    return value if isinstance(value, str) else _posting_key(value)
+
+
+class MetadataIndex:
+    """
+    Posting lists over document metadata, used to plan filtered searches and
+    count facets.
+    
+    Maps key -> _posting_key(value) -> PostingList of item ids. List and
+    dict values cannot be posted, so their items are kept in a per-key
+    overflow list and are always verified against the filter instead.
+    """
+    
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, PostingList]] = {}
+        self.unindexed: Dict[str, PostingList] = {}
+    
+    def _posting(self, key: str, value: Any) -> PostingList:
+        """Posting list for one value, created on first use."""
+        try:
+            encoded = _posting_key(value)
+        except TypeError:
+            return self.unindexed.setdefault(key, PostingList())
+        posting = self.postings.setdefault(key, {}).get(encoded)
+        if posting is None:
+            posting = self.postings[key][encoded] = PostingList()
+        return posting
+    
+    def add(self, item_id: int, metadata: Dict[str, Any]) -> None:
+        for key, value in metadata.items():
+            self._posting(key, value).add(item_id)
+    
+    def add_rows(self, key: str, value: Any, item_ids: np.ndarray) -> None:
+        """Post many items under one value at once (e.g. from a segment)."""
+        self._posting(key, value).update(item_ids)
+    
+    def remove(self, item_id: int, metadata: Dict[str, Any]) -> None:
+        for key, value in metadata.items():
+            try:
+                encoded = _posting_key(value)
+            except TypeError:
+                posting = self.unindexed.get(key)
+                if posting is not None:
+                    posting.discard(item_id)
+                continue
+            posting = self.postings.get(key, {}).get(encoded)
+            if posting is not None:
+                posting.discard(item_id)
+                if not posting:
+                    self.postings[key].pop(encoded, None)
+    
+    def clear(self) -> None:
+        self.postings.clear()
+        self.unindexed.clear()
+    
+    def _matching(self, key: str, value: Any) -> List[PostingList]:
+        """Posting lists that may satisfy one filter entry."""
+        values = self.postings.get(key, {})
+        lists = []
+        if isinstance(value, dict):
+            # Operator conditions are evaluated against each distinct value
+            lists = [
+                posting for encoded, posting in values.items()
+                if posting and _condition_matches(json.loads(encoded), value)
+            ]
+        else:
+            for v in _filter_values(value):
+                try:
+                    posting = values.get(_posting_key(v))
+                except TypeError:
+                    continue
+                if posting:
+                    lists.append(posting)
+        if self.unindexed.get(key):
+            lists.append(self.unindexed[key])
+        return lists
+    
+    def estimate(self, key: str, value: Any) -> int:
+        """Upper bound on the number of items matching one filter entry."""
+        return sum(len(posting) for posting in self._matching(key, value))
+    
+    def candidates(self, filter_dict: Dict[str, Any], verify: Callable[[int], bool]) -> PostingList:
+        """Ids matching every filter entry. Overflow items are checked with verify."""
+        result = None
+        # Intersect smallest first
+        for key, value in sorted(filter_dict.items(), key=lambda item: self.estimate(*item)):
+            matching = PostingList.union(self._matching(key, value))
+            result = matching if result is None else result.intersection(matching)
+            if not result:
+                return PostingList()
+        
+        overflow = [self.unindexed[key] for key in filter_dict if self.unindexed.get(key)]
+        if overflow:
+            # Copy before pruning: result may alias a live posting list
+            result = result.copy()
+            for posting in overflow:
+                for idx in posting.to_array().tolist():
+                    if idx in result and not verify(idx):
+                        result.discard(idx)
+        return result if result is not None else PostingList()
+    
+    def facet_counts(
+        self,
+        keys: List[str],
+        selection: Optional[PostingList] = None,
+        max_values: Optional[int] = None
+    ) -> Dict[str, Dict[Any, int]]:
+        """
+        Number of items per value of each key, optionally within selection.
+        
+        Values are ordered by descending count and truncated to max_values,
+        and labelled by _facet_label. List and dict values are not counted.
+        """
+        facets = {}
+        for key in keys:
+            counts = {}
+            for encoded, posting in self.postings.get(key, {}).items():
+                count = len(posting) if selection is None else posting.intersection_count(selection)
+                if count:
+                    value = json.loads(encoded)
+                    counts[value if isinstance(value, str) else encoded] = count
+            facets[key] = _top_facets(counts, max_values)
+        return facets
+    
+    def stats(self) -> Dict[str, Any]:
+        lists = [posting for values in self.postings.values() for posting in values.values()]
+        return {
+            "keys": len(self.postings),
+            "posting_lists": len(lists),
+            "bitmap_lists": sum(posting.dense for posting in lists),
+            "bytes": sum(posting.nbytes() for posting in lists)
+        }
+
+
+def _top_facets(counts: Dict[Any, int], max_values: Optional[int]) -> Dict[Any, int]:
+    """Facet counts ordered by descending count, keeping the max_values largest."""
+    ordered = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+    return dict(ordered[:max_values] if max_values else ordered)
+
+
+def _fsync_path(path: str) -> None:
+    """fsync a file or directory by path (directories only where supported)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """
+    Append-only, checksummed operation log.
+    
+    Each record is MAGIC | header length | payload length | crc32 | JSON
+    header | raw payload bytes. Headers carry a monotonically increasing
+    sequence number so recovery can skip records already captured by a
+    snapshot. A torn record at the tail (crash mid-append) is truncated
+    when the log is opened.
+    """
+    
+    MAGIC = b"JWAL"
+    _PREFIX = struct.Struct("<4sIQI")
+    
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self.sequence = 0
+        self._file = None
+    
+    def open(self) -> List[Tuple[Dict[str, Any], bytes]]:
+        """Open the log for appending and return every intact record in it."""
+        records = []
+        valid_end = 0
+        
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                while True:
+                    prefix = f.read(self._PREFIX.size)
+                    if len(prefix) < self._PREFIX.size:
+                        break
+                    magic, header_length, payload_length, checksum = self._PREFIX.unpack(prefix)
+                    if magic != self.MAGIC:
+                        break
+                    body = f.read(header_length + payload_length)
+                    if len(body) < header_length + payload_length or zlib.crc32(body) != checksum:
+                        break
+                    
+                    header = json.loads(body[:header_length].decode("utf-8"))
+                    records.append((header, body[header_length:]))
+                    self.sequence = max(self.sequence, header["seq"])
+                    valid_end = f.tell()
+            
+            if valid_end < os.path.getsize(self.path):
+                logger.warning(f"Truncating torn write-ahead log tail in {self.path} at byte {valid_end}")
+                with open(self.path, "r+b") as f:
+                    f.truncate(valid_end)
+        
+        self._file = open(self.path, "ab")
+        return records
+    
+    def append(self, header: Dict[str, Any], payload: bytes = b"") -> int:
+        """Durably append one record. Returns its sequence number."""
+        self.sequence += 1
+        header_bytes = json.dumps(dict(header, seq=self.sequence), default=json_default).encode("utf-8")
+        body = header_bytes + payload
+        
+        self._file.write(self._PREFIX.pack(self.MAGIC, len(header_bytes), len(payload), zlib.crc32(body)))
+        self._file.write(body)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        return self.sequence
+    
+    def size_bytes(self) -> int:
+        return self._file.tell() if self._file else 0
+    
+    def reset(self) -> None:
+        """Discard all records once a snapshot has captured them."""
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+    
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class ReadWriteLock:
+    """
+    Asyncio reader/writer lock.
+    
+    Any number of readers (searches) hold it together; a writer (a batch
+    commit) waits for them to drain and then holds it alone, so readers
+    never observe a half-applied batch. Phases alternate: readers arriving
+    while a writer waits queue behind it, so a steady stream of searches
+    cannot starve an ingest, and readers that waited through a commit go
+    before the next one, so back-to-back batches cannot starve searches.
+    """
+    
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self.readers = 0
+        self.readers_waiting = 0
+        self.writing = False
+        self.writers_waiting = 0
+        self.commits = 0
+    
+    @contextlib.asynccontextmanager
+    async def read(self):
+        async with self._condition:
+            arrived = self.commits
+            self.readers_waiting += 1
+            try:
+                await self._condition.wait_for(
+                    lambda: not self.writing and (not self.writers_waiting or self.commits != arrived)
+                )
+            finally:
+                self.readers_waiting -= 1
+            self.readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.readers -= 1
+                if not self.readers:
+                    self._condition.notify_all()
+    
+    @contextlib.asynccontextmanager
+    async def write(self):
+        if self.readers_waiting:
+            # Let readers woken by the previous commit in before queueing again
+            await asyncio.sleep(0)
+        async with self._condition:
+            self.writers_waiting += 1
+            try:
+                await self._condition.wait_for(lambda: not self.writing and not self.readers)
+            finally:
+                self.writers_waiting -= 1
+            self.writing = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.writing = False
+                self.commits += 1
+                self._condition.notify_all()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_readers": self.readers,
+            "readers_waiting": self.readers_waiting,
+            "writer_active": self.writing,
+            "writers_waiting": self.writers_waiting,
+            "commits": self.commits
+        }
+
+
+class DocumentTable:
+    """
+    Documents addressed by id and by an integer store key (the faiss id, or
+    an insertion counter), layered over an optional memory-mapped Segment.
+    
+    Added and updated documents (the overlay) are written to a
+    ContentStore if one is given, or else kept in a dict; everything else
+    is decoded from the segment on access, with overwritten or deleted rows
+    masked out. Opening a persisted corpus therefore costs nothing up
+    front, and only ids and keys of the overlay stay resident. Documents
+    hydrated from the segment or the content store are kept in an LRU
+    cache of cache_size entries.
+    """
+    
+    def __init__(
+        self,
+        segment: Optional[Segment] = None,
+        content_store: Optional[ContentStore] = None,
+        cache_size: int = 0
+    ):
+        self.segment = segment
+        self.content_store = content_store
+        self.documents: Dict[str, VectorDocument] = {}  # Overlay, without a content store
+        self.id_to_key: Dict[str, int] = {}
+        self.key_to_id: Dict[int, str] = {}
+        rows = len(segment) if segment is not None else 0
+        self.shadowed = np.zeros(rows, dtype=bool)  # Segment rows overwritten or deleted since
+        self.segment_live = rows
+        
+        self.cache: "OrderedDict[str, VectorDocument]" = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    def __len__(self) -> int:
+        return len(self.id_to_key) + self.segment_live
+    
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self.id_to_key or self._segment_row(document_id) is not None
+    
+    def _segment_row(self, document_id: str) -> Optional[int]:
+        if self.segment is None:
+            return None
+        row = self.segment.row_of_id(document_id)
+        if row is None or self.shadowed[row]:
+            return None
+        return row
+    
+    def _document(self, row: int) -> VectorDocument:
+        segment = self.segment
+        return VectorDocument(
+            id=segment.document_id(row),
+            content=segment.content(row),
+            metadata=segment.metadata(row),
+            embedding=segment.vector(row),
+            created_at=segment.created(row)
+        )
+    
+    def _stored_document(self, key: int) -> VectorDocument:
+        document_id, content, metadata, created_at, embedding = self.content_store.get(key)
+        return VectorDocument(
+            id=document_id,
+            content=content,
+            metadata=metadata,
+            embedding=embedding,
+            created_at=created_at
+        )
+    
+    def _overlay_document(self, document_id: str) -> VectorDocument:
+        if self.content_store is None:
+            return self.documents[document_id]
+        return self._stored_document(self.id_to_key[document_id])
+    
+    def get(self, document_id: str) -> Optional[VectorDocument]:
+        document = self.documents.get(document_id)
+        if document is not None:
+            return document
+        
+        document = self.cache.get(document_id)
+        if document is not None:
+            self.cache.move_to_end(document_id)
+            self.cache_hits += 1
+            return document
+        
+        if document_id in self.id_to_key:
+            document = self._overlay_document(document_id)
+        else:
+            row = self._segment_row(document_id)
+            if row is None:
+                return None
+            document = self._document(row)
+        
+        self.cache_misses += 1
+        if self.cache_size > 0:
+            self.cache[document_id] = document
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return document
+    
+    def metadata(self, document_id: str) -> Dict[str, Any]:
+        """Metadata only, without decoding content or vectors."""
+        document = self.documents.get(document_id) or self.cache.get(document_id)
+        if document is not None:
+            return document.metadata
+        key = self.id_to_key.get(document_id)
+        if key is not None:
+            return self.content_store.metadata(key)
+        return self.segment.metadata(self._segment_row(document_id))
+    
+    def key_of(self, document_id: str) -> Optional[int]:
+        key = self.id_to_key.get(document_id)
+        if key is not None:
+            return key
+        row = self._segment_row(document_id)
+        return None if row is None else int(self.segment.keys[row])
+    
+    def id_of(self, key: int) -> Optional[str]:
+        document_id = self.key_to_id.get(key)
+        if document_id is not None or self.segment is None:
+            return document_id
+        row = self.segment.row_of_key(key)
+        if row is None or self.shadowed[row]:
+            return None
+        return self.segment.document_id(row)
+    
+    def put(self, document: VectorDocument, key: int) -> None:
+        """Store a document under key, shadowing any segment row for its id."""
+        row = self._segment_row(document.id)
+        if row is not None:
+            self.shadowed[row] = True
+            self.segment_live -= 1
+        previous = self.id_to_key.get(document.id)
+        if previous is not None:
+            self.key_to_id.pop(previous, None)
+            if self.content_store is not None:
+                self.content_store.discard(previous)
+                self.content_store.maybe_compact()
+        
+        if self.content_store is not None:
+            self.content_store.put(
+                key, document.id, document.content, document.metadata, document.created_at, document.embedding
+            )
+        else:
+            self.documents[document.id] = document
+        self.id_to_key[document.id] = key
+        self.key_to_id[key] = document.id
+        self.cache.pop(document.id, None)
+    
+    def remove(self, document_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Remove a document. Returns its key and metadata, or None if absent."""
+        self.cache.pop(document_id, None)
+        key = self.id_to_key.pop(document_id, None)
+        if key is not None:
+            self.key_to_id.pop(key, None)
+            if self.content_store is None:
+                return key, self.documents.pop(document_id).metadata
+            metadata = self.content_store.metadata(key)
+            self.content_store.discard(key)
+            self.content_store.maybe_compact()
+            return key, metadata
+        
+        row = self._segment_row(document_id)
+        if row is None:
+            return None
+        self.shadowed[row] = True
+        self.segment_live -= 1
+        return int(self.segment.keys[row]), self.segment.metadata(row)
+    
+    def live_rows(self) -> np.ndarray:
+        """Segment rows that are still current."""
+        return np.flatnonzero(~self.shadowed)
+    
+    def index_segment_postings(self, index: MetadataIndex) -> None:
+        """Post the segment's stored posting lists, by store key, for rows still live."""
+        if self.segment is None:
+            return
+        for key, value, rows in self.segment.postings():
+            live = rows[~self.shadowed[rows]]
+            index.add_rows(key, value, self.segment.keys[live])
+    
+    def keys(self) -> Iterator[int]:
+        """Keys of every live document."""
+        if self.segment is not None:
+            yield from self.segment.keys[self.live_rows()].tolist()
+        yield from self.key_to_id.keys()
+    
+    def items(self) -> Iterator[Tuple[str, int]]:
+        """(document id, key) of every live document."""
+        if self.segment is not None:
+            for row in self.live_rows():
+                yield self.segment.document_id(row), int(self.segment.keys[row])
+        yield from self.id_to_key.items()
+    
+    def embeddings(self, keys: List[int], dimension: int) -> np.ndarray:
+        """Embeddings for live keys, read from the segment where possible."""
+        vectors = np.zeros((len(keys), dimension), dtype=np.float32)
+        if self.segment is not None and self.segment.vectors is not None:
+            keys_array = np.asarray(keys, dtype=np.int64)
+            in_overlay = np.fromiter((key in self.key_to_id for key in keys), dtype=bool, count=len(keys))
+            segment_positions = np.flatnonzero(~in_overlay)
+            vectors[segment_positions] = self.segment.vectors[self.segment.rows_of_keys(keys_array[segment_positions])]
+            overlay = np.flatnonzero(in_overlay).tolist()
+        else:
+            overlay = range(len(keys))
+        
+        for position in overlay:
+            key = keys[position]
+            if self.content_store is not None:
+                vectors[position] = self.content_store.embedding(key)
+            else:
+                vectors[position] = self.documents[self.key_to_id[key]].embedding
+        return vectors
+    
+    def stats(self) -> Dict[str, Any]:
+        """Overlay, content store and hydration cache figures for get_stats."""
+        return {
+            "overlay_documents": len(self.id_to_key),
+            "segment_documents": self.segment_live,
+            "content_store": self.content_store.stats() if self.content_store is not None else None,
+            "cache_size": len(self.cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses
+        }
+    
+    def write_segment(
+        self,
+        path: str,
+        dimension: int,
+        with_vectors: bool = True,
+        attributes: Optional[Dict[str, Any]] = None,
+        extras: Optional[Dict[str, np.ndarray]] = None
+    ) -> None:
+        """Write every live document, in key order, to a new segment at path."""
+        rows = []  # (key, segment row or None, document id)
+        if self.segment is not None:
+            live = self.live_rows()
+            rows.extend(zip(self.segment.keys[live].tolist(), live.tolist(), [None] * len(live)))
+        rows.extend((key, None, document_id) for key, document_id in self.key_to_id.items())
+        rows.sort(key=lambda row: row[0])
+        
+        writer = SegmentWriter(path, len(rows), dimension, with_vectors=with_vectors)
+        try:
+            for key, row, document_id in rows:
+                if row is not None:
+                    segment = self.segment
+                    metadata_json = segment.metadata_json(row)
+                    writer.append(
+                        segment.document_id(row), key, segment.content(row), json.loads(metadata_json),
+                        created_at=segment.created(row),
+                        vector=segment.vectors[row] if with_vectors and segment.vectors is not None else None,
+                        metadata_json=metadata_json
+                    )
+                else:
+                    document = self._overlay_document(document_id)
+                    writer.append(
+                        document.id, key, document.content, document.metadata,
+                        created_at=document.created_at,
+                        vector=document.embedding if with_vectors else None
+                    )
+            writer.close(attributes, extras)
+        except Exception:
+            writer.abort()
+            raise
+
+
+class BaseVectorStore(ABC):
+    """Abstract base class for vector stores."""
+    
+    def __init__(self, config: VectorStoreConfig):
+        self.config = config
+        self.is_initialized = False
+    
+    @abstractmethod
+    async def initialize(self) -> None:
+        """Initialize the vector store."""
+        pass
+    
+    @abstractmethod
+    async def add_documents(self, documents: List[VectorDocument]) -> None:
+        """Add documents to the store."""
+        pass
+    
+    @abstractmethod
+    async def search(
+        self, 
+        query_embedding: np.ndarray, 
+        limit: int = None,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[SearchResult]:
+        """Search for similar documents."""
+        pass
+    
+    async def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        limits: Union[int, List[Optional[int]], None] = None,
+        filters: Union[Dict[str, Any], List[Optional[Dict[str, Any]]], None] = None
+    ) -> List[List[SearchResult]]:
+        """
+        Search for many queries at once.
+        
+        Args:
+            query_embeddings: (N, D) query matrix
+            limits: One limit for all queries, or one per query
+            filters: One metadata filter for all queries, or one per query
+        
+        Returns:
+            One result list per query, in query order
+        """
+        queries, limits, filters = self._batch_arguments(query_embeddings, limits, filters)
+        return [
+            await self.search(query, limit=limit, filter_metadata=filter_metadata)
+            for query, limit, filter_metadata in zip(queries, limits, filters)
+        ]
+    
+    def _batch_arguments(
+        self,
+        query_embeddings: np.ndarray,
+        limits: Union[int, List[Optional[int]], None],
+        filters: Union[Dict[str, Any], List[Optional[Dict[str, Any]]], None]
+    ) -> Tuple[np.ndarray, List[int], List[Optional[Dict[str, Any]]]]:
+        """Normalize search_batch arguments to a float32 matrix and per-query lists."""
+        queries = np.array(query_embeddings, dtype=np.float32, ndmin=2)
+        count = len(queries)
+        
+        if not isinstance(limits, (list, tuple)):
+            limits = [limits] * count
+        if not isinstance(filters, (list, tuple)):
+            filters = [filters] * count
+        if len(limits) != count or len(filters) != count:
+            raise ValueError(f"Expected {count} limits and filters, got {len(limits)} and {len(filters)}")
+        
+        limits = [limit or self.config.max_results for limit in limits]
+        return queries, limits, list(filters)
+    
+    @abstractmethod
+    async def range_search(
+        self,
+        query_embedding: np.ndarray,
+        min_similarity: Optional[float] = None,
+        max_results: Optional[int] = None,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[SearchResult]:
+        """
+        Find every document at least min_similarity to the query.
+        
+        Unlike search(), the answer is not cut at a limit guessed up front,
+        so "everything above 0.85" is complete.
+        
+        Args:
+            query_embedding: Query vector
+            min_similarity: Similarity radius (config similarity_threshold if None)
+            max_results: Cap on the number of results, best first (unbounded if None)
+            filter_metadata: Metadata filter, as for search()
+        
+        Returns:
+            Matching documents by descending similarity
+        """
+        pass
+    
+    @abstractmethod
+    async def facet_counts(
+        self,
+        keys: List[str],
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        max_values: Optional[int] = None
+    ) -> Dict[str, Dict[Any, int]]:
+        """
+        Count stored documents per metadata value.
+        
+        Args:
+            keys: Metadata keys to count values of
+            filter_metadata: Only count documents matching this filter
+            max_values: Most frequent values kept per key (config default if None)
+        
+        Returns:
+            key -> value -> document count, by descending count. Non-string
+            values are keyed by their JSON encoding, so True and 1 stay apart
+        """
+        pass
+    
+    @abstractmethod
+    async def delete_documents(self, document_ids: List[str]) -> None:
+        """Delete documents from the store."""
+        pass
+    
+    @abstractmethod
+    async def get_document(self, document_id: str) -> Optional[VectorDocument]:
+        """Get a specific document by ID."""
+        pass
+    
+    @abstractmethod
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics."""
+        pass
+    
+    @abstractmethod
+    async def close(self) -> None:
+        """Close the vector store."""
+        pass
+
+
+class ChromaDBStore(BaseVectorStore):
+    """
+    ChromaDB implementation of vector store.
+    
+    Ingestion upserts in batches of at most chroma_batch_size documents
+    (capped at the client's maximum batch size), keeping up to
+    chroma_ingest_concurrency batches in flight on a dedicated executor so
+    that preparing one batch overlaps with writing the others. Upserts make
+    re-ingesting a project, or retrying a failed ingest, idempotent.
+    
+    Filters are compiled to Chroma where clauses so they run inside Chroma.
+    New collections use chroma_hnsw_space and the configured HNSW
+    parameters; distances are converted to similarities for the space the
+    collection actually has, so similarity_threshold keeps its meaning.
+    """
+    
+    def __init__(self, config: VectorStoreConfig):
+        super().__init__(config)
+        if not CHROMADB_AVAILABLE:
+            raise ImportError("ChromaDB is not available. Install with: pip install chromadb")
+        
+        self.client = None
+        self.collection = None
+        self.max_batch_size = config.chroma_batch_size
+        self.space = config.chroma_hnsw_space
+        self._ingest_executor: Optional[ThreadPoolExecutor] = None
+        self.last_ingest: Optional[Dict[str, Any]] = None  # Progress of the current/last add_documents call
+    
+    async def initialize(self) -> None:
+        """Initialize ChromaDB client and collection."""
+        try:
+            if self.config.chroma_host and self.config.chroma_port:
+                # Remote ChromaDB instance
+                self.client = chromadb.HttpClient(
+                    host=self.config.chroma_host,
+                    port=self.config.chroma_port
+                )
+            else:
+                # Local persistent client
+                settings = Settings()
+                if self.config.persist_directory:
+                    settings.persist_directory = self.config.persist_directory
+                    settings.is_persistent = True
+                
+                self.client = chromadb.Client(settings)
+            
+            if self.config.chroma_hnsw_space not in CHROMA_SPACES:
+                raise ValueError(f"Unsupported ChromaDB space: {self.config.chroma_hnsw_space}")
+            
+            # Get or create collection
+            try:
+                self.collection = self.client.get_collection(
+                    name=self.config.collection_name
+                )
+                logger.info(f"Connected to existing ChromaDB collection: {self.config.collection_name}")
+                self._configure_existing_collection()
+            except ValueError:
+                raise
+            except:
+                self.collection = self.client.create_collection(
+                    name=self.config.collection_name,
+                    metadata={
+                        "description": "Jama requirements vector store",
+                        "hnsw:space": self.config.chroma_hnsw_space,
+                        "hnsw:M": self.config.chroma_hnsw_m,
+                        "hnsw:construction_ef": self.config.chroma_hnsw_construction_ef,
+                        "hnsw:search_ef": self.config.chroma_hnsw_search_ef
+                    }
+                )
+                self.space = self.config.chroma_hnsw_space
+                logger.info(
+                    f"Created new ChromaDB collection: {self.config.collection_name} "
+                    f"(space={self.space}, M={self.config.chroma_hnsw_m})"
+                )
+            
+            # Older clients do not report a limit
+            get_max_batch_size = getattr(self.client, "get_max_batch_size", None)
+            if get_max_batch_size is not None:
+                self.max_batch_size = min(self.config.chroma_batch_size, get_max_batch_size())
+            self._ingest_executor = ThreadPoolExecutor(
+                max_workers=max(1, self.config.chroma_ingest_concurrency),
+                thread_name_prefix="chroma-ingest"
+            )
+            
+            self.is_initialized = True
+            logger.info("ChromaDB store initialized successfully")
+            
+        except Exception as e:
+            logger.error(f"Failed to initialize ChromaDB: {e}")
+            raise
+    
+    def _configure_existing_collection(self) -> None:
+        """Adopt an existing collection's distance space and apply the configured search ef."""
+        hnsw = self._hnsw_configuration()
+        # Collections created before hnsw:space was set use Chroma's default (l2)
+        self.space = hnsw.get("space") or (self.collection.metadata or {}).get("hnsw:space", "l2")
+        if self.space != self.config.chroma_hnsw_space:
+            logger.warning(
+                f"ChromaDB collection {self.config.collection_name} uses space '{self.space}', "
+                f"not the configured '{self.config.chroma_hnsw_space}'; re-create it to change the space"
+            )
+        
+        if hnsw and hnsw.get("ef_search") != self.config.chroma_hnsw_search_ef:
+            try:
+                self.collection.modify(configuration={"hnsw": {"ef_search": self.config.chroma_hnsw_search_ef}})
+            except Exception as e:
+                logger.warning(f"Could not update ChromaDB search ef: {e}")
+    
+    def _hnsw_configuration(self) -> Dict[str, Any]:
+        """HNSW settings of the collection; empty on clients without collection configuration."""
+        try:
+            configuration = getattr(self.collection, "configuration", None) or {}
+            return dict(configuration.get("hnsw") or {})
+        except Exception:
+            return {}
+    
+    def _to_similarity(self, distance: float) -> float:
+        """Convert a Chroma distance to a similarity in the collection's space."""
+        if self.space == "l2":
+            # Squared L2; equals cosine similarity for unit-length embeddings
+            return 1 - distance / 2
+        return 1 - distance  # cosine distance, or 1 - inner product
+    
+    async def add_documents(
+        self,
+        documents: List[VectorDocument],
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> None:
+        """
+        Upsert documents into the ChromaDB collection in pipelined batches.
+        
+        Args:
+            documents: Documents to add or replace; all must have embeddings
+            progress_callback: Called with (documents written, total) after each batch
+        """
+        if not self.is_initialized:
+            await self.initialize()
+        
+        if not documents:
+            return
+        
+        missing = sum(1 for doc in documents if doc.embedding is None)
+        if missing:
+            raise ValueError(f"{missing} documents have no embedding; ChromaDBStore requires precomputed embeddings")
+        
+        loop = asyncio.get_event_loop()
+        total = len(documents)
+        batch_size = max(1, self.max_batch_size)
+        self.last_ingest = {"total": total, "written": 0, "batches": 0, "batch_size": batch_size}
+        
+        pending = set()
+        try:
+            for start in range(0, total, batch_size):
+                # Bound the number of batches in flight
+                if len(pending) >= self.config.chroma_ingest_concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    self._finish_batches(done, progress_callback)
+                
+                batch = self._prepare_batch(documents[start:start + batch_size])
+                pending.add(loop.run_in_executor(self._ingest_executor, self._upsert_batch, batch))
+            
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                self._finish_batches(done, progress_callback)
+        except BaseException:
+            # Let batches already handed to the executor finish before reporting
+            if pending:
+                await asyncio.wait(pending)
+            raise
+        
+        logger.info(f"Upserted {total} documents to ChromaDB in {self.last_ingest['batches']} batches")
+    
+    def _prepare_batch(self, documents: List[VectorDocument]) -> Dict[str, Any]:
+        """Build upsert arguments for one batch (plain lists: chromadb 0.4 rejects ndarrays)."""
+        metadatas = []
+        for doc in documents:
+            # Prepare metadata (ChromaDB requires JSON-serializable values)
+            metadata = dict(doc.metadata)
+            metadata['created_at'] = doc.created_at.isoformat() if doc.created_at else datetime.now().isoformat()
+            metadatas.append(metadata)
+        
+        return {
+            "ids": [doc.id for doc in documents],
+            "embeddings": np.stack([np.asarray(doc.embedding, dtype=np.float32) for doc in documents]).tolist(),
+            "documents": [doc.content for doc in documents],
+            "metadatas": metadatas
+        }
+    
+    def _upsert_batch(self, batch: Dict[str, Any]) -> int:
+        self.collection.upsert(**batch)
+        return len(batch["ids"])
+    
+    def _finish_batches(self, done: Set[asyncio.Future], progress_callback: Optional[Callable[[int, int], None]]) -> None:
+        """Account for completed upsert batches, re-raising the first failure."""
+        for future in done:
+            self.last_ingest["written"] += future.result()
+            self.last_ingest["batches"] += 1
+        
+        logger.debug(f"ChromaDB ingest progress: {self.last_ingest['written']}/{self.last_ingest['total']}")
+        if progress_callback:
+            progress_callback(self.last_ingest["written"], self.last_ingest["total"])
+    
+    async def search(
+        self,
+        query_embedding: np.ndarray,
+        limit: int = None,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[SearchResult]:
+        """Search ChromaDB for similar documents."""
+        if not self.is_initialized:
+            await self.initialize()
+        
+        limit = limit or self.config.max_results
+        if _filter_excludes_all(filter_metadata):
+            return []
+        
+        # Prepare query
+        query_params = {
+            "query_embeddings": [query_embedding.tolist()],
+            "n_results": limit,
+            "include": ["documents", "metadatas", "distances"]
+        }
+        
+        if filter_metadata:
+            query_params["where"] = _chroma_where(filter_metadata)
+        
+        # Execute search
+        results = await asyncio.get_event_loop().run_in_executor(
+            None,
+            lambda: self.collection.query(**query_params)
+        )
+        
+        search_results = self._to_search_results(results, 0, limit)
+        
+        logger.debug(f"ChromaDB search returned {len(search_results)} results")
+        return search_results
+    
+    async def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        limits: Union[int, List[Optional[int]], None] = None,
+        filters: Union[Dict[str, Any], List[Optional[Dict[str, Any]]], None] = None
+    ) -> List[List[SearchResult]]:
+        """Search ChromaDB with one query call per distinct filter."""
+        if not self.is_initialized:
+            await self.initialize()
+        
+        queries, limits, filters = self._batch_arguments(query_embeddings, limits, filters)
+        
+        # Chroma takes one where clause per call, so group queries by filter
+        groups: Dict[str, List[int]] = {}
+        for i, filter_metadata in enumerate(filters):
+            key = json.dumps(filter_metadata, sort_keys=True, default=json_default)
+            groups.setdefault(key, []).append(i)
+        
+        batch_results: List[List[SearchResult]] = [[] for _ in range(len(queries))]
+        for positions in groups.values():
+            if _filter_excludes_all(filters[positions[0]]):
+                continue
+            query_params = {
+                "query_embeddings": queries[positions].tolist(),  # chromadb 0.4 rejects ndarrays
+                "n_results": max(limits[i] for i in positions),
+                "include": ["documents", "metadatas", "distances"]
+            }
+            if filters[positions[0]]:
+                query_params["where"] = _chroma_where(filters[positions[0]])
+            
+            results = await asyncio.get_event_loop().run_in_executor(
+                None,
+                lambda: self.collection.query(**query_params)
+            )
+            for row, i in enumerate(positions):
+                batch_results[i] = self._to_search_results(results, row, limits[i])
+        
+        logger.debug(f"ChromaDB batch search answered {len(queries)} queries in {len(groups)} calls")
+        return batch_results
+    
+    async def range_search(
+        self,
+        query_embedding: np.ndarray,
+        min_similarity: Optional[float] = None,
+        max_results: Optional[int] = None,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[SearchResult]:
+        """
+        Find every document within a similarity radius.
+        
+        Chroma only answers top-k queries, so the query is repeated with a
+        doubling n_results until a result falls below min_similarity, the
+        collection is exhausted or max_results is reached.
+        """
+        if not self.is_initialized:
+            await self.initialize()
+        
+        if min_similarity is None:
+            min_similarity = self.config.similarity_threshold
+        if _filter_excludes_all(filter_metadata):
+            return []
+        
+        total = await asyncio.get_event_loop().run_in_executor(None, self.collection.count)
+        cap = min(total, max_results or total)
+        if not cap:
+            return []
+        
+        query_params = {
+            "query_embeddings": [query_embedding.tolist()],
+            "include": ["documents", "metadatas", "distances"]
+        }
+        if filter_metadata:
+            query_params["where"] = _chroma_where(filter_metadata)
+        
+        n_results = min(cap, self.config.max_results)
+        while True:
+            query_params["n_results"] = n_results
+            results = await asyncio.get_event_loop().run_in_executor(
+                None,
+                lambda: self.collection.query(**query_params)
+            )
+            distances = results["distances"][0]
+            if (
+                len(distances) < n_results
+                or n_results >= cap
+                or self._to_similarity(distances[-1]) < min_similarity
+            ):
+                break
+            n_results = min(cap, n_results * 2)
+        
+        search_results = self._to_search_results(results, 0, n_results, min_similarity)
+        logger.debug(f"ChromaDB range search returned {len(search_results)} results with n_results={n_results}")
+        return search_results
+    
+    def _to_search_results(
+        self,
+        results: Dict[str, Any],
+        row: int,
+        limit: int,
+        threshold: Optional[float] = None
+    ) -> List[SearchResult]:
+        """Convert one query's rows of a Chroma query response to search results."""
+        if threshold is None:
+            threshold = self.config.similarity_threshold
+        search_results = []
+        
+        for i, (doc_id, distance, document, metadata) in enumerate(zip(
+            results["ids"][row][:limit],
+            results["distances"][row][:limit],
+            results["documents"][row][:limit],
+            results["metadatas"][row][:limit]
+        )):
+            similarity = self._to_similarity(distance)
+            
+            if similarity >= threshold:
+                # Recreate document
+                created_at = None
+                if metadata.get("created_at"):
+                    try:
+                        created_at = datetime.fromisoformat(metadata["created_at"])
+                    except:
+                        pass
+                
+                vector_doc = VectorDocument(
+                    id=doc_id,
+                    content=document,
+                    metadata=metadata,
+                    created_at=created_at
+                )
+                
+                search_results.append(SearchResult(
+                    document=vector_doc,
+                    score=similarity,
+                    rank=i + 1
+                ))
+        
+        return search_results
+    
+    async def facet_counts(
+        self,
+        keys: List[str],
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        max_values: Optional[int] = None
+    ) -> Dict[str, Dict[Any, int]]:
+        """
+        Count documents per metadata value.
+        
+        ChromaDB has no aggregation API, so matching metadatas are paged
+        through with the filter applied server-side and counted here.
+        """
+        if not self.is_initialized:
+            await self.initialize()
+        
+        counts: Dict[str, Dict[Any, int]] = {key: {} for key in keys}
+        if _filter_excludes_all(filter_metadata):
+            return counts
+        where = _chroma_where(filter_metadata)
+        page_size = max(1, self.max_batch_size)
+        
+        def scan() -> None:
+            offset = 0
+            while True:
+                page = self.collection.get(where=where, include=["metadatas"], limit=page_size, offset=offset)
+                metadatas = page["metadatas"] or []
+                for metadata in metadatas:
+                    for key in keys:
+                        value = (metadata or {}).get(key)
+                        if value is not None:
+                            label = _facet_label(value)
+                            counts[key][label] = counts[key].get(label, 0) + 1
+                if len(metadatas) < page_size:
+                    return
+                offset += len(metadatas)
+        
+        await asyncio.get_event_loop().run_in_executor(None, scan)
+        max_values = max_values or self.config.facet_max_values
+        return {key: _top_facets(values, max_values) for key, values in counts.items()}
+    
+    async def delete_documents(self, document_ids: List[str]) -> None:
+        """Delete documents from ChromaDB."""
+        if not self.is_initialized:
+            await self.initialize()
+        
+        await asyncio.get_event_loop().run_in_executor(
+            None,
+            lambda: self.collection.delete(ids=document_ids)
+        )
+        
+        logger.info(f"Deleted {len(document_ids)} documents from ChromaDB")
+    
+    async def get_document(self, document_id: str) -> Optional[VectorDocument]:
+        """Get a specific document from ChromaDB."""
+        if not self.is_initialized:
+            await self.initialize()
+        
+        try:
+            results = await asyncio.get_event_loop().run_in_executor(
+                None,
+                lambda: self.collection.get(ids=[document_id], include=["documents", "metadatas"])
+            )
+            
+            if results["ids"]:
+                doc_id = results["ids"][0]
+                content = results["documents"][0]
+                metadata = results["metadatas"][0]
+                
+                created_at = None
+                if metadata.get("created_at"):
+                    try:
+                        created_at = datetime.fromisoformat(metadata["created_at"])
+                    except:
+                        pass
+                
+                return VectorDocument(
+                    id=doc_id,
+                    content=content,
+                    metadata=metadata,
+                    created_at=created_at
+                )
+        except Exception as e:
+            logger.error(f"Error retrieving document {document_id}: {e}")
+        
+        return None
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get ChromaDB collection statistics."""
+        if not self.is_initialized:
+            await self.initialize()
+        
+        try:
+            count = await asyncio.get_event_loop().run_in_executor(
+                None,
+                self.collection.count
+            )
+            
+            return {
+                "store_type": "chromadb",
+                "collection_name": self.config.collection_name,
+                "document_count": count,
+                "embedding_dimension": self.config.embedding_dimension,
+                "space": self.space,
+                "hnsw": self._hnsw_configuration(),
+                "max_batch_size": self.max_batch_size,
+                "last_ingest": self.last_ingest
+            }
+        except Exception as e:
+            logger.error(f"Error getting ChromaDB stats: {e}")
+            return {"error": str(e)}
+    
+    async def close(self) -> None:
+        """Close ChromaDB connection."""
+        # ChromaDB client doesn't require explicit closing
+        if self._ingest_executor is not None:
+            self._ingest_executor.shutdown(wait=True)
+            self._ingest_executor = None
+        self.is_initialized = False
+        logger.info("ChromaDB store closed")
+
+
+class FAISSStore(BaseVectorStore):
+    """
+    FAISS implementation of vector store.
+    
+    Vectors are stored under stable int64 ids (IndexIDMap2, or natively for
+    IVF), so deletes and re-adds of an existing document remove the old
+    vector instead of leaving it in the index. Indexes that cannot remove
+    vectors in place (HNSW) tombstone them instead, and IVF/HNSW indexes are
+    rebuilt in the background once the deleted fraction passes
+    faiss_compaction_threshold.
+    
+    IVF training is a separate stage: vectors are served from an exact
+    staging index until faiss_ivf_train_min_vectors have arrived, then the
+    IVF index is trained on a reservoir sample with nlist chosen from the
+    corpus size, and retrained whenever the corpus has grown by
+    faiss_ivf_retrain_factor since the last training.
+    
+    Persistence is incremental: every write is appended to a write-ahead
+    log, and a full snapshot (index + document segment, switched in
+    atomically via a manifest) is only taken once the log passes
+    faiss_snapshot_wal_bytes. Startup memory-maps the latest snapshot's
+    index and segment, so it takes constant time, and replays the log
+    after it. A mapped index is loaded in full before its first write.
+    
+    Snapshot format (SNAPSHOT_FORMAT in <collection>.manifest.json):
+    the native FAISS index file with its CRC-32, and a columnar Segment
+    (see segment.py) holding ids, content, metadata, raw float32
+    embeddings and store state. Nothing is pickled; pickled snapshots from
+    older versions are still read and replaced by the next snapshot.
+    
+    Filtered searches are planned from metadata posting lists: filters
+    matching less than faiss_prefilter_selectivity of the corpus search
+    only the matching ids ("prefilter"); broader filters over-fetch by the
+    estimated selectivity and widen until limit results pass ("postfilter").
+    The chosen plan is kept in last_search_plan and counted in get_stats.
+    
+    With vector_compression set, the index stores fp16/int8/PQ/OPQ codes
+    and the float32 vectors move out of the documents into a VectorFile
+    (<collection>.vectors on disk when persisting). Searches fetch
+    limit*rerank_factor candidates and rerank them exactly from that file.
+    
+    Documents added since the last snapshot are kept in a ContentStore
+    (<collection>.content) rather than in memory, unless content_store is
+    "memory"; only the documents a search returns are read back, through
+    an LRU cache of document_cache_size entries.
+    
+    Searches run concurrently under the shared side of a ReadWriteLock.
+    Writes are prepared (and logged) outside it and committed under its
+    exclusive side in batches of ingest_commit_batch_size, so a search sees
+    each batch either completely or not at all, and a bulk ingest only
+    pauses searches for one batch's index update at a time.
+    """
+    
+    SNAPSHOT_FORMAT = 2  # 1: no index checksum
+    
+    def __init__(self, config: VectorStoreConfig):
+        super().__init__(config)
+        if not FAISS_AVAILABLE:
+            raise ImportError("FAISS is not available. Install with: pip install faiss-cpu")
+        
+        self.index = None
+        self._index_path: Optional[str] = None  # Set while self.index is memory-mapped from this file
+        self.table = DocumentTable()  # Documents keyed by id and faiss id
+        self.content_store: Optional[ContentStore] = None  # Bodies of documents added since the snapshot
+        self.next_index = 0
+        
+        # Deletion bookkeeping
+        self.tombstones: Set[int] = set()  # faiss_ids still in the index but deleted
+        self.deleted_since_build = 0
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self._rebuild_journal: Optional[List[Tuple[str, List[int]]]] = None
+        
+        # Filter planning
+        self.metadata_index = MetadataIndex()  # over faiss ids
+        self._postings_loaded = True  # False until segment posting lists are merged in
+        self.last_search_plan: Optional[Dict[str, Any]] = None
+        self.filter_plan_counts = {"unfiltered": 0, "prefilter": 0, "postfilter": 0, "empty": 0}
+        
+        # Persistence
+        self.wal: Optional[WriteAheadLog] = None
+        self._snapshot_current = False  # Whether the latest snapshot already holds every write
+        self._write_lock = asyncio.Lock()  # Serializes writers: log appends, commits and snapshots
+        self._rw_lock = ReadWriteLock()  # Shared by searches, held alone by each commit
+        
+        # Compression: full-precision vectors live outside the documents
+        self.full_vectors: Optional[VectorFile] = None
+        self.measured_recall: Optional[float] = None
+        
+        # Training state (IVF and trained codecs)
+        self.trained_size = 0  # Live vectors when the index was last trained
+        self._reservoir = np.zeros((0, config.embedding_dimension), dtype=np.float32)
+        self._reservoir_seen = 0
+        self._rng = np.random.default_rng()
+    
+    async def initialize(self) -> None:
+        """Initialize FAISS index."""
+        try:
+            if self.config.vector_compression not in ("none", "fp16", "int8", "pq", "opq"):
+                logger.warning(f"Unknown vector compression '{self.config.vector_compression}', storing float32")
+                self.config.vector_compression = "none"
+            if self.config.vector_compression != "none":
+                self.full_vectors = VectorFile(
+                    self.config.embedding_dimension,
+                    self._path(".vectors") if self.config.persist_directory else None
+                )
+            if self.config.content_store == "disk":
+                self.content_store = ContentStore(
+                    self.config.embedding_dimension,
+                    self._path(".content") if self.config.persist_directory else None
+                )
+            self.table = self._new_table()
+            
+            self.index = self._create_index()
+            
+            # Load existing index if persist directory exists
+            if self.config.persist_directory:
+                await self._load_from_disk()
+            
+            self.is_initialized = True
+            logger.info(f"FAISS store initialized with {self.config.faiss_index_type} index")
+            
+        except Exception as e:
+            logger.error(f"Failed to initialize FAISS: {e}")
+            raise
+    
+    def _create_index(self, nlist: Optional[int] = None, trained: bool = False):
+        """
+        Create an empty, id-mapped FAISS index based on configuration.
+        
+        Index types that need training (IVF, int8/PQ/OPQ codecs) get an
+        exact staging index unless trained=True; the caller then trains the
+        returned index, with nlist clusters for IVF.
+        """
+        dimension = self.config.embedding_dimension
+        index_type = self.config.faiss_index_type
+        compression = self.config.vector_compression
+        
+        if self.config.faiss_metric == "L2":
+            metric = faiss.METRIC_L2
+            base_index = faiss.IndexFlatL2(dimension)
+        else:
+            metric = faiss.METRIC_INNER_PRODUCT
+            base_index = faiss.IndexFlatIP(dimension)  # Inner product (cosine)
+        
+        if self._requires_training() and not trained:
+            return faiss.IndexIDMap2(base_index)
+        
+        scalar_type = {
+            "fp16": faiss.ScalarQuantizer.QT_fp16,
+            "int8": faiss.ScalarQuantizer.QT_8bit
+        }.get(compression)
+        pq_m = self._pq_m()
+        nbits = self.config.pq_nbits
+        
+        if index_type == "IVF":
+            # IVF index for larger datasets; stores and removes ids natively
+            if scalar_type is not None:
+                index = faiss.IndexIVFScalarQuantizer(base_index, dimension, nlist, scalar_type, metric)
+            elif compression in ("pq", "opq"):
+                index = faiss.IndexIVFPQ(base_index, dimension, nlist, pq_m, nbits, metric)
+            else:
+                index = faiss.IndexIVFFlat(base_index, dimension, nlist, metric)
+            return self._with_opq(index)
+        
+        if index_type == "HNSW":
+            # Graph index: sub-linear queries, no in-place removal (tombstoned)
+            M = self.config.faiss_hnsw_m
+            if scalar_type is not None:
+                hnsw_index = faiss.IndexHNSWSQ(dimension, scalar_type, M, metric)
+            elif compression in ("pq", "opq"):
+                hnsw_index = faiss.IndexHNSWPQ(dimension, pq_m, M, nbits, metric)
+            else:
+                hnsw_index = faiss.IndexHNSWFlat(dimension, M, metric)
+            hnsw_index.hnsw.efConstruction = self.config.faiss_hnsw_ef_construction
+            hnsw_index.hnsw.efSearch = self.config.faiss_hnsw_ef_search
+            return faiss.IndexIDMap2(self._with_opq(hnsw_index))
+        
+        if index_type != "Flat":
+            logger.warning(f"Unknown FAISS index type '{index_type}', using Flat")
+        if scalar_type is not None:
+            base_index = faiss.IndexScalarQuantizer(dimension, scalar_type, metric)
+        elif compression in ("pq", "opq"):
+            base_index = self._with_opq(faiss.IndexPQ(dimension, pq_m, nbits, metric))
+        return faiss.IndexIDMap2(base_index)
+    
+    def _with_opq(self, index):
+        """Prefix an OPQ rotation when compression is opq."""
+        if self.config.vector_compression != "opq":
+            return index
+        return faiss.IndexPreTransform(faiss.OPQMatrix(self.config.embedding_dimension, self._pq_m()), index)
+    
+    def _pq_m(self) -> int:
+        """Configured PQ sub-quantizer count, lowered to a divisor of the dimension."""
+        dimension = self.config.embedding_dimension
+        pq_m = max(1, min(self.config.pq_m, dimension))
+        while dimension % pq_m:
+            pq_m -= 1
+        return pq_m
+    
+    def _requires_training(self) -> bool:
+        """Whether the configured index must be trained before it can hold vectors."""
+        return self.config.faiss_index_type == "IVF" or self.config.vector_compression in ("int8", "pq", "opq")
+    
+    def _is_staging(self) -> bool:
+        """Whether vectors are still served from the exact pre-training index."""
+        return self._requires_training() and isinstance(self._base_index(), faiss.IndexFlat)
+    
+    def _ivf_index(self):
+        """The IVF index inside the current index, if any."""
+        return faiss.try_extract_index_ivf(self.index)
+    
+    def _reranking(self) -> bool:
+        return self.full_vectors is not None and self.config.rerank_factor > 0
+    
+    def _supports_remove(self) -> bool:
+        """Whether the underlying index can physically remove vectors."""
+        return self.config.faiss_index_type in ("Flat", "IVF")
+    
+    def _remove_faiss_ids(self, faiss_ids: List[int]) -> None:
+        """Remove vectors from the index, or tombstone them if unsupported."""
+        if not faiss_ids:
+            return
+        self._snapshot_current = False
+        
+        if self._supports_remove():
+            self._ensure_writable()
+            self.index.remove_ids(np.asarray(faiss_ids, dtype=np.int64))
+        else:
+            self.tombstones.update(faiss_ids)
+        
+        if self.config.faiss_index_type != "Flat":
+            self.deleted_since_build += len(faiss_ids)
+        if self._rebuild_journal is not None:
+            self._rebuild_journal.append(("remove", list(faiss_ids)))
+    
+    def _unregister(self, document_ids: List[str]) -> List[int]:
+        """Drop id mappings for documents. Returns their faiss ids."""
+        faiss_ids = []
+        for doc_id in document_ids:
+            removed = self.table.remove(doc_id)
+            if removed is not None:
+                idx, metadata = removed
+                self.metadata_index.remove(idx, metadata)
+                faiss_ids.append(idx)
+        return faiss_ids
+    
+    def _read_index(self, path: str):
+        """Memory-map an index file where FAISS supports it, so opening is O(1)."""
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+        if flags is None:
+            return faiss.read_index(path)
+        self._index_path = path
+        return faiss.read_index(path, flags | faiss.IO_FLAG_READ_ONLY)
+    
+    def _ensure_writable(self) -> None:
+        """Replace a memory-mapped (read-only) index with a loaded copy before mutating it."""
+        if self._index_path is None:
+            return
+        logger.info(f"Loading memory-mapped FAISS index for writing: {self._index_path}")
+        self.index = faiss.read_index(self._index_path)
+        self._index_path = None
+    
+    async def _load_writable_index(self) -> None:
+        """Async _ensure_writable: searches keep using the mapped index while the copy loads."""
+        if self._index_path is None:
+            return
+        logger.info(f"Loading memory-mapped FAISS index for writing: {self._index_path}")
+        index = await asyncio.get_event_loop().run_in_executor(None, faiss.read_index, self._index_path)
+        async with self._rw_lock.write():
+            self.index = index
+            self._index_path = None
+    
+    async def add_documents(self, documents: List[VectorDocument]) -> None:
+        """
+        Add documents to FAISS index, replacing any with the same id.
+        
+        Large inputs are committed in batches of ingest_commit_batch_size;
+        each batch becomes visible to searches atomically.
+        """
+        if not self.is_initialized:
+            await self.initialize()
+        
+        if not documents:
+            return
+        
+        # Later occurrences of an id within the call win
+        latest = {doc.id: doc for doc in documents}
+        documents = list(latest.values())
+        
+        replaced = []
+        batch_size = max(1, self.config.ingest_commit_batch_size)
+        for start in range(0, len(documents), batch_size):
+            replaced.extend(await self._commit_add(documents[start:start + batch_size]))
+        
+        if replaced:
+            self._maybe_schedule_compaction()
+        self._maybe_schedule_training()
+        
+        logger.info(f"Added {len(documents)} documents to FAISS index ({len(replaced)} replaced)")
+    
+    async def _commit_add(self, documents: List[VectorDocument]) -> List[int]:
+        """Log and commit one batch of documents. Returns the faiss ids replaced."""
+        async with self._write_lock:
+            await self._load_writable_index()
+            faiss_ids = list(range(self.next_index, self.next_index + len(documents)))
+            embeddings_array = np.array([doc.embedding for doc in documents]).astype('float32')
+            
+            # Log first: only the new records are written, never the whole store
+            if self.wal:
+                header = {
+                    "op": "add",
+                    "faiss_ids": faiss_ids,
+                    "documents": [
+                        {
+                            "id": doc.id,
+                            "content": doc.content,
+                            "metadata": doc.metadata,
+                            "created_at": doc.created_at.isoformat() if doc.created_at else None
+                        }
+                        for doc in documents
+                    ]
+                }
+                await asyncio.get_event_loop().run_in_executor(
+                    None,
+                    self.wal.append,
+                    header,
+                    embeddings_array.tobytes()
+                )
+            
+            replaced = await self._apply_add(documents, faiss_ids, embeddings_array)
+            await self._maybe_snapshot()
+        return replaced
+    
+    async def bulk_load(self, batches: Iterator[List[VectorDocument]]) -> None:
+        """
+        Fill an empty store and build its index once, over everything loaded.
+        
+        Used to write immutable segments: documents are not logged (the
+        caller's own log covers them until the snapshot taken at the end),
+        and index types that need training are trained on the complete
+        input instead of a reservoir sample.
+        """
+        if not self.is_initialized:
+            await self.initialize()
+        
+        async with self._write_lock:
+            await self._load_writable_index()
+            for batch in batches:
+                if not batch:
+                    continue
+                latest = {doc.id: doc for doc in batch}
+                documents = list(latest.values())
+                faiss_ids = list(range(self.next_index, self.next_index + len(documents)))
+                embeddings_array = np.array([doc.embedding for doc in documents]).astype('float32')
+                await self._apply_add(documents, faiss_ids, embeddings_array)
+            
+            if self._requires_training():
+                loop = asyncio.get_event_loop()
+                live_ids = list(self.table.keys())
+                vectors = await loop.run_in_executor(None, self._live_vectors, live_ids)
+                # The whole input is the training sample
+                index = await loop.run_in_executor(
+                    None, self._build_index, np.asarray(live_ids, dtype=np.int64), vectors, vectors
+                )
+                async with self._rw_lock.write():
+                    self.index = index
+                self.trained_size = len(live_ids)
+            
+            if self.config.persist_directory:
+                await self._save_to_disk()
+        logger.info(f"Bulk-loaded {len(self.table)} documents into FAISS index")
+    
+    async def _apply_add(
+        self,
+        documents: List[VectorDocument],
+        faiss_ids: List[int],
+        embeddings_array: np.ndarray
+    ) -> List[int]:
+        """Register documents under the given faiss ids and index their vectors. Returns replaced ids."""
+        if self._requires_training() and self.config.faiss_background_training:
+            self._update_reservoir(embeddings_array)
+        
+        if self.full_vectors is not None:
+            # Keep the float32 copy on disk only, not inside every document
+            documents = [dataclasses.replace(doc, embedding=None) for doc in documents]
+        
+        async with self._rw_lock.write():
+            self._ensure_writable()
+            self._snapshot_current = False
+            
+            # Upsert: drop vectors of documents being replaced
+            replaced = self._unregister([doc.id for doc in documents if doc.id in self.table])
+            self._remove_faiss_ids(replaced)
+            
+            if self.full_vectors is not None:
+                self.full_vectors.write(faiss_ids, embeddings_array)
+            
+            for doc, idx in zip(documents, faiss_ids):
+                # Store document under a stable faiss id
+                self.table.put(doc, idx)
+                self.metadata_index.add(idx, doc.metadata)
+            self.next_index = max(self.next_index, max(faiss_ids) + 1)
+            
+            # Journal before adding so a rebuild finishing meanwhile replays these
+            if self._rebuild_journal is not None:
+                self._rebuild_journal.append(("add", faiss_ids))
+            
+            await asyncio.get_event_loop().run_in_executor(
+                None,
+                self.index.add_with_ids,
+                embeddings_array,
+                np.asarray(faiss_ids, dtype=np.int64)
+            )
+        return replaced
+    
+    async def search(
+        self,
+        query_embedding: np.ndarray,
+        limit: int = None,
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None
+    ) -> List[SearchResult]:
+        """
+        Search FAISS index for similar documents.
+        
+        Args:
+            query_embedding: Query vector
+            limit: Maximum number of results
+            filter_metadata: Metadata filter; list values match any of their items
+            ef_search: HNSW candidate list size for this query (HNSW only)
+            nprobe: IVF clusters to probe for this query (IVF only)
+        """
+        if not self.is_initialized:
+            await self.initialize()
+        
+        if self.index.ntotal == 0:
+            return []
+        
+        limit = limit or self.config.max_results
+        query_array = query_embedding.reshape(1, -1).astype('float32')
+        
+        async with self._rw_lock.read():
+            plan, candidates = self._plan_filter(filter_metadata)
+            fetch_limit = self._candidate_limit(limit)
+            
+            if plan["plan"] == "empty":
+                hits = []
+            elif plan["plan"] == "prefilter":
+                hits = await self._prefilter_search(query_array, candidates, fetch_limit, ef_search)
+            else:
+                hits = await self._postfilter_search(
+                    query_array, fetch_limit, filter_metadata, plan["selectivity"], ef_search, nprobe
+                )
+            
+            search_results = self._hits_to_results(self._rerank(query_array[0], hits), limit, plan)
+            logger.debug(f"FAISS search returned {len(search_results)} results using {plan}")
+            return search_results
+    
+    async def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        limits: Union[int, List[Optional[int]], None] = None,
+        filters: Union[Dict[str, Any], List[Optional[Dict[str, Any]]], None] = None,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None
+    ) -> List[List[SearchResult]]:
+        """
+        Search many queries, answering all non-prefiltered ones in one FAISS call.
+        
+        Queries whose filter is selective enough for a prefilter plan are
+        searched individually (each has its own id selector); queries that
+        do not fill their limit from the shared fetch are widened one by one.
+        """
+        if not self.is_initialized:
+            await self.initialize()
+        
+        queries, limits, filters = self._batch_arguments(query_embeddings, limits, filters)
+        batch_results: List[List[SearchResult]] = [[] for _ in range(len(queries))]
+        if self.index.ntotal == 0:
+            return batch_results
+        
+        async with self._rw_lock.read():
+            plans = [self._plan_filter(filter_metadata) for filter_metadata in filters]
+            fetch_limits = [self._candidate_limit(limit) for limit in limits]
+            shared = [i for i, (plan, _) in enumerate(plans) if plan["plan"] in ("unfiltered", "postfilter")]
+            
+            if shared:
+                total = self.index.ntotal
+                fetch = min(total, max(
+                    self._initial_fetch(fetch_limits[i], plans[i][0]["selectivity"], filters[i]) for i in shared
+                ))
+                search_params = self._search_params(fetch, ef_search, nprobe)
+                index = self.index
+                query_array = np.ascontiguousarray(queries[shared])
+                distances, indices = await asyncio.get_event_loop().run_in_executor(
+                    None,
+                    lambda: index.search(query_array, fetch, params=search_params)
+                )
+            
+            for row, i in enumerate(shared):
+                plan = plans[i][0]
+                hits, below_threshold = self._collect_hits(distances[row], indices[row], fetch_limits[i], filters[i])
+                if len(hits) < fetch_limits[i] and not below_threshold and fetch < total:
+                    hits = await self._postfilter_search(
+                        queries[i:i + 1], fetch_limits[i], filters[i], plan["selectivity"], ef_search, nprobe, fetch * 2
+                    )
+                batch_results[i] = self._hits_to_results(self._rerank(queries[i], hits), limits[i], plan)
+            
+            for i, (plan, candidates) in enumerate(plans):
+                if plan["plan"] == "prefilter":
+                    hits = await self._prefilter_search(queries[i:i + 1], candidates, fetch_limits[i], ef_search)
+                    batch_results[i] = self._hits_to_results(self._rerank(queries[i], hits), limits[i], plan)
+                elif plan["plan"] == "empty":
+                    self._hits_to_results([], limits[i], plan)
+            
+            logger.debug(f"FAISS batch search answered {len(queries)} queries ({len(shared)} in one call)")
+            return batch_results
+    
+    async def range_search(
+        self,
+        query_embedding: np.ndarray,
+        min_similarity: Optional[float] = None,
+        max_results: Optional[int] = None,
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None
+    ) -> List[SearchResult]:
+        """
+        Find every document within a similarity radius with FAISS range_search.
+        
+        Filters selective enough for a prefilter plan score their candidates
+        exactly, as in search(). HNSW and IVF radius searches are as
+        approximate as their top-k searches, and compressed indexes select
+        on compressed scores before the exact rescoring.
+        """
+        if not self.is_initialized:
+            await self.initialize()
+        
+        if self.index.ntotal == 0:
+            return []
+        
+        if min_similarity is None:
+            min_similarity = self.config.similarity_threshold
+        query_array = query_embedding.reshape(1, -1).astype('float32')
+        
+        async with self._rw_lock.read():
+            plan, candidates = self._plan_filter(filter_metadata)
+            plan["min_similarity"] = min_similarity
+            
+            if plan["plan"] == "empty":
+                hits = []
+            elif plan["plan"] == "prefilter":
+                hits = self._range_candidates(query_array[0], candidates, min_similarity)
+            else:
+                hits = await self._range_index(query_array, min_similarity, filter_metadata, ef_search, nprobe)
+            
+            hits = self._rerank(query_array[0], hits)
+            search_results = self._hits_to_results(hits, max_results or len(hits), plan, min_similarity)
+            logger.debug(f"FAISS range search returned {len(search_results)} results using {plan}")
+            return search_results
+    
+    def _radius(self, min_similarity: float) -> float:
+        """The FAISS distance (squared L2 or inner product) matching a similarity."""
+        if self.config.faiss_metric == "L2":
+            # similarity = 1 / (1 + distance)
+            return 1 / min_similarity - 1 if min_similarity > 0 else float("inf")
+        return min_similarity
+    
+    def _range_candidates(
+        self,
+        query: np.ndarray,
+        candidates: PostingList,
+        min_similarity: float
+    ) -> List[Tuple[float, str]]:
+        """Exactly score the given faiss ids and keep those within the radius, best first."""
+        faiss_ids = candidates.to_array()
+        distances = self._exact_distances(query, self._live_vectors(faiss_ids.tolist()))
+        scores = -distances if self.config.faiss_metric == "L2" else distances
+        radius = self._radius(min_similarity)
+        rows = np.flatnonzero(distances <= radius if self.config.faiss_metric == "L2" else distances >= radius)
+        top = EmbeddingMatrix.top_k(scores, rows, len(rows))
+        return [
+            (self._to_similarity(distance), self.table.id_of(int(idx)))
+            for distance, idx in zip(distances[top], faiss_ids[top])
+        ]
+    
+    async def _range_index(
+        self,
+        query_array: np.ndarray,
+        min_similarity: float,
+        filter_metadata: Optional[Dict[str, Any]],
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None
+    ) -> List[Tuple[float, str]]:
+        """Radius-search the whole index and filter the hits, best first."""
+        # FAISS keeps strictly closer (L2) or strictly larger (IP) distances
+        radius = np.float32(self._radius(min_similarity))
+        radius = float(np.nextafter(radius, np.float32(np.inf) if self.config.faiss_metric == "L2" else np.float32(-np.inf)))
+        search_params = self._search_params(0, ef_search, nprobe)
+        index = self.index
+        _, distances, indices = await asyncio.get_event_loop().run_in_executor(
+            None,
+            lambda: index.range_search(query_array, radius, params=search_params)
+        )
+        
+        order = np.argsort(distances if self.config.faiss_metric == "L2" else -distances, kind="stable")
+        hits = []
+        for distance, idx in zip(distances[order], indices[order]):
+            if idx in self.tombstones:
+                continue
+            doc_id = self.table.id_of(int(idx))
+            if doc_id is None:
+                continue
+            if filter_metadata and not self._matches_filter(self.table.metadata(doc_id), filter_metadata):
+                continue
+            hits.append((self._to_similarity(distance), doc_id))
+        return hits
+    
+    def _hits_to_results(
+        self,
+        hits: List[Tuple[float, str]],
+        limit: int,
+        plan: Dict[str, Any],
+        threshold: Optional[float] = None
+    ) -> List[SearchResult]:
+        """Build ranked search results from (similarity, document id) hits and record the plan."""
+        if threshold is None:
+            threshold = self.config.similarity_threshold
+        search_results = []
+        for similarity, doc_id in hits:
+            if similarity < threshold:
+                break
+            search_results.append(SearchResult(
+                document=self.table.get(doc_id),
+                score=float(similarity),
+                rank=len(search_results) + 1
+            ))
+            if len(search_results) >= limit:
+                break
+        
+        plan["returned"] = len(search_results)
+        self.last_search_plan = plan
+        self.filter_plan_counts[plan["plan"]] += 1
+        return search_results
+    
+    def _plan_filter(self, filter_metadata: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Optional[PostingList]]:
+        """
+        Choose how to apply a metadata filter from posting list sizes.
+        
+        Returns the plan description and, for prefilter plans, the matching
+        faiss ids.
+        """
+        total = len(self.table)
+        if not filter_metadata:
+            return {"plan": "unfiltered", "selectivity": 1.0}, None
+        
+        self._ensure_metadata_index()
+        estimates = [self.metadata_index.estimate(key, value) for key, value in filter_metadata.items()]
+        if not total or min(estimates) == 0:
+            return {"plan": "empty", "selectivity": 0.0, "candidates": 0}, None
+        
+        if min(estimates) / total <= self.config.faiss_prefilter_selectivity:
+            candidates = self._filter_candidates(filter_metadata)
+            plan = "prefilter" if candidates else "empty"
+            return {"plan": plan, "selectivity": len(candidates) / total, "candidates": len(candidates)}, candidates
+        
+        # Assume independent keys to estimate how many results to over-fetch
+        selectivity = math.prod(estimate / total for estimate in estimates)
+        return {"plan": "postfilter", "selectivity": selectivity}, None
+    
+    def _ensure_metadata_index(self) -> None:
+        """Merge the segment's stored posting lists into the metadata index on first use."""
+        if self._postings_loaded:
+            return
+        self.table.index_segment_postings(self.metadata_index)
+        self._postings_loaded = True
+    
+    def _filter_candidates(self, filter_metadata: Dict[str, Any]) -> PostingList:
+        """Faiss ids of the documents matching a filter, from the posting lists."""
+        self._ensure_metadata_index()
+        return self.metadata_index.candidates(
+            filter_metadata,
+            lambda idx: self._matches_filter(self.table.metadata(self.table.id_of(idx)), filter_metadata)
+        )
+    
+    def _candidate_limit(self, limit: int) -> int:
+        """Candidates to fetch from the index: more when they will be reranked."""
+        return limit * self.config.rerank_factor if self._reranking() else limit
+    
+    def _rerank(self, query: np.ndarray, hits: List[Tuple[float, str]]) -> List[Tuple[float, str]]:
+        """Re-score compressed-index hits exactly from the full-precision vectors."""
+        if not self._reranking() or not hits:
+            return hits
+        
+        faiss_ids = [self.table.key_of(doc_id) for _, doc_id in hits]
+        distances = self._exact_distances(query, self.full_vectors.read(faiss_ids))
+        order = np.argsort(distances if self.config.faiss_metric == "L2" else -distances, kind="stable")
+        return [(self._to_similarity(distances[i]), hits[i][1]) for i in order]
+    
+    def _exact_distances(self, query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        """FAISS-convention distances (squared L2 or inner product) of vectors to the query."""
+        if self.config.faiss_metric == "L2":
+            return ((vectors - query) ** 2).sum(axis=1)
+        return vectors @ query
+    
+    def _to_similarity(self, distance: float) -> float:
+        """Convert a FAISS distance to a similarity score."""
+        if self.config.faiss_metric == "L2":
+            # For L2 distance, convert to similarity (inverse relationship)
+            return 1 / (1 + float(distance))
+        # For inner product, higher is better
+        return float(distance)
+    
+    async def _prefilter_search(
+        self,
+        query_array: np.ndarray,
+        candidates: PostingList,
+        limit: int,
+        ef_search: Optional[int] = None
+    ) -> List[Tuple[float, str]]:
+        """Search only the given faiss ids."""
+        faiss_ids = candidates.to_array()
+        k = min(limit, len(faiss_ids))
+        
+        if isinstance(self._base_index(), (faiss.IndexHNSW, faiss.IndexPQ)):
+            # Graph traversal through a sparse selector loses recall (and
+            # IndexPQ has no selector support), so score the (few)
+            # candidates exactly instead
+            distances = self._exact_distances(query_array[0], self._live_vectors(faiss_ids.tolist()))
+            scores = -distances if self.config.faiss_metric == "L2" else distances
+            top = EmbeddingMatrix.top_k(scores, np.arange(len(faiss_ids)), k)
+            distances = distances[top]
+            return [
+                (self._to_similarity(distance), self.table.id_of(int(idx)))
+                for distance, idx in zip(distances, faiss_ids[top])
+            ]
+        
+        selector = faiss.IDSelectorBatch(faiss_ids)
+        ivf_index = self._ivf_index()
+        if ivf_index is not None:
+            # Candidates can sit in any list; the selector skips the rest cheaply
+            params = faiss.SearchParametersIVF(nprobe=ivf_index.nlist, sel=selector)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        params = self._index_params(params)
+        
+        index = self.index
+        distances, indices = await asyncio.get_event_loop().run_in_executor(
+            None,
+            lambda: index.search(query_array, k, params=params)
+        )
+        hits = []
+        for distance, idx in zip(distances[0], indices[0]):
+            doc_id = self.table.id_of(int(idx)) if idx != -1 else None
+            if doc_id is not None:
+                hits.append((self._to_similarity(distance), doc_id))
+        return hits
+    
+    async def _postfilter_search(
+        self,
+        query_array: np.ndarray,
+        limit: int,
+        filter_metadata: Optional[Dict[str, Any]],
+        selectivity: float,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        fetch: Optional[int] = None
+    ) -> List[Tuple[float, str]]:
+        """Search the whole index, over-fetching until enough results pass the filter."""
+        total = self.index.ntotal
+        fetch = fetch or self._initial_fetch(limit, selectivity, filter_metadata)
+        
+        while True:
+            fetch = min(fetch, total)
+            search_params = self._search_params(fetch, ef_search, nprobe)
+            index = self.index
+            distances, indices = await asyncio.get_event_loop().run_in_executor(
+                None,
+                lambda: index.search(query_array, fetch, params=search_params)
+            )
+            
+            hits, below_threshold = self._collect_hits(distances[0], indices[0], limit, filter_metadata)
+            
+            # Widen only while more candidates could still qualify
+            if len(hits) >= limit or below_threshold or fetch >= total:
+                return hits
+            fetch *= 2
+    
+    def _initial_fetch(self, limit: int, selectivity: float, filter_metadata: Optional[Dict[str, Any]]) -> int:
+        """Neighbours to fetch so limit results are expected to survive filtering."""
+        fetch = math.ceil(limit / max(selectivity, 1 / self.index.ntotal) * (1.5 if filter_metadata else 1.0))
+        # Tombstoned vectors can occupy top-k slots, so fetch past them
+        return fetch + len(self.tombstones)
+    
+    def _collect_hits(
+        self,
+        distances: np.ndarray,
+        indices: np.ndarray,
+        limit: int,
+        filter_metadata: Optional[Dict[str, Any]]
+    ) -> Tuple[List[Tuple[float, str]], bool]:
+        """Turn one row of FAISS output into filtered hits. Also reports whether the threshold was reached."""
+        hits = []
+        for distance, idx in zip(distances, indices):
+            if idx == -1 or idx in self.tombstones:  # FAISS returns -1 for invalid results
+                continue
+            
+            similarity = self._to_similarity(distance)
+            # Approximate scores are only thresholded after reranking
+            if similarity < self.config.similarity_threshold and not self._reranking():
+                return hits, True
+            
+            doc_id = self.table.id_of(int(idx))
+            if doc_id is None:
+                continue
+            if filter_metadata and not self._matches_filter(self.table.metadata(doc_id), filter_metadata):
+                continue
+            
+            hits.append((similarity, doc_id))
+            if len(hits) >= limit:
+                break
+        return hits, False
+    
+    def _search_params(self, k: int, ef_search: Optional[int] = None, nprobe: Optional[int] = None):
+        """Per-query FAISS search parameters for the configured index type."""
+        if self.config.faiss_index_type == "HNSW":
+            # efSearch below k would cap the number of results returned
+            ef = max(ef_search or self.config.faiss_hnsw_ef_search, k)
+            return self._index_params(faiss.SearchParametersHNSW(efSearch=ef))
+        ivf_index = self._ivf_index()
+        if ivf_index is not None:
+            probes = min(nprobe or self.config.faiss_ivf_nprobe, ivf_index.nlist)
+            return self._index_params(faiss.SearchParametersIVF(nprobe=probes))
+        return None
+    
+    def _index_params(self, params):
+        """Wrap search parameters for an OPQ rotation, which only forwards pre-transform parameters."""
+        index = self.index
+        if isinstance(index, faiss.IndexIDMap2):
+            index = faiss.downcast_index(index.index)
+        if not isinstance(index, faiss.IndexPreTransform):
+            return params
+        return faiss.SearchParametersPreTransform(index_params=params)
+    
+    def _matches_filter(self, metadata: Dict[str, Any], filter_dict: Dict[str, Any]) -> bool:
+        """Check if document metadata matches filter criteria (list values mean any of)."""
+        return matches_filter(metadata, filter_dict)
+    
+    async def facet_counts(
+        self,
+        keys: List[str],
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        max_values: Optional[int] = None
+    ) -> Dict[str, Dict[Any, int]]:
+        """Count documents per metadata value from the posting lists, without touching the index."""
+        if not self.is_initialized:
+            await self.initialize()
+        
+        async with self._rw_lock.read():
+            self._ensure_metadata_index()
+            selection = self._filter_candidates(filter_metadata) if filter_metadata else None
+            return self.metadata_index.facet_counts(keys, selection, max_values or self.config.facet_max_values)
+    
+    async def delete_documents(self, document_ids: List[str]) -> None:
+        """Delete documents and their vectors from the FAISS index."""
+        if not self.is_initialized:
+            await self.initialize()
+        
+        async with self._write_lock:
+            await self._load_writable_index()
+            if self.wal:
+                await asyncio.get_event_loop().run_in_executor(
+                    None,
+                    self.wal.append,
+                    {"op": "delete", "ids": list(document_ids)}
+                )
+            
+            async with self._rw_lock.write():
+                faiss_ids = self._unregister(document_ids)
+                self._remove_faiss_ids(faiss_ids)
+            await self._maybe_snapshot()
+        
+        self._maybe_schedule_compaction()
+        logger.info(f"Deleted {len(faiss_ids)} documents from FAISS index")
+    
+    def _deleted_fraction(self) -> float:
+        """Fraction of indexed vectors deleted since the index was last built."""
+        total = len(self.table) + self.deleted_since_build
+        return self.deleted_since_build / total if total else 0.0
+    
+    def _rebuild_running(self) -> bool:
+        return self._rebuild_task is not None and not self._rebuild_task.done()
+    
+    def _maybe_schedule_compaction(self) -> None:
+        """Rebuild IVF/HNSW indexes in the background once enough has been deleted."""
+        if self.config.faiss_index_type == "Flat":
+            return  # Flat removals are exact, nothing to rebuild
+        if self._rebuild_running():
+            return
+        if self._deleted_fraction() < self.config.faiss_compaction_threshold:
+            return
+        
+        self._rebuild_task = asyncio.ensure_future(self.rebuild())
+        self._rebuild_task.add_done_callback(self._log_rebuild_failure)
+    
+    def _maybe_schedule_training(self) -> None:
+        """Train (or retrain) IVF/codec indexes in the background when the corpus warrants it."""
+        if not self.config.faiss_background_training:
+            return
+        if not self._requires_training() or self._rebuild_running():
+            return
+        
+        live_count = len(self.table)
+        if self._is_staging():
+            due = live_count >= self._train_min_vectors()
+        else:
+            due = live_count >= self.trained_size * self.config.faiss_ivf_retrain_factor
+        
+        if due:
+            logger.info(f"Scheduling index training on a corpus of {live_count} vectors")
+            self._rebuild_task = asyncio.ensure_future(self.rebuild())
+            self._rebuild_task.add_done_callback(self._log_rebuild_failure)
+    
+    @staticmethod
+    def _log_rebuild_failure(task: asyncio.Task) -> None:
+        """Log a failed background rebuild, which nothing else awaits."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background FAISS index rebuild failed: {task.exception()}", exc_info=task.exception())
+    
+    def _reservoir_sample(self) -> np.ndarray:
+        """Filled part of the reservoir."""
+        return self._reservoir[:min(self._reservoir_seen, self.config.faiss_ivf_train_sample_size)]
+    
+    def _update_reservoir(self, vectors: np.ndarray) -> None:
+        """Keep a uniform reservoir sample (Algorithm R) of every vector added."""
+        capacity = self.config.faiss_ivf_train_sample_size
+        
+        # Fill phase: append, growing the buffer geometrically up to capacity
+        filled = min(self._reservoir_seen, capacity)
+        take = min(capacity - filled, len(vectors))
+        if take:
+            needed = filled + take
+            if needed > len(self._reservoir):
+                grown = np.zeros((min(capacity, max(needed, 2 * len(self._reservoir))), vectors.shape[1]), dtype=np.float32)
+                grown[:filled] = self._reservoir[:filled]
+                self._reservoir = grown
+            self._reservoir[filled:needed] = vectors[:take]
+            self._reservoir_seen += take
+            vectors = vectors[take:]
+        
+        if not len(vectors):
+            return
+        
+        # Vector i of this batch is the (seen + i + 1)-th overall; keep it with
+        # probability capacity / (seen + i + 1) in a uniformly chosen slot
+        positions = self._reservoir_seen + np.arange(1, len(vectors) + 1)
+        slots = (self._rng.random(len(vectors)) * positions).astype(np.int64)
+        kept = slots < capacity
+        self._reservoir[slots[kept]] = vectors[kept]
+        self._reservoir_seen += len(vectors)
+    
+    def _train_min_vectors(self) -> int:
+        """Vectors needed before training; PQ needs at least one per code."""
+        minimum = self.config.faiss_ivf_train_min_vectors
+        if self.config.vector_compression in ("pq", "opq"):
+            minimum = max(minimum, 2 ** self.config.pq_nbits)
+        return minimum
+    
+    def _choose_nlist(self, corpus_size: int, sample_size: int) -> int:
+        """Pick the IVF cluster count from corpus size (~4*sqrt(N)), bounded by the sample."""
+        if self.config.faiss_ivf_nlist:
+            nlist = self.config.faiss_ivf_nlist
+        else:
+            nlist = int(4 * np.sqrt(corpus_size))
+        
+        # FAISS wants ~39 training points per centroid for stable k-means
+        return int(max(1, min(nlist, sample_size // 39)))
+    
+    def _training_sample(self, vectors: np.ndarray, reservoir: np.ndarray) -> np.ndarray:
+        """Reservoir sample, or a fresh uniform sample when none is held (e.g. after a reload)."""
+        if len(reservoir) >= min(len(vectors), self.config.faiss_ivf_train_sample_size):
+            return reservoir
+        
+        size = min(len(vectors), self.config.faiss_ivf_train_sample_size)
+        rows = self._rng.choice(len(vectors), size=size, replace=False)
+        return vectors[rows]
+    
+    async def compact(self) -> None:
+        """Rebuild the index from live vectors, dropping tombstones."""
+        await self.rebuild()
+    
+    async def rebuild(self) -> None:
+        """
+        Rebuild (and for IVF, retrain) the index from live vectors.
+        
+        The rebuild runs in an executor; writes that happen meanwhile are
+        journaled and replayed onto the new index before it is swapped in.
+        """
+        # Journal before taking the snapshot, so every write after it is replayed
+        self._rebuild_journal = []
+        
         try:
-            # Create FAISS index based on configuration
-            dimension = self.config.embedding_dimension
+            # Snapshot ids and read the corpus off the event loop under the
+            # read lock, so commits cannot unregister those ids or grow the
+            # vector file until the read is done
+            async with self._rw_lock.read():
+                live_ids = list(self.table.keys())
+                # Adds on the loop keep replacing reservoir rows while the executor trains
+                reservoir = self._reservoir_sample().copy()
+                vectors = await asyncio.get_event_loop().run_in_executor(None, self._live_vectors, live_ids)
+            new_index = await asyncio.get_event_loop().run_in_executor(
+                None,
+                self._build_index,
+                np.asarray(live_ids, dtype=np.int64),
+                vectors,
+                reservoir
+            )
             
-            if self.config.faiss_index_type == "Flat":
-                if self.config.faiss_metric == "L2":
-                    self.index = faiss.IndexFlatL2(dimension)
-                else:
-                    self.index = faiss.IndexFlatIP(dimension)  # Inner product (cosine)
-            elif self.config.faiss_index_type == "IVF":
-                # IVF index for larger datasets
-                quantizer = faiss.IndexFlatL2(dimension)
-                self.index = faiss.IndexIVFFlat(quantizer, dimension, 100)  # 100 clusters
+            async with self._write_lock:
+                # Replay writes that raced with the rebuild
+                rebuilt = set(live_ids)
+                for operation, faiss_ids in self._rebuild_journal:
+                    if operation == "add":
+                        added = [idx for idx in faiss_ids if idx not in rebuilt and self.table.id_of(idx) is not None]
+                        if added:
+                            new_index.add_with_ids(self._live_vectors(added), np.asarray(added, dtype=np.int64))
+                            rebuilt.update(added)
+                    else:
+                        removed = [idx for idx in faiss_ids if idx in rebuilt]
+                        if removed and self._supports_remove():
+                            new_index.remove_ids(np.asarray(removed, dtype=np.int64))
+                            rebuilt.difference_update(removed)
+                
+                async with self._rw_lock.write():
+                    self.index = new_index
+                    self._index_path = None
+                    self.tombstones = {idx for idx in self.tombstones if idx in rebuilt}
+                    self.deleted_since_build = len(self.tombstones)
+                if not self._is_staging():
+                    self.trained_size = len(live_ids)
+                self.measured_recall = None
+                self._rebuild_journal = None
+                logger.info(f"Rebuilt FAISS index with {self.index.ntotal} vectors")
+                
+                # The log replays onto any index structure, so only snapshot
+                # here to avoid retraining on the next startup
+                if self.config.persist_directory:
+                    await self._save_to_disk()
+        finally:
+            self._rebuild_journal = None
+    
+    def _live_vectors(self, faiss_ids: List[int]) -> np.ndarray:
+        """Collect stored embeddings for the given faiss ids."""
+        if self.full_vectors is not None:
+            return self.full_vectors.read(faiss_ids)
+        return self.table.embeddings(faiss_ids, self.config.embedding_dimension)
+    
+    def _build_index(self, faiss_ids: np.ndarray, vectors: np.ndarray, reservoir: np.ndarray):
+        """Create, train and fill a fresh index."""
+        nlist = None
+        train = self._requires_training() and len(vectors) >= self._train_min_vectors()
+        if train:
+            sample = self._training_sample(vectors, reservoir)
+            if self.config.faiss_index_type == "IVF":
+                nlist = self._choose_nlist(len(vectors), len(sample))
+        
+        index = self._create_index(nlist, trained=train)
+        if train:
+            index.train(sample)
+            logger.info(
+                f"Trained {self.config.faiss_index_type} index "
+                f"(compression={self.config.vector_compression}, nlist={nlist}) on {len(sample)} sampled vectors"
+            )
+        if len(vectors):
+            index.add_with_ids(vectors, faiss_ids)
+        return index
+    
+    async def get_document(self, document_id: str) -> Optional[VectorDocument]:
+        """Get a specific document by ID."""
+        return self.table.get(document_id)
+    
+    def _base_index(self):
+        """The index underneath the id map and any OPQ rotation, downcast to its concrete type."""
+        index = self.index
+        if isinstance(index, faiss.IndexIDMap2):
+            index = faiss.downcast_index(index.index)
+        if isinstance(index, faiss.IndexPreTransform):
+            index = faiss.downcast_index(index.index)
+        return index
+    
+    def _index_memory_bytes(self) -> int:
+        """Approximate resident size of the index structures."""
+        base_index = self._base_index()
+        ntotal = base_index.ntotal
+        id_bytes = ntotal * 8  # int64 id per vector (id map or inverted lists)
+        
+        dimension = self.config.embedding_dimension
+        fixed_bytes = dimension * dimension * 4 if self.config.vector_compression == "opq" else 0
+        if self.config.vector_compression in ("pq", "opq") and not self._is_staging():
+            fixed_bytes += dimension * (2 ** self.config.pq_nbits) * 4  # PQ centroids
+        
+        if isinstance(base_index, faiss.IndexHNSW):
+            hnsw = base_index.hnsw
+            storage = faiss.downcast_index(base_index.storage)
+            graph_bytes = hnsw.neighbors.size() * 4 + hnsw.levels.size() * 4 + hnsw.offsets.size() * 8
+            return storage.code_size * ntotal + graph_bytes + id_bytes + fixed_bytes
+        
+        if isinstance(base_index, faiss.IndexIVF):
+            centroid_bytes = base_index.nlist * base_index.d * 4
+            return base_index.code_size * ntotal + centroid_bytes + id_bytes + fixed_bytes
+        
+        return base_index.code_size * ntotal + id_bytes + fixed_bytes
+    
+    def _measure_recall(self, k: int = 10) -> Optional[float]:
+        """
+        Recall@k of the search path against exact search, on sampled stored vectors.
+        
+        Ground truth is a chunked brute-force scan of the full-precision
+        vectors, so this runs in an executor and is cached until the next
+        rebuild.
+        """
+        live_ids = np.fromiter(self.table.keys(), dtype=np.int64, count=len(self.table))
+        if len(live_ids) <= k:
+            return None
+        
+        sample = self._rng.choice(live_ids, size=min(self.config.recall_sample_queries, len(live_ids)), replace=False)
+        queries = self._live_vectors(sample.tolist())
+        
+        # Exact top-k per query, merged chunk by chunk
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_ids = np.zeros((len(queries), k), dtype=np.int64)
+        for start in range(0, len(live_ids), 65536):
+            chunk_ids = live_ids[start:start + 65536]
+            vectors = self._live_vectors(chunk_ids.tolist())
+            if self.config.faiss_metric == "L2":
+                scores = -(
+                    (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1)[None, :]
+                )
             else:
-                # Default to Flat L2
-                self.index = faiss.IndexFlatL2(dimension)
+                scores = queries @ vectors.T
+            merged_scores = np.hstack([best_scores, scores])
+            merged_ids = np.hstack([best_ids, np.broadcast_to(chunk_ids, scores.shape)])
+            top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, top, axis=1)
+            best_ids = np.take_along_axis(merged_ids, top, axis=1)
+        
+        # Approximate search as served: fetch, drop tombstones, rerank
+        fetch = min(self._candidate_limit(k) + len(self.tombstones), self.index.ntotal)
+        _, indices = self.index.search(queries, fetch, params=self._search_params(fetch))
+        found = 0
+        for query, row, truth in zip(queries, indices, best_ids):
+            hits = [
+                (0.0, self.table.id_of(int(idx))) for idx in row
+                if idx != -1 and idx not in self.tombstones and self.table.id_of(int(idx)) is not None
+            ]
+            top_ids = {self.table.key_of(doc_id) for _, doc_id in self._rerank(query, hits)[:k]}
+            found += len(top_ids & set(truth.tolist()))
+        return found / (len(queries) * k)
+    
+    async def get_stats(self, measure_recall: bool = False) -> Dict[str, Any]:
+        """
+        Get FAISS index statistics.
+        
+        Args:
+            measure_recall: Measure recall@10 of compressed search against an
+                exact scan if no measurement since the last rebuild is cached
+        """
+        if not self.is_initialized:
+            await self.initialize()
+        
+        stats = {
+            "store_type": "faiss",
+            "index_type": self.config.faiss_index_type,
+            "metric": self.config.faiss_metric,
+            "document_count": len(self.table),
+            "index_size": self.index.ntotal if self.index else 0,
+            "index_memory_mapped": self._index_path is not None,
+            "tombstones": len(self.tombstones),
+            "deleted_fraction": round(self._deleted_fraction(), 4),
+            "rebuild_running": self._rebuild_running(),
+            "memory_bytes": self._index_memory_bytes(),
+            "embedding_dimension": self.config.embedding_dimension,
+            "filter_plans": dict(self.filter_plan_counts),
+            "last_search_plan": self.last_search_plan,
+            "metadata_index": self.metadata_index.stats() if self._postings_loaded else None,
+            "documents": self.table.stats(),
+            "concurrency": self._rw_lock.stats()
+        }
+        
+        base_index = self._base_index()
+        if isinstance(base_index, faiss.IndexHNSW):
+            stats["hnsw"] = {
+                "m": base_index.hnsw.nb_neighbors(1),
+                "ef_construction": base_index.hnsw.efConstruction,
+                "ef_search": self.config.faiss_hnsw_ef_search,
+                "max_level": base_index.hnsw.max_level,
+                "entry_point": base_index.hnsw.entry_point
+            }
+        elif self.config.faiss_index_type == "IVF":
+            ivf_index = self._ivf_index()
+            trained = ivf_index is not None
+            stats["ivf"] = {
+                "trained": trained,
+                "nlist": ivf_index.nlist if trained else 0,
+                "nprobe": self.config.faiss_ivf_nprobe,
+                "trained_size": self.trained_size,
+                "retrain_at": int(self.trained_size * self.config.faiss_ivf_retrain_factor) if trained
+                else self._train_min_vectors(),
+                "reservoir_size": len(self._reservoir_sample())
+            }
+        
+        ntotal = self.index.ntotal if self.index else 0
+        stats["bytes_per_vector"] = round(stats["memory_bytes"] / ntotal, 2) if ntotal else 0.0
+        if self.full_vectors is not None:
+            if measure_recall and self.measured_recall is None and not self._is_staging():
+                async with self._rw_lock.read():
+                    self.measured_recall = await asyncio.get_event_loop().run_in_executor(None, self._measure_recall)
+            stats["compression"] = {
+                "mode": self.config.vector_compression,
+                "staging": self._is_staging(),
+                "pq_m": self._pq_m() if self.config.vector_compression in ("pq", "opq") else None,
+                "full_precision_bytes_per_vector": self.config.embedding_dimension * 4,
+                "full_precision_file_bytes": self.full_vectors.nbytes(),
+                "rerank_factor": self.config.rerank_factor,
+                "measured_recall_at_10": self.measured_recall
+            }
+        
+        return stats
+    
+    def _path(self, suffix: str) -> str:
+        return os.path.join(self.config.persist_directory, f"{self.config.collection_name}{suffix}")
+    
+    def _new_table(self, segment: Optional[Segment] = None) -> DocumentTable:
+        return DocumentTable(segment, self.content_store, self.config.document_cache_size)
+    
+    async def _maybe_snapshot(self) -> None:
+        """Take a snapshot once the write-ahead log has grown large enough."""
+        if self.wal and self.wal.size_bytes() >= self.config.faiss_snapshot_wal_bytes:
+            await self._save_to_disk()
+    
+    async def _save_to_disk(self) -> None:
+        """
+        Write a full snapshot and truncate the write-ahead log.
+        
+        Callers must hold the write lock. Snapshot files are named by log
+        sequence and only become current when the manifest is atomically
+        replaced, so a crash at any point leaves the previous snapshot and
+        its log intact. Afterwards the store reads documents from the new
+        segment, releasing the ones held in memory.
+        """
+        if not self.config.persist_directory:
+            return
+        
+        os.makedirs(self.config.persist_directory, exist_ok=True)
+        
+        sequence = self.wal.sequence if self.wal else 0
+        state = {
+            "next_index": self.next_index,
+            "deleted_since_build": self.deleted_since_build,
+            "trained_size": self.trained_size,
+            "vector_compression": self.config.vector_compression,
+            "wal_sequence": sequence,
+            "id_mapped": True
+        }
+        
+        # Vectors replayed from the log must be durable before it is truncated
+        if self.full_vectors is not None:
+            self.full_vectors.flush()
+        
+        index_path, segment_path = await asyncio.get_event_loop().run_in_executor(
+            None,
+            self._write_snapshot,
+            self.index,
+            state,
+            sequence
+        )
+        
+        if self.wal:
+            self.wal.reset()
+        self._snapshot_current = True
+        
+        segment = Segment(segment_path)
+        # Searches must see the old table with its content or the new one, never a mix
+        async with self._rw_lock.write():
+            self.table = self._new_table(segment)
+            if self.content_store is not None:
+                self.content_store.reset()  # Every overlay record is in the segment now
+        if self._index_path is not None:
+            self._index_path = index_path  # The mapped file is gone; the new one is identical
+        logger.debug(f"Wrote FAISS snapshot at log sequence {sequence}")
+    
+    def _write_snapshot(self, index, state: Dict[str, Any], sequence: int) -> Tuple[str, str]:
+        """Write snapshot files, then atomically point the manifest at them."""
+        index_name = f"{self.config.collection_name}.{sequence:012d}.index"
+        segment_name = f"{self.config.collection_name}.{sequence:012d}.segment"
+        index_path = os.path.join(self.config.persist_directory, index_name)
+        segment_path = os.path.join(self.config.persist_directory, segment_name)
+        
+        faiss.write_index(index, index_path + ".tmp")
+        _fsync_path(index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+        
+        self.table.write_segment(
+            segment_path,
+            self.config.embedding_dimension,
+            with_vectors=self.full_vectors is None,  # Compressed stores keep them in the vector file
+            attributes=state,
+            extras={"tombstones": np.asarray(sorted(self.tombstones), dtype=np.int64)}
+        )
+        
+        manifest = {
+            "format": self.SNAPSHOT_FORMAT,
+            "sequence": sequence,
+            "index_file": index_name,
+            "index_checksum": file_checksum(index_path),
+            "segment_dir": segment_name,
+            "created_at": datetime.now().isoformat()
+        }
+        manifest_path = self._path(".manifest.json")
+        with open(manifest_path + ".tmp", 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(manifest_path + ".tmp", manifest_path)
+        _fsync_path(self.config.persist_directory)
+        
+        # Older snapshots (and pre-segment files) are superseded now
+        current = {index_name, segment_name}
+        prefix = f"{self.config.collection_name}."
+        for name in os.listdir(self.config.persist_directory):
+            path = os.path.join(self.config.persist_directory, name)
+            if not name.startswith(prefix) or name in current:
+                continue
+            if name.endswith((".index", ".pkl")):
+                os.remove(path)
+            elif name.endswith(".segment"):
+                shutil.rmtree(path, ignore_errors=True)
+        
+        return index_path, segment_path
+    
+    async def _load_from_disk(self) -> None:
+        """Open the latest snapshot, then replay the write-ahead log after it."""
+        if not self.config.persist_directory:
+            return
+        
+        os.makedirs(self.config.persist_directory, exist_ok=True)
+        loop = asyncio.get_event_loop()
+        
+        state = None
+        manifest_path = self._path(".manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            index_path = os.path.join(self.config.persist_directory, manifest["index_file"])
             
-            # Load existing index if persist directory exists
-            if self.config.persist_directory:
-                await self._load_from_disk()
+            if manifest.get("format", 1) > self.SNAPSHOT_FORMAT:
+                raise ValueError(f"Unsupported FAISS snapshot format {manifest['format']} in {manifest_path}")
             
-            self.is_initialized = True
-            logger.info(f"FAISS store initialized with {self.config.faiss_index_type} index")
+            if "segment_dir" in manifest:
+                if self.config.verify_snapshot_checksums and "index_checksum" in manifest:
+                    checksum = await loop.run_in_executor(None, file_checksum, index_path)
+                    if checksum != manifest["index_checksum"]:
+                        raise ValueError(f"Checksum mismatch for FAISS index {index_path}")
+                self.index = await loop.run_in_executor(None, self._read_index, index_path)
+                segment = await loop.run_in_executor(None, lambda: Segment(
+                    os.path.join(self.config.persist_directory, manifest["segment_dir"]),
+                    verify=self.config.verify_snapshot_checksums
+                ))
+                self.table = self._new_table(segment)
+                self._postings_loaded = False
+                state = dict(segment.attributes)
+                tombstones = segment.extra("tombstones")
+                self.tombstones = set(tombstones.tolist()) if tombstones is not None else set()
+            else:
+                # Pickled snapshot from before the segment format
+                self.index = await loop.run_in_executor(None, faiss.read_index, index_path)
+                with open(os.path.join(self.config.persist_directory, manifest["metadata_file"]), 'rb') as f:
+                    state = self._load_pickled_state(pickle.load(f))
+        else:
+            metadata = await self._load_legacy_files()
+            state = self._load_pickled_state(metadata) if metadata is not None else None
+        
+        if state is not None:
+            self.next_index = state["next_index"]
+            self.deleted_since_build = state.get("deleted_since_build", 0)
+            self.trained_size = state.get("trained_size", state.get("ivf_trained_size", 0))
+            
+            # Indexes written before id mapping used positional ids and
+            # may still hold deleted vectors, and indexes written with
+            # another compression mode hold other codes; rebuild them once
+            previous_compression = state.get("vector_compression", "none")
+            compression_changed = previous_compression != self.config.vector_compression
+            if compression_changed:
+                self._migrate_full_vectors(previous_compression)
+            if not state.get("id_mapped") or compression_changed:
+                logger.info("Rebuilding FAISS index from a legacy or differently compressed snapshot")
+                live_ids = list(self.table.keys())
+                self.index = self._build_index(
+                    np.asarray(live_ids, dtype=np.int64),
+                    self._live_vectors(live_ids),
+                    self._reservoir_sample()
+                )
+                self._index_path = None
+                self.tombstones = set()
+                self.deleted_since_build = 0
+            
+            logger.info(f"Opened FAISS snapshot with {len(self.table)} documents")
+        
+        # Replay everything logged after the snapshot
+        snapshot_sequence = state.get("wal_sequence", 0) if state else 0
+        self.wal = WriteAheadLog(self._path(".wal"), fsync=self.config.faiss_wal_fsync)
+        records = await loop.run_in_executor(None, self.wal.open)
+        self.wal.sequence = max(self.wal.sequence, snapshot_sequence)
+        
+        replayed = 0
+        for header, payload in records:
+            if header["seq"] <= snapshot_sequence:
+                continue
+            await self._replay_record(header, payload)
+            replayed += 1
+        
+        if replayed:
+            logger.info(f"Replayed {replayed} write-ahead log records after snapshot {snapshot_sequence}")
+        elif state is not None and self.table.segment is not None:
+            self._snapshot_current = self._index_path is not None  # Not rebuilt or migrated on load
+    
+    def _load_pickled_state(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Load documents from a pickled snapshot into the table. Returns its state fields."""
+        documents = metadata["documents"]
+        for doc_id, idx in metadata["id_to_index"].items():
+            self.table.put(documents[doc_id], idx)
+            self.metadata_index.add(idx, documents[doc_id].metadata)
+        self.tombstones = metadata.get("tombstones", set())
+        return metadata
+    
+    def _migrate_full_vectors(self, previous_compression: str) -> None:
+        """Move float32 vectors between the documents and the vector file after a compression change."""
+        if self.full_vectors is not None:
+            if previous_compression != "none":
+                return  # Already in the vector file
+            keys = list(self.table.keys())
+            for start in range(0, len(keys), 65536):
+                chunk = keys[start:start + 65536]
+                self.full_vectors.write(chunk, self.table.embeddings(chunk, self.config.embedding_dimension))
+            for doc_id, idx in list(self.table.id_to_key.items()):
+                self.table.put(dataclasses.replace(self.table.get(doc_id), embedding=None), idx)
+            return
+        
+        previous = VectorFile(self.config.embedding_dimension, self._path(".vectors"))
+        for doc_id, idx in list(self.table.items()):
+            document = self.table.get(doc_id)
+            if document.embedding is None and idx < previous.capacity:
+                self.table.put(dataclasses.replace(document, embedding=previous.read([idx])[0]), idx)
+    
+    async def _replay_record(self, header: Dict[str, Any], payload: bytes) -> None:
+        """Apply one write-ahead log record without logging it again."""
+        if header["op"] == "add":
+            embeddings_array = np.frombuffer(payload, dtype=np.float32).reshape(
+                len(header["faiss_ids"]), self.config.embedding_dimension
+            )
+            documents = [
+                VectorDocument(
+                    id=entry["id"],
+                    content=entry["content"],
+                    metadata=entry["metadata"],
+                    embedding=embeddings_array[i],
+                    created_at=datetime.fromisoformat(entry["created_at"]) if entry.get("created_at") else None
+                )
+                for i, entry in enumerate(header["documents"])
+            ]
+            await self._apply_add(documents, header["faiss_ids"], embeddings_array)
+        elif header["op"] == "delete":
+            self._remove_faiss_ids(self._unregister(header["ids"]))
+    
+    async def _load_legacy_files(self) -> Optional[Dict[str, Any]]:
+        """Load the pre-manifest <collection>.index / .pkl pair, if present."""
+        index_path = self._path(".index")
+        metadata_path = self._path(".pkl")
+        
+        if not (os.path.exists(index_path) and os.path.exists(metadata_path)):
+            return None
+        
+        try:
+            # Load FAISS index
+            self.index = await asyncio.get_event_loop().run_in_executor(
+                None,
+                faiss.read_index,
+                index_path
+            )
             
+            # Load metadata
+            with open(metadata_path, 'rb') as f:
+                return pickle.load(f)
         except Exception as e:
-            logger.error(f"Failed to initialize FAISS: {e}")
-            raise
+            logger.error(f"Error loading FAISS index: {e}")
+            self.index = self._create_index()
+            return None
+    
+    async def checkpoint(self) -> None:
+        """Wait for background training or compaction, then snapshot if anything changed since the last one."""
+        if self._rebuild_running():
+            await self._rebuild_task
+        
+        if self.config.persist_directory and not self._snapshot_current:
+            async with self._write_lock:
+                await self._save_to_disk()
+    
+    def export_documents(self, batch_size: int) -> Iterator[List[VectorDocument]]:
+        """Yield every live document with its full-precision embedding, in batches, in faiss id order."""
+        faiss_ids = sorted(self.table.keys())
+        for start in range(0, len(faiss_ids), batch_size):
+            # Ids deleted since the export started are skipped
+            chunk = [idx for idx in faiss_ids[start:start + batch_size] if self.table.id_of(idx) is not None]
+            vectors = self._live_vectors(chunk)
+            yield [
+                dataclasses.replace(self.table.get(self.table.id_of(idx)), embedding=vector)
+                for idx, vector in zip(chunk, vectors)
+            ]
+    
+    async def drop(self) -> None:
+        """Close the store and delete its persisted files."""
+        if self._rebuild_running():
+            await self._rebuild_task
+        if self.wal:
+            self.wal.close()
+            self.wal = None
+        if self.content_store is not None:
+            self.content_store.close()
+            self.content_store = None
+        
+        directory = self.config.persist_directory
+        if directory and os.path.isdir(directory):
+            prefix = f"{self.config.collection_name}."
+            for name in os.listdir(directory):
+                if name.startswith(prefix):
+                    path = os.path.join(directory, name)
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        os.remove(path)
+        
+        self.table = DocumentTable()
+        self.is_initialized = False
+    
+    async def close(self) -> None:
+        """Close FAISS store."""
+        # Snapshot on shutdown so the next startup has no log to replay
+        await self.checkpoint()
+        if self.wal:
+            self.wal.close()
+            self.wal = None
+        if self.full_vectors is not None:
+            self.full_vectors.flush()
+        if self.content_store is not None:
+            self.content_store.close()
+            self.content_store = None
+        
+        self.is_initialized = False
+        logger.info("FAISS store closed")
+
+
+class MemoryVectorStore(BaseVectorStore):
+    """
+    In-memory vector store backed by a contiguous embedding matrix.
+    
+    Embeddings are kept pre-normalized in an EmbeddingMatrix, so a search is
+    one matrix-vector product followed by an argpartition top-k.
+    
+    With a persist_directory the documents are written to a segment on
+    close and memory-mapped again by the next initialize(), so startup does
+    not re-embed or re-load the corpus. Segment rows are scored straight
+    from the mapped vectors; documents added since live in the matrix, with
+    their content and metadata in a ContentStore scratch file unless
+    content_store is "memory". Nothing is persisted until close().
+    
+    Metadata filters and facet counts are answered from posting lists over
+    the table keys, so filtering costs O(matches) rather than a metadata
+    comparison per scored row.
+    """
+    
+    def __init__(self, config: VectorStoreConfig):
+        super().__init__(config)
+        self.table = DocumentTable()
+        self.content_store: Optional[ContentStore] = None
+        self.next_key = 0  # Insertion counter used as the table key
+        self.segment_generation = 0  # Generation of the mapped segment (0: none or legacy)
+        self.metadata_index = MetadataIndex()  # over table keys
+        self._postings_loaded = True  # False until segment posting lists are merged in
+        self.matrix = EmbeddingMatrix(
+            config.embedding_dimension,
+            initial_capacity=config.memory_initial_capacity,
+            compaction_ratio=config.memory_compaction_ratio
+        )
+    
+    def _segment_path(self, generation: int) -> str:
+        if not generation:
+            return os.path.join(self.config.persist_directory, f"{self.config.collection_name}.memory.segment")
+        return os.path.join(self.config.persist_directory, f"{self.config.collection_name}.memory.{generation:06d}.segment")
+    
+    def _segment_generations(self) -> List[int]:
+        """
+        Generations of the persisted segments, oldest first.
+        
+        Each close writes a new generation next to the mapped one instead of
+        replacing a directory that is still memory-mapped, which Windows does
+        not allow. The unnumbered segment of older versions is generation 0.
+        """
+        prefix = f"{self.config.collection_name}.memory."
+        generations = []
+        for name in os.listdir(self.config.persist_directory):
+            if not name.startswith(prefix) or not name.endswith("segment"):
+                continue
+            middle = name[len(prefix):-len("segment")]
+            if not middle:
+                generations.append(0)
+            elif middle.endswith(".") and middle[:-1].isdigit():
+                generations.append(int(middle[:-1]))
+        return sorted(generations)
+    
+    def _remove_segments_before(self, generation: int) -> None:
+        """Delete superseded segment generations (after a close, or left by a crash)."""
+        for older in self._segment_generations():
+            if older < generation:
+                shutil.rmtree(self._segment_path(older), ignore_errors=True)
+    
+    def _new_table(self, segment: Optional[Segment] = None) -> DocumentTable:
+        return DocumentTable(segment, self.content_store, self.config.document_cache_size)
+    
+    async def initialize(self) -> None:
+        """Initialize memory store, mapping the persisted segment if there is one."""
+        if self.config.content_store == "disk" and self.content_store is None and not self.table.id_to_key:
+            self.content_store = ContentStore(
+                self.config.embedding_dimension,
+                os.path.join(self.config.persist_directory, f"{self.config.collection_name}.memory.content")
+                if self.config.persist_directory else None
+            )
+            self.table = self._new_table()
+        
+        persisted = self.config.persist_directory and os.path.isdir(self.config.persist_directory)
+        generations = self._segment_generations() if persisted else []
+        if generations:
+            self.segment_generation = generations[-1]
+            self._remove_segments_before(self.segment_generation)
+            segment = Segment(self._segment_path(self.segment_generation), verify=self.config.verify_snapshot_checksums)
+            if segment.dimension != self.config.embedding_dimension:
+                raise ValueError(
+                    f"Persisted segment has dimension {segment.dimension}, "
+                    f"expected {self.config.embedding_dimension}"
+                )
+            self.table = self._new_table(segment)
+            self.next_key = segment.attributes.get("next_key", len(segment))
+            self.metadata_index.clear()
+            self._postings_loaded = False
+            logger.info(f"Opened memory store segment with {len(segment)} documents")
+        
+        self.is_initialized = True
+        logger.info("Memory vector store initialized")
     
     async def add_documents(self, documents: List[VectorDocument]) -> None:
-        """Add documents to FAISS index."""
-        if not self.is_initialized:
-            await self.initialize()
+        """
+        Add (or replace) documents in the memory store.
         
-        if not documents:
-            return
+        Each batch of ingest_commit_batch_size documents is applied without
+        yielding, so searches (which run on the event loop) see it whole,
+        and control returns to the loop between batches so a bulk ingest
+        does not stall them.
+        """
+        batch_size = max(1, self.config.ingest_commit_batch_size)
+        for start in range(0, len(documents), batch_size):
+            if start:
+                await asyncio.sleep(0)
+            self._commit_batch(documents[start:start + batch_size])
         
+        logger.info(f"Added {len(documents)} documents to memory store")
+    
+    def _commit_batch(self, documents: List[VectorDocument]) -> None:
+        """Apply one batch of additions to the table, posting lists and matrix."""
+        embedded_ids = []
         embeddings = []
+        replaced_ids = []
+        
         for doc in documents:
-            # Store document
-            self.documents[doc.id] = doc
-            
-            # Map document ID to index
-            self.id_to_index[doc.id] = self.next_index
-            self.index_to_id[self.next_index] = doc.id
-            self.next_index += 1
-            
-            embeddings.append(doc.embedding)
+            previous = self.table.remove(doc.id)
+            if previous is not None:
+                self.metadata_index.remove(*previous)
+            self.table.put(doc, self.next_key)
+            self.metadata_index.add(self.next_key, doc.metadata)
+            self.next_key += 1
+            if doc.embedding is not None:
+                embedded_ids.append(doc.id)
+                embeddings.append(doc.embedding)
+            else:
+                replaced_ids.append(doc.id)
+        
+        # A re-added document without an embedding must not keep a stale vector
+        if replaced_ids:
+            self.matrix.remove(replaced_ids)
+        
+        if embedded_ids:
+            self.matrix.add(embedded_ids, np.stack(embeddings))
+    
+    async def search(
+        self,
+        query_embedding: np.ndarray,
+        limit: int = None,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[SearchResult]:
+        """Search memory store using cosine similarity."""
+        if not len(self.table):
+            return []
         
-        # Add embeddings to FAISS index
-        embeddings_array = np.array(embeddings).astype('float32')
+        limit = limit or self.config.max_results
         
-        # Train index if needed (for IVF)
-        if hasattr(self.index, 'is_trained') and not self.index.is_trained:
-            self.index.train(embeddings_array)
+        masks = self._filter_masks(filter_metadata) if filter_metadata else None
+        if masks is not None and not any(mask.any() for mask in masks if mask is not None):
+            return []
         
-        await asyncio.get_event_loop().run_in_executor(
-            None,
-            self.index.add,
-            embeddings_array
+        # One matrix-vector product over all rows
+        segment_scores = self._segment_scores(EmbeddingMatrix.normalize(query_embedding))
+        search_results = self._results_from_scores(
+            self.matrix.scores(query_embedding),
+            limit,
+            masks,
+            segment_scores[0] if segment_scores is not None else None
         )
         
-        # Persist to disk if configured
-        if self.config.persist_directory:
-            await self._save_to_disk()
+        logger.debug(f"Memory search returned {len(search_results)} results")
+        return search_results
+    
+    async def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        limits: Union[int, List[Optional[int]], None] = None,
+        filters: Union[Dict[str, Any], List[Optional[Dict[str, Any]]], None] = None
+    ) -> List[List[SearchResult]]:
+        """Score all queries against the matrix with one matrix-matrix product per chunk."""
+        queries, limits, filters = self._batch_arguments(query_embeddings, limits, filters)
+        if not len(self.table):
+            return [[] for _ in range(len(queries))]
         
-        logger.info(f"Added {len(documents)} documents to FAISS index")
+        # Bound the (chunk, rows) score matrices to ~64MB
+        segment_rows = len(self.table.segment) if self.table.segment is not None else 0
+        chunk = max(1, (16 * 1024 * 1024) // max(1, self.matrix.size + segment_rows))
+        
+        # A filter shared by several queries is resolved once
+        masks_by_filter = {}
+        for filter_metadata in filters:
+            if filter_metadata and id(filter_metadata) not in masks_by_filter:
+                masks_by_filter[id(filter_metadata)] = self._filter_masks(filter_metadata)
+        
+        batch_results = []
+        for start in range(0, len(queries), chunk):
+            scores = self.matrix.scores_batch(queries[start:start + chunk])
+            segment_scores = self._segment_scores(EmbeddingMatrix.normalize(queries[start:start + chunk]))
+            for offset, query_scores in enumerate(scores):
+                i = start + offset
+                batch_results.append(self._results_from_scores(
+                    query_scores,
+                    limits[i],
+                    masks_by_filter.get(id(filters[i])) if filters[i] else None,
+                    segment_scores[offset] if segment_scores is not None else None
+                ))
+        
+        logger.debug(f"Memory batch search answered {len(queries)} queries")
+        return batch_results
     
-    async def search(
+    async def range_search(
         self,
         query_embedding: np.ndarray,
-        limit: int = None,
+        min_similarity: Optional[float] = None,
+        max_results: Optional[int] = None,
         filter_metadata: Optional[Dict[str, Any]] = None
     ) -> List[SearchResult]:
-        """Search FAISS index for similar documents."""
-        if not self.is_initialized:
-            await self.initialize()
-        
-        if self.index.ntotal == 0:
+        """Every document scoring at least min_similarity, from one thresholded score vector."""
+        if not len(self.table):
             return []
         
-        limit = limit or self.config.max_results
+        if min_similarity is None:
+            min_similarity = self.config.similarity_threshold
         
-        # Prepare query
-        query_array = query_embedding.reshape(1, -1).astype('float32')
+        masks = self._filter_masks(filter_metadata) if filter_metadata else None
+        if masks is not None and not any(mask.any() for mask in masks if mask is not None):
+            return []
         
-        # Search FAISS index
-        distances, indices = await asyncio.get_event_loop().run_in_executor(
-            None,
-            self.index.search,
-            query_array,
-            limit
+        segment_scores = self._segment_scores(EmbeddingMatrix.normalize(query_embedding))
+        search_results = self._results_from_scores(
+            self.matrix.scores(query_embedding),
+            max_results or len(self.table),
+            masks,
+            segment_scores[0] if segment_scores is not None else None,
+            threshold=min_similarity
         )
         
-        # Process results
-        search_results = []
+        logger.debug(f"Memory range search returned {len(search_results)} results")
+        return search_results
+    
+    def _segment_scores(self, normalized_queries: np.ndarray) -> Optional[np.ndarray]:
+        """Cosine scores of normalized queries against the live segment rows (-inf elsewhere)."""
+        segment = self.table.segment
+        if segment is None or segment.vectors is None or not self.table.segment_live:
+            return None
         
-        for rank, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-            if idx == -1:  # FAISS returns -1 for invalid results
-                continue
-            
-            # Convert distance to similarity
-            if self.config.faiss_metric == "L2":
-                # For L2 distance, convert to similarity (inverse relationship)
-                similarity = 1 / (1 + distance)
-            else:
-                # For inner product, higher is better
-                similarity = float(distance)
-            
-            if similarity >= self.config.similarity_threshold:
-                # Get document
-                doc_id = self.index_to_id.get(idx)
-                if doc_id and doc_id in self.documents:
-                    document = self.documents[doc_id]
-                    
-                    # Apply metadata filtering if specified
-                    if filter_metadata:
-                        if not self._matches_filter(document.metadata, filter_metadata):
-                            continue
-                    
-                    search_results.append(SearchResult(
-                        document=document,
-                        score=similarity,
-                        rank=rank + 1
-                    ))
+        norms = np.asarray(segment.norms)
+        dead = self.table.shadowed | (norms == 0)  # Zero norm marks a document stored without an embedding
+        scores = (normalized_queries @ np.asarray(segment.vectors).T) / np.where(dead, 1.0, norms)
+        scores[:, dead] = -np.inf
+        return scores
+    
+    def _top_hits(
+        self,
+        scores: np.ndarray,
+        limit: int,
+        allowed: Optional[np.ndarray],
+        document_id: Callable[[int], str],
+        threshold: float
+    ) -> List[Tuple[float, str]]:
+        """Threshold, filter and rank the rows of one score vector."""
+        rows = np.flatnonzero(scores >= threshold)
+        
+        # Keep the candidates that passed the threshold and the filter
+        if allowed is not None:
+            rows = rows[allowed[rows]]
+        
+        return [(float(scores[row]), document_id(row)) for row in EmbeddingMatrix.top_k(scores, rows, limit)]
+    
+    def _results_from_scores(
+        self,
+        scores: np.ndarray,
+        limit: int,
+        masks: Optional[Tuple[np.ndarray, Optional[np.ndarray]]],
+        segment_scores: Optional[np.ndarray] = None,
+        threshold: Optional[float] = None
+    ) -> List[SearchResult]:
+        """Threshold, filter and rank one query's matrix (and segment) scores."""
+        if threshold is None:
+            threshold = self.config.similarity_threshold
+        matrix_mask, segment_mask = masks if masks is not None else (None, None)
+        row_ids = self.matrix.row_ids
+        hits = self._top_hits(scores, limit, matrix_mask, lambda row: row_ids[row], threshold)
+        
+        if segment_scores is not None:
+            hits.extend(self._top_hits(segment_scores, limit, segment_mask, self.table.segment.document_id, threshold))
+            hits.sort(key=lambda hit: hit[0], reverse=True)
+        
+        # Create search results
+        search_results = []
+        for rank, (score, doc_id) in enumerate(hits[:limit]):
+            search_results.append(SearchResult(
+                document=self.table.get(doc_id),
+                score=score,
+                rank=rank + 1
+            ))
         
-        logger.debug(f"FAISS search returned {len(search_results)} results")
         return search_results
     
+    def _ensure_metadata_index(self) -> None:
+        """Merge the segment's stored posting lists into the metadata index on first use."""
+        if self._postings_loaded:
+            return
+        self.table.index_segment_postings(self.metadata_index)
+        self._postings_loaded = True
+    
+    def _filter_candidates(self, filter_metadata: Dict[str, Any]) -> PostingList:
+        """Table keys of the documents matching a filter, from the posting lists."""
+        self._ensure_metadata_index()
+        return self.metadata_index.candidates(
+            filter_metadata,
+            lambda key: self._matches_filter(self.table.metadata(self.table.id_of(key)), filter_metadata)
+        )
+    
+    def _filter_masks(self, filter_metadata: Dict[str, Any]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Boolean masks over matrix rows and segment rows of the documents matching a filter."""
+        keys = self._filter_candidates(filter_metadata).to_array()
+        key_to_id = self.table.key_to_id
+        in_overlay = np.fromiter((key in key_to_id for key in keys.tolist()), dtype=bool, count=len(keys))
+        
+        matrix_mask = np.zeros(self.matrix.size, dtype=bool)
+        id_to_row = self.matrix.id_to_row
+        rows = [id_to_row.get(key_to_id[key]) for key in keys[in_overlay].tolist()]
+        matrix_mask[[row for row in rows if row is not None]] = True
+        
+        segment_mask = None
+        segment = self.table.segment
+        if segment is not None:
+            # Indexed keys outside the overlay are live segment rows
+            segment_mask = np.zeros(len(segment), dtype=bool)
+            segment_mask[segment.rows_of_keys(keys[~in_overlay])] = True
+        return matrix_mask, segment_mask
+    
     def _matches_filter(self, metadata: Dict[str, Any], filter_dict: Dict[str, Any]) -> bool:
-        """Check if document metadata matches filter criteria."""
-        for key, value in filter_dict.items():
-            if key not in metadata or metadata[key] != value:
-                return False
-        return True
+        """Check if document metadata matches filter criteria (list values mean any of)."""
+        return matches_filter(metadata, filter_dict)
+    
+    async def facet_counts(
+        self,
+        keys: List[str],
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        max_values: Optional[int] = None
+    ) -> Dict[str, Dict[Any, int]]:
+        """Count documents per metadata value from the posting lists."""
+        self._ensure_metadata_index()
+        selection = self._filter_candidates(filter_metadata) if filter_metadata else None
+        return self.metadata_index.facet_counts(keys, selection, max_values or self.config.facet_max_values)
     
     async def delete_documents(self, document_ids: List[str]) -> None:
-        """Delete documents from FAISS index."""
-        # FAISS doesn't support deletion directly, so we'd need to rebuild the index
-        # For now, just remove from our document store
+        """Delete documents from memory store."""
         for doc_id in document_ids:
-            if doc_id in self.documents:
-                del self.documents[doc_id]
-            if doc_id in self.id_to_index:
-                idx = self.id_to_index[doc_id]
-                del self.id_to_index[doc_id]
-                if idx in self.index_to_id:
-                    del self.index_to_id[idx]
+            removed = self.table.remove(doc_id)
+            if removed is not None:
+                self.metadata_index.remove(*removed)
+        self.matrix.remove(document_ids)
         
-        logger.warning(f"Marked {len(document_ids)} documents for deletion (FAISS rebuild required)")
+        logger.info(f"Deleted {len(document_ids)} documents from memory store")
     
     async def get_document(self, document_id: str) -> Optional[VectorDocument]:
         """Get a specific document by ID."""
-        return self.documents.get(document_id)
+        return self.table.get(document_id)
     
     async def get_stats(self) -> Dict[str, Any]:
-        """Get FAISS index statistics."""
-        if not self.is_initialized:
-            await self.initialize()
-        
+        """Get memory store statistics."""
         return {
-            "store_type": "faiss",
-            "index_type": self.config.faiss_index_type,
-            "metric": self.config.faiss_metric,
-            "document_count": len(self.documents),
-            "index_size": self.index.ntotal if self.index else 0,
-            "embedding_dimension": self.config.embedding_dimension
+            "store_type": "memory",
+            "document_count": len(self.table),
+            "embeddings_count": len(self.matrix) + self.table.segment_live,
+            "segment_documents": self.table.segment_live,
+            "embedding_dimension": self.config.embedding_dimension,
+            "matrix_capacity": self.matrix.capacity,
+            "matrix_tombstones": self.matrix.tombstones,
+            "matrix_bytes": self.matrix.nbytes(),
+            "metadata_index": self.metadata_index.stats() if self._postings_loaded else None,
+            "documents": self.table.stats()
         }
     
-    async def _save_to_disk(self) -> None:
-        """Save FAISS index and metadata to disk."""
-        if not self.config.persist_directory:
-            return
-        
-        os.makedirs(self.config.persist_directory, exist_ok=True)
+    async def close(self) -> None:
+        """Close memory store, writing its documents to a segment if persistent."""
+        written = None
+        if self.config.persist_directory and (self.table.id_to_key or self.table.shadowed.any()):
+            os.makedirs(self.config.persist_directory, exist_ok=True)
+            written = self.segment_generation + 1
+            await asyncio.get_event_loop().run_in_executor(
+                None,
+                lambda: self.table.write_segment(
+                    self._segment_path(written),
+                    self.config.embedding_dimension,
+                    attributes={"next_key": self.next_key}
+                )
+            )
+            logger.info(f"Wrote memory store segment with {len(self.table)} documents")
         
-        # Save FAISS index
-        index_path = os.path.join(self.config.persist_directory, f"{self.config.collection_name}.index")
-        await asyncio.get_event_loop().run_in_executor(
-            None,
-            faiss.write_index,
-            self.index,
-            index_path
+        if self.content_store is not None:
+            self.content_store.close()
+            self.content_store = None
+        self.table = DocumentTable()
+        self.metadata_index.clear()
+        self._postings_loaded = True
+        self.matrix = EmbeddingMatrix(
+            self.config.embedding_dimension,
+            initial_capacity=self.config.memory_initial_capacity,
+            compaction_ratio=self.config.memory_compaction_ratio
         )
+        if written is not None:
+            # The previous generation is unmapped now that its table is gone
+            self.segment_generation = written
+            self._remove_segments_before(written)
+        self.is_initialized = False
+        logger.info("Memory vector store closed")
+
+
+class SegmentedVectorStore(BaseVectorStore):
+    """
+    Log-structured vector store: a mutable memtable over immutable segments.
+    
+    Writes go to a MemoryVectorStore memtable (and, when persisting, to a
+    write-ahead log). Once it holds segment_seal_rows documents it is sealed
+    into an exact (Flat) FAISSStore segment and a fresh memtable takes
+    over. Replacing or deleting a sealed document tombstones it in its
+    segment; sealed indexes are never modified otherwise.
+    
+    A background merger keeps the number of segments logarithmic in the
+    corpus size: whenever segment_merge_factor segments fall in the same
+    size tier, or one segment is more than segment_deleted_threshold
+    deleted, they are rewritten into a single segment without tombstones,
+    indexed by size (Flat up to segment_flat_max_rows, HNSW below
+    segment_ivf_min_rows, IVF beyond). Continuous ingestion therefore never
+    needs a full rebuild.
+    
+    Searches fan out to the memtable and every segment concurrently and
+    merge their top-k. Embeddings are stored unit-normalized and segments
+    use inner product, so all scores are cosine similarities. Seals and
+    merges build new segments outside the ReadWriteLock and only swap the
+    segment list under it.
+    """
+    
+    MANIFEST_FORMAT = 1
+    
+    def __init__(self, config: VectorStoreConfig):
+        super().__init__(config)
+        if not FAISS_AVAILABLE:
+            raise ImportError("FAISS is not available. Install with: pip install faiss-cpu")
         
-        # Save metadata
-        metadata_path = os.path.join(self.config.persist_directory, f"{self.config.collection_name}.pkl")
-        metadata = {
-            "documents": self.documents,
-            "id_to_index": self.id_to_index,
-            "index_to_id": self.index_to_id,
-            "next_index": self.next_index
-        }
+        self.memtable = self._new_memtable()
+        self.segments: List[FAISSStore] = []  # Oldest first
+        self.segment_rows: Dict[str, int] = {}  # Documents in each segment when it was written
+        self.next_segment = 1
+        
+        self.wal: Optional[WriteAheadLog] = None
+        self.sealed_sequence = 0  # Log sequence captured by the sealed segments
+        self._write_lock = asyncio.Lock()  # Serializes writers, seals and merge swaps
+        self._rw_lock = ReadWriteLock()  # Shared by searches, held alone to commit or swap segments
         
-        with open(metadata_path, 'wb') as f:
-            pickle.dump(metadata, f)
+        self._merge_task: Optional[asyncio.Task] = None
+        self._merging: List[FAISSStore] = []
+        self._merge_journal: Optional[Set[str]] = None  # Ids deleted from merge inputs meanwhile
+        self.seals = 0
+        self.merges = 0
     
-    async def _load_from_disk(self) -> None:
-        """Load FAISS index and metadata from disk."""
+    @property
+    def _directory(self) -> Optional[str]:
         if not self.config.persist_directory:
+            return None
+        return os.path.join(self.config.persist_directory, f"{self.config.collection_name}.lsm")
+    
+    def _new_memtable(self) -> MemoryVectorStore:
+        return MemoryVectorStore(self.config.model_copy(update={
+            "store_type": VectorStoreType.MEMORY,
+            "persist_directory": None
+        }))
+    
+    def _segment_config(self, name: str, index_type: str) -> VectorStoreConfig:
+        """
+        Config of one segment.
+        
+        Segments are built once by FAISSStore.bulk_load, which trains on the
+        whole input, so they keep no reservoir and never retrain or compact;
+        their log only records tombstones. Vector compression deliberately
+        carries over from the store config: segments hold nearly the whole
+        corpus, so that is where compression saves memory.
+        """
+        return self.config.model_copy(update={
+            "store_type": VectorStoreType.FAISS,
+            "persist_directory": self._directory,
+            "collection_name": name,
+            "faiss_index_type": index_type,
+            "faiss_metric": "IP",
+            "vector_compression": self.config.vector_compression,
+            "faiss_background_training": False,
+            "faiss_compaction_threshold": 2.0  # Never: the merger rewrites segments instead
+        })
+    
+    def _index_type_for(self, rows: int) -> str:
+        """Index for a segment of this many rows."""
+        if rows <= self.config.segment_flat_max_rows:
+            return "Flat"
+        if rows < self.config.segment_ivf_min_rows:
+            return "HNSW"
+        return "IVF"
+    
+    async def _open_segment(self, name: str, index_type: str) -> FAISSStore:
+        segment = FAISSStore(self._segment_config(name, index_type))
+        await segment.initialize()
+        return segment
+    
+    async def _write_segment(self, batches: Iterator[List[VectorDocument]], rows: int) -> FAISSStore:
+        """Build and checkpoint a new segment from batches of documents."""
+        name = f"seg-{self.next_segment:06d}"
+        self.next_segment += 1
+        segment = await self._open_segment(name, self._index_type_for(rows))
+        try:
+            await segment.bulk_load(batches)
+            await segment.checkpoint()
+        except BaseException:
+            await segment.drop()
+            raise
+        self.segment_rows[name] = len(segment.table)
+        return segment
+    
+    async def initialize(self) -> None:
+        """Open the sealed segments and replay the write-ahead log into the memtable."""
+        await self.memtable.initialize()
+        directory = self._directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            manifest_path = os.path.join(directory, "manifest.json")
+            if os.path.exists(manifest_path):
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                if manifest.get("format") != self.MANIFEST_FORMAT:
+                    raise ValueError(f"Unsupported segment manifest format {manifest.get('format')}")
+                for entry in manifest["segments"]:
+                    self.segments.append(await self._open_segment(entry["name"], entry["index_type"]))
+                    self.segment_rows[entry["name"]] = entry["rows"]
+                self.next_segment = manifest["next_segment"]
+                self.sealed_sequence = manifest["wal_sequence"]
+            self._remove_orphans()
+            
+            self.wal = WriteAheadLog(os.path.join(directory, "memtable.wal"), fsync=self.config.faiss_wal_fsync)
+            records = await asyncio.get_event_loop().run_in_executor(None, self.wal.open)
+            self.wal.sequence = max(self.wal.sequence, self.sealed_sequence)
+            replayed = 0
+            for header, payload in records:
+                if header["seq"] <= self.sealed_sequence:
+                    continue
+                if header["op"] == "add":
+                    await self._apply_add(self._decode_documents(header, payload))
+                else:
+                    await self._apply_delete(header["ids"])
+                replayed += 1
+            logger.info(
+                f"Opened segmented store with {len(self.segments)} segments "
+                f"and replayed {replayed} log records into the memtable"
+            )
+        
+        self.is_initialized = True
+        self._maybe_schedule_merge()
+        logger.info("Segmented vector store initialized")
+    
+    def _remove_orphans(self) -> None:
+        """Delete files of segments written but never published (crash during a seal or merge)."""
+        live = {segment.config.collection_name for segment in self.segments}
+        for name in os.listdir(self._directory):
+            if name.startswith("seg-") and name.split(".", 1)[0] not in live:
+                path = os.path.join(self._directory, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+    
+    def _write_manifest(self) -> None:
+        """Atomically publish the current segment list."""
+        if not self._directory:
             return
+        manifest = {
+            "format": self.MANIFEST_FORMAT,
+            "segments": [
+                {
+                    "name": segment.config.collection_name,
+                    "index_type": segment.config.faiss_index_type,
+                    "rows": self.segment_rows[segment.config.collection_name]
+                }
+                for segment in self.segments
+            ],
+            "next_segment": self.next_segment,
+            "wal_sequence": self.sealed_sequence
+        }
+        path = os.path.join(self._directory, "manifest.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        _fsync_path(self._directory)
+    
+    @staticmethod
+    def _encode_documents(documents: List[VectorDocument]) -> Tuple[Dict[str, Any], bytes]:
+        header = {
+            "op": "add",
+            "documents": [
+                {
+                    "id": doc.id,
+                    "content": doc.content,
+                    "metadata": doc.metadata,
+                    "created_at": doc.created_at.isoformat() if doc.created_at else None
+                }
+                for doc in documents
+            ]
+        }
+        return header, np.stack([doc.embedding for doc in documents]).astype(np.float32).tobytes()
+    
+    def _decode_documents(self, header: Dict[str, Any], payload: bytes) -> List[VectorDocument]:
+        embeddings = np.frombuffer(payload, dtype=np.float32).reshape(
+            len(header["documents"]), self.config.embedding_dimension
+        )
+        return [
+            VectorDocument(
+                id=entry["id"],
+                content=entry["content"],
+                metadata=entry["metadata"],
+                embedding=embeddings[i],
+                created_at=datetime.fromisoformat(entry["created_at"]) if entry.get("created_at") else None
+            )
+            for i, entry in enumerate(header["documents"])
+        ]
+    
+    async def add_documents(self, documents: List[VectorDocument]) -> None:
+        """
+        Add (or replace) documents.
         
-        index_path = os.path.join(self.config.persist_directory, f"{self.config.collection_name}.index")
-        metadata_path = os.path.join(self.config.persist_directory, f"{self.config.collection_name}.pkl")
+        Each batch of ingest_commit_batch_size documents is logged, then
+        committed to the memtable (tombstoning older versions in sealed
+        segments) atomically. The memtable is sealed whenever it fills up.
+        """
+        if not self.is_initialized:
+            await self.initialize()
         
-        if os.path.exists(index_path) and os.path.exists(metadata_path):
-            try:
-                # Load FAISS index
-                self.index = await asyncio.get_event_loop().run_in_executor(
+        missing = sum(1 for doc in documents if doc.embedding is None)
+        if missing:
+            raise ValueError(f"{missing} documents have no embedding; SegmentedVectorStore requires embeddings")
+        
+        # Later occurrences of an id within the call win
+        latest = {doc.id: doc for doc in documents}
+        documents = [
+            dataclasses.replace(doc, embedding=EmbeddingMatrix.normalize(doc.embedding)[0])
+            for doc in latest.values()
+        ]
+        
+        batch_size = max(1, self.config.ingest_commit_batch_size)
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start:start + batch_size]
+            async with self._write_lock:
+                if self.wal:
+                    header, payload = self._encode_documents(batch)
+                    await asyncio.get_event_loop().run_in_executor(None, self.wal.append, header, payload)
+                await self._apply_add(batch)
+            
+            if len(self.memtable.table) >= self.config.segment_seal_rows:
+                await self._seal()
+        
+        self._maybe_schedule_merge()
+        logger.info(f"Added {len(documents)} documents to segmented store")
+    
+    async def _apply_add(self, documents: List[VectorDocument]) -> None:
+        async with self._rw_lock.write():
+            await self._remove_from_segments([doc.id for doc in documents])
+            await self.memtable.add_documents(documents)
+    
+    async def _remove_from_segments(self, document_ids: List[str]) -> None:
+        """Tombstone documents in whichever sealed segments hold them."""
+        for segment in self.segments:
+            present = [doc_id for doc_id in document_ids if doc_id in segment.table]
+            if not present:
+                continue
+            await segment.delete_documents(present)
+            if self._merge_journal is not None and segment in self._merging:
+                self._merge_journal.update(present)
+    
+    async def delete_documents(self, document_ids: List[str]) -> None:
+        """Delete documents from the memtable and tombstone them in sealed segments."""
+        if not self.is_initialized:
+            await self.initialize()
+        
+        async with self._write_lock:
+            if self.wal:
+                await asyncio.get_event_loop().run_in_executor(
                     None,
-                    faiss.read_index,
-                    index_path
+                    self.wal.append,
+                    {"op": "delete", "ids": list(document_ids)}
                 )
-                
-                # Load metadata
-                with open(metadata_path, 'rb') as f:
-                    metadata = pickle.load(f)
-                
-                self.documents = metadata["documents"]
-                self.id_to_index = metadata["id_to_index"]
-                self.index_to_id = metadata["index_to_id"]
-                self.next_index = metadata["next_index"]
-                
-                logger.info(f"Loaded FAISS index with {len(self.documents)} documents")
-            except Exception as e:
-                logger.error(f"Error loading FAISS index: {e}")
+            await self._apply_delete(document_ids)
+        
+        self._maybe_schedule_merge()
+        logger.info(f"Deleted {len(document_ids)} documents from segmented store")
     
-    async def close(self) -> None:
-        """Close FAISS store."""
-        if self.config.persist_directory:
-            await self._save_to_disk()
+    async def _apply_delete(self, document_ids: List[str]) -> None:
+        async with self._rw_lock.write():
+            await self.memtable.delete_documents(document_ids)
+            await self._remove_from_segments(document_ids)
+    
+    async def _seal(self) -> None:
+        """Turn the memtable into a Flat segment and start a new one."""
+        async with self._write_lock:
+            memtable = self.memtable
+            if not len(memtable.table):
+                return
+            
+            table = memtable.table
+            document_ids = [document_id for document_id, _ in sorted(table.items(), key=lambda item: item[1])]
+            batch_size = max(1, self.config.ingest_commit_batch_size)
+            segment = await self._write_segment(
+                ([table.get(doc_id) for doc_id in document_ids[start:start + batch_size]]
+                 for start in range(0, len(document_ids), batch_size)),
+                len(document_ids)
+            )
+            
+            async with self._rw_lock.write():
+                self.segments.append(segment)
+                self.memtable = self._new_memtable()
+                await self.memtable.initialize()
+            await memtable.close()  # Releases its content store; no search can reach it now
+            
+            if self.wal:
+                self.sealed_sequence = self.wal.sequence
+                self._write_manifest()
+                self.wal.reset()
         
-        self.is_initialized = False
-        logger.info("FAISS store closed")
-
-
-class MemoryVectorStore(BaseVectorStore):
-    """Simple in-memory vector store implementation."""
+        self.seals += 1
+        logger.info(f"Sealed memtable into {segment.config.collection_name} ({len(document_ids)} documents)")
     
-    def __init__(self, config: VectorStoreConfig):
-        super().__init__(config)
-        self.documents = {}  # id -> VectorDocument mapping
-        self.embeddings = {}  # id -> embedding mapping
+    def _pick_merge(self) -> Optional[List[FAISSStore]]:
+        """Segments due for merging: one with too many tombstones, or a full size tier."""
+        for segment in self.segments:
+            written = self.segment_rows[segment.config.collection_name]
+            if written and 1 - len(segment.table) / written >= self.config.segment_deleted_threshold:
+                return [segment]
+        
+        factor = max(2, self.config.segment_merge_factor)
+        seal_rows = max(1, self.config.segment_seal_rows)
+        tiers: Dict[int, List[FAISSStore]] = {}
+        for segment in self.segments:
+            tier = int(math.log(max(len(segment.table), seal_rows) / seal_rows, factor))
+            tiers.setdefault(tier, []).append(segment)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= factor:
+                return sorted(tiers[tier], key=lambda segment: len(segment.table))[:factor]
+        return None
     
-    async def initialize(self) -> None:
-        """Initialize memory store."""
-        self.is_initialized = True
-        logger.info("Memory vector store initialized")
+    def _maybe_schedule_merge(self) -> None:
+        if self._merge_task is not None and not self._merge_task.done():
+            return
+        if self._pick_merge() is None:
+            return
+        self._merge_task = asyncio.ensure_future(self._run_merges())
     
-    async def add_documents(self, documents: List[VectorDocument]) -> None:
-        """Add documents to memory store."""
-        for doc in documents:
-            self.documents[doc.id] = doc
-            if doc.embedding is not None:
-                self.embeddings[doc.id] = doc.embedding
+    async def _run_merges(self) -> None:
+        while True:
+            inputs = self._pick_merge()
+            if inputs is None:
+                return
+            try:
+                await self.merge(inputs)
+            except Exception as e:
+                logger.error(f"Segment merge failed: {e}")
+                return
+    
+    async def merge(self, inputs: List[FAISSStore]) -> None:
+        """Rewrite segments as one, dropping their tombstones."""
+        rows = sum(len(segment.table) for segment in inputs)
+        self._merging = list(inputs)
+        self._merge_journal = set()
+        try:
+            output = None
+            if rows:
+                batch_size = max(1, self.config.ingest_commit_batch_size)
+                output = await self._write_segment(
+                    (batch for segment in inputs for batch in segment.export_documents(batch_size)),
+                    rows
+                )
+            
+            async with self._write_lock:
+                if output is not None and self._merge_journal:
+                    await output.delete_documents(list(self._merge_journal))
+                
+                async with self._rw_lock.write():
+                    position = self.segments.index(inputs[0])
+                    self.segments = [segment for segment in self.segments if segment not in inputs]
+                    if output is not None:
+                        self.segments.insert(min(position, len(self.segments)), output)
+                for segment in inputs:
+                    self.segment_rows.pop(segment.config.collection_name, None)
+                self._write_manifest()
+        finally:
+            self._merging = []
+            self._merge_journal = None
         
-        logger.info(f"Added {len(documents)} documents to memory store")
+        for segment in inputs:
+            await segment.drop()
+        self.merges += 1
+        logger.info(
+            f"Merged {len(inputs)} segments into "
+            f"{output.config.collection_name + ' (' + output.config.faiss_index_type + ')' if output else 'nothing'}: "
+            f"{rows} live documents"
+        )
     
     async def search(
         self,
@@ -644,91 +4441,148 @@ class MemoryVectorStore(BaseVectorStore):
         limit: int = None,
         filter_metadata: Optional[Dict[str, Any]] = None
     ) -> List[SearchResult]:
-        """Search memory store using cosine similarity."""
-        if not self.embeddings:
-            return []
+        """Search the memtable and every segment concurrently and merge their top-k."""
+        if not self.is_initialized:
+            await self.initialize()
         
         limit = limit or self.config.max_results
+        query = EmbeddingMatrix.normalize(query_embedding)[0]
+        async with self._rw_lock.read():
+            sources = [self.memtable, *self.segments]
+            partial = await asyncio.gather(*(
+                source.search(query, limit=limit, filter_metadata=filter_metadata) for source in sources
+            ))
+        return self._merge_results(partial, limit)
+    
+    async def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        limits: Union[int, List[Optional[int]], None] = None,
+        filters: Union[Dict[str, Any], List[Optional[Dict[str, Any]]], None] = None
+    ) -> List[List[SearchResult]]:
+        """Batch-search the memtable and every segment concurrently and merge per query."""
+        if not self.is_initialized:
+            await self.initialize()
         
-        # Calculate similarities
-        similarities = []
-        
-        for doc_id, doc_embedding in self.embeddings.items():
-            document = self.documents[doc_id]
-            
-            # Apply metadata filtering
-            if filter_metadata:
-                if not self._matches_filter(document.metadata, filter_metadata):
-                    continue
-            
-            # Calculate cosine similarity
-            similarity = self._cosine_similarity(query_embedding, doc_embedding)
-            
-            if similarity >= self.config.similarity_threshold:
-                similarities.append((doc_id, similarity))
-        
-        # Sort by similarity (descending)
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        
-        # Create search results
-        search_results = []
-        for rank, (doc_id, similarity) in enumerate(similarities[:limit]):
-            search_results.append(SearchResult(
-                document=self.documents[doc_id],
-                score=similarity,
-                rank=rank + 1
+        queries, limits, filters = self._batch_arguments(query_embeddings, limits, filters)
+        queries = EmbeddingMatrix.normalize(queries)
+        async with self._rw_lock.read():
+            sources = [self.memtable, *self.segments]
+            partial = await asyncio.gather(*(
+                source.search_batch(queries, limits=limits, filters=filters) for source in sources
             ))
+        return [
+            self._merge_results([results[i] for results in partial], limit)
+            for i, limit in enumerate(limits)
+        ]
+    
+    async def range_search(
+        self,
+        query_embedding: np.ndarray,
+        min_similarity: Optional[float] = None,
+        max_results: Optional[int] = None,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[SearchResult]:
+        """Range-search the memtable and every segment concurrently and merge."""
+        if not self.is_initialized:
+            await self.initialize()
         
-        logger.debug(f"Memory search returned {len(search_results)} results")
-        return search_results
+        query = EmbeddingMatrix.normalize(query_embedding)[0]
+        async with self._rw_lock.read():
+            sources = [self.memtable, *self.segments]
+            partial = await asyncio.gather(*(
+                source.range_search(query, min_similarity, max_results, filter_metadata) for source in sources
+            ))
+        return self._merge_results(partial, max_results or sum(len(results) for results in partial))
     
-    def _matches_filter(self, metadata: Dict[str, Any], filter_dict: Dict[str, Any]) -> bool:
-        """Check if document metadata matches filter criteria."""
-        for key, value in filter_dict.items():
-            if key not in metadata or metadata[key] != value:
-                return False
-        return True
+    @staticmethod
+    def _merge_results(partial: List[List[SearchResult]], limit: int) -> List[SearchResult]:
+        hits = sorted((result for results in partial for result in results), key=lambda result: result.score, reverse=True)
+        return [
+            SearchResult(document=result.document, score=result.score, rank=rank)
+            for rank, result in enumerate(hits[:limit], start=1)
+        ]
     
-    def _cosine_similarity(self, a: np.ndarray, b: np.ndarray) -> float:
-        """Calculate cosine similarity between two vectors."""
-        dot_product = np.dot(a, b)
-        norm_a = np.linalg.norm(a)
-        norm_b = np.linalg.norm(b)
-        
-        if norm_a == 0 or norm_b == 0:
-            return 0.0
+    async def facet_counts(
+        self,
+        keys: List[str],
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        max_values: Optional[int] = None
+    ) -> Dict[str, Dict[Any, int]]:
+        """Sum the memtable's and segments' facet counts."""
+        if not self.is_initialized:
+            await self.initialize()
         
-        return dot_product / (norm_a * norm_b)
-    
-    async def delete_documents(self, document_ids: List[str]) -> None:
-        """Delete documents from memory store."""
-        for doc_id in document_ids:
-            if doc_id in self.documents:
-                del self.documents[doc_id]
-            if doc_id in self.embeddings:
-                del self.embeddings[doc_id]
+        async with self._rw_lock.read():
+            partial = [
+                await source.facet_counts(keys, filter_metadata, max_values=sys.maxsize)
+                for source in [self.memtable, *self.segments]
+            ]
         
-        logger.info(f"Deleted {len(document_ids)} documents from memory store")
+        facets = {}
+        for key in keys:
+            counts: Dict[Any, int] = {}
+            for source_facets in partial:
+                for value, count in source_facets.get(key, {}).items():
+                    counts[value] = counts.get(value, 0) + count
+            facets[key] = _top_facets(counts, max_values or self.config.facet_max_values)
+        return facets
     
     async def get_document(self, document_id: str) -> Optional[VectorDocument]:
         """Get a specific document by ID."""
-        return self.documents.get(document_id)
+        document = self.memtable.table.get(document_id)
+        if document is not None:
+            return document
+        for segment in reversed(self.segments):
+            document = segment.table.get(document_id)
+            if document is not None:
+                return document
+        return None
     
     async def get_stats(self) -> Dict[str, Any]:
-        """Get memory store statistics."""
+        """Get segment, merge and concurrency statistics."""
+        segments = []
+        for segment in self.segments:
+            name = segment.config.collection_name
+            written = self.segment_rows.get(name, 0)
+            segments.append({
+                "name": name,
+                "index_type": segment.config.faiss_index_type,
+                "documents": len(segment.table),
+                "deleted_fraction": round(1 - len(segment.table) / written, 4) if written else 0.0
+            })
+        
         return {
-            "store_type": "memory",
-            "document_count": len(self.documents),
-            "embeddings_count": len(self.embeddings),
-            "embedding_dimension": self.config.embedding_dimension
+            "store_type": "segmented",
+            "document_count": len(self.memtable.table) + sum(len(segment.table) for segment in self.segments),
+            "memtable_documents": len(self.memtable.table),
+            "segments": segments,
+            "seals": self.seals,
+            "merges": self.merges,
+            "merge_running": self._merge_task is not None and not self._merge_task.done(),
+            "embedding_dimension": self.config.embedding_dimension,
+            "concurrency": self._rw_lock.stats()
         }
     
     async def close(self) -> None:
-        """Close memory store."""
-        self.documents.clear()
-        self.embeddings.clear()
+        """Finish merging, seal the memtable when persisting, and close every segment."""
+        if self._merge_task is not None and not self._merge_task.done():
+            await self._merge_task
+        if self._directory and len(self.memtable.table):
+            await self._seal()
+        
+        for segment in self.segments:
+            await segment.close()
+        await self.memtable.close()
+        if self.wal:
+            self.wal.close()
+            self.wal = None
+        
+        self.segments = []
+        self.segment_rows = {}
+        self.memtable = self._new_memtable()
         self.is_initialized = False
-        logger.info("Memory vector store closed")
+        logger.info("Segmented vector store closed")
 
 
 class VectorStoreManager:
@@ -751,6 +4605,13 @@ class VectorStoreManager:
                 return MemoryVectorStore(config)
             return FAISSStore(config)
         
+        elif config.store_type == VectorStoreType.SEGMENTED:
+            if not FAISS_AVAILABLE:
+                logger.warning("FAISS not available, falling back to memory store")
+                config.store_type = VectorStoreType.MEMORY
+                return MemoryVectorStore(config)
+            return SegmentedVectorStore(config)
+        
         else:  # MEMORY or fallback
             return MemoryVectorStore(config)
     
@@ -764,6 +4625,7 @@ class VectorStoreManager:
         
         if FAISS_AVAILABLE:
             available.append(VectorStoreType.FAISS)
+            available.append(VectorStoreType.SEGMENTED)
         
         return available
 
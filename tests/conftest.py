@@ -0,0 +1,6 @@
+"""Shared pytest setup: import the package from src/ rather than any installed or stale copy."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,82 @@
+"""Compiled, sentence-level BusinessRuleMatcher against the previous whole-pattern extraction loop."""
+
+import re
+
+import pytest
+
+nlp_processor = pytest.importorskip("jama_mcp_server.nlp_processor")
+BusinessRuleMatcher = nlp_processor.BusinessRuleMatcher
+
+SENTENCES = [
+    "If the applicant's credit score is below 620 then the application shall be referred for manual review.",
+    "The system must not approve loans whose debt-to-income ratio exceeds 43 percent.",
+    "When the appraisal is received, the underwriter shall update the loan-to-value ratio.",
+    "WHEN the rate lock expires THEN notify the borrower",
+    "The monthly payment is calculated as principal times rate divided by 12.",
+    "Total fees = origination fee + appraisal fee",
+    "The interest rate of the loan is fixed for the first 60 months.",
+    "Validate that the borrower's income documentation covers at least 24 months.",
+    "Provided that the down payment is at least 20 percent, mortgage insurance is not required.",
+    "According to policy 7 the lender requires two forms of identification.",
+    "The loan officer should be verified before the closing date.",
+    "In case of a rate lock expiry, the borrower may request an extension of 15 days.",
+    "Regulation requires that disclosures are sent within three days.",
+    "Compute the escrow balance using the annual tax estimate.",
+    "Users can export the pipeline report to a spreadsheet with 12 columns.",
+    "Prohibited actions include sharing credentials; a maximum of three attempts is allowed.",
+    "",
+]
+
+
+@pytest.fixture(scope="module")
+def patterns():
+    return nlp_processor.NLPProcessor()._load_business_rule_patterns()
+
+
+def legacy_matches(patterns, text):
+    """(rule type, matched text, groups) from every pattern searched over the whole text, as before."""
+    return [
+        (rule_type, match.group(0), match.groups())
+        for rule_type, pattern_infos in patterns.items()
+        for pattern_info in pattern_infos
+        for match in re.finditer(pattern_info["pattern"], text)
+    ]
+
+
+def compiled_matches(matcher, text):
+    return [(rule_type, match.group(0), match.groups()) for rule_type, _, match in matcher.matches(text)]
+
+
+@pytest.mark.parametrize("sentence", SENTENCES)
+def test_single_sentences_match_exactly_as_before(patterns, sentence):
+    assert compiled_matches(BusinessRuleMatcher(patterns), sentence) == legacy_matches(patterns, sentence)
+
+
+def test_multi_sentence_text_matches_each_sentence_as_before(patterns):
+    matcher = BusinessRuleMatcher(patterns)
+    text = " ".join(SENTENCES[:8]) + "\n" + "\n".join(SENTENCES[8:])
+
+    expected = [match for sentence in matcher.sentences(text) for match in legacy_matches(patterns, sentence)]
+    assert sorted(compiled_matches(matcher, text), key=repr) == sorted(expected, key=repr)
+
+
+@pytest.mark.parametrize("text", [
+    "a " * 300 + "=",
+    "x " * 300 + "must be",
+    "if x " * 100,
+    "when " * 100,
+    "calculate the rate using " * 18,
+])
+def test_adversarial_inputs_match_exactly_as_before(patterns, text):
+    text = text.strip()  # Sentences are stripped, so only trailing whitespace could differ
+    assert compiled_matches(BusinessRuleMatcher(patterns), text) == legacy_matches(patterns, text)
+
+
+def test_long_sentences_are_split_at_whitespace(patterns):
+    matcher = BusinessRuleMatcher(patterns, max_sentence_chars=50)
+    text = "word " * 40 + "x" * 120
+
+    pieces = matcher.sentences(text)
+    assert all(len(piece) <= 50 for piece in pieces)
+    assert " ".join(pieces[:4]) == ("word " * 40).strip()  # Cut at spaces
+    assert "".join(pieces[4:]) == "x" * 120  # A word longer than the limit is cut hard
@@ -0,0 +1,104 @@
+"""EmbeddingCache LRU and SQLite tiers, and invalidation when the model changes."""
+
+import numpy as np
+import pytest
+
+from jama_mcp_server.embedding_cache import EmbeddingCache, text_digest
+
+
+def vector(seed):
+    return np.random.default_rng(seed).standard_normal(8).astype(np.float32)
+
+
+def test_text_digest_normalizes_whitespace_only():
+    assert text_digest("  The system\n shall\tlog ") == text_digest("The system shall log")
+    assert text_digest("The system shall log") != text_digest("the system shall log")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = EmbeddingCache("model-a", memory_size=2)
+    cache.put("a", vector(1))
+    cache.put("b", vector(2))
+    assert cache.get("a") is not None  # "a" is now most recent
+    cache.put("c", vector(3))
+
+    assert cache.get("b") is None
+    np.testing.assert_array_equal(cache.get("a"), vector(1))
+    np.testing.assert_array_equal(cache.get("c"), vector(3))
+    stats = cache.get_stats()
+    assert (stats["memory_hits"], stats["misses"], stats["memory_entries"]) == (3, 1, 2)
+
+
+def test_returned_embeddings_are_copies():
+    cache = EmbeddingCache("model-a")
+    cache.put("a", vector(1))
+    cache.get("a")[:] = 0
+    np.testing.assert_array_equal(cache.get("a"), vector(1))
+
+
+def test_sqlite_tier_serves_misses_and_promotes_hits(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = EmbeddingCache("model-a", path=path, memory_size=1)
+    cache.put_many(["a", "b"], [vector(1), vector(2)])  # Only "b" stays in memory
+
+    results = cache.get_many(["a", "b", "a", "missing"])
+    np.testing.assert_array_equal(results[0], vector(1))
+    np.testing.assert_array_equal(results[1], vector(2))
+    np.testing.assert_array_equal(results[2], vector(1))
+    assert results[3] is None
+    stats = cache.get_stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"], stats["disk_entries"]) == (1, 2, 1, 2)
+    assert list(cache.memory) == [text_digest("a")]  # Disk hit promoted into the LRU
+    cache.close()
+
+    reopened = EmbeddingCache("model-a", path=path)
+    np.testing.assert_array_equal(reopened.get("b"), vector(2))
+    assert reopened.get_stats()["disk_hits"] == 1
+    reopened.close()
+
+
+def test_many_lookups_are_chunked(tmp_path):
+    cache = EmbeddingCache("model-a", path=str(tmp_path / "cache.db"), memory_size=0)
+    texts = [f"requirement {i}" for i in range(EmbeddingCache.LOOKUP_CHUNK * 2 + 7)]
+    cache.put_many(texts, [np.full(4, i, dtype=np.float32) for i in range(len(texts))])
+
+    results = cache.get_many(texts)
+    assert [int(result[0]) for result in results] == list(range(len(texts)))
+    assert cache.get_stats()["disk_hits"] == len(texts)
+    cache.close()
+
+
+def test_model_change_invalidates_persisted_embeddings(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = EmbeddingCache("model-a", path=path)
+    cache.put("a", vector(1))
+    cache.close()
+
+    other = EmbeddingCache("model-b", path=path)
+    assert other.get("a") is None
+    assert other.get_stats()["disk_entries"] == 0
+    other.put("a", vector(2))
+    other.close()
+
+    # Switching back does not resurrect the dropped rows
+    again = EmbeddingCache("model-a", path=path)
+    assert again.get("a") is None
+    again.close()
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    cache = EmbeddingCache("model-a", path=str(tmp_path / "cache.db"))
+    cache.put("a", vector(1))
+    cache.clear()
+
+    assert cache.get("a") is None
+    assert cache.get_stats()["disk_entries"] == 0
+    cache.close()
+
+
+@pytest.mark.parametrize("memory_size", [0, -1])
+def test_disabled_lru_keeps_nothing_in_memory(memory_size):
+    cache = EmbeddingCache("model-a", memory_size=memory_size)
+    cache.put("a", vector(1))
+    assert cache.get("a") is None
+    assert len(cache.memory) == 0
@@ -0,0 +1,106 @@
+"""EmbeddingMatrix scoring and top-k selection against brute-force cosine similarity."""
+
+import numpy as np
+import pytest
+
+from jama_mcp_server.vector_store import EmbeddingMatrix, MemoryVectorStore, VectorDocument, VectorStoreConfig
+
+DIMENSION = 16
+
+
+def brute_force(vectors, query, k):
+    """Ids and scores of the k most cosine-similar vectors, computed naively."""
+    scores = {
+        doc_id: float(np.dot(vector, query) / (np.linalg.norm(vector) * np.linalg.norm(query)))
+        for doc_id, vector in vectors.items()
+    }
+    return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+
+def matrix_top_k(matrix, query, k):
+    scores = matrix.scores(query)
+    rows = EmbeddingMatrix.top_k(scores, np.flatnonzero(matrix.alive[:matrix.size]), k)
+    return [(matrix.row_ids[row], float(scores[row])) for row in rows]
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(7)
+
+
+def test_top_k_matches_brute_force(rng):
+    vectors = {f"doc-{i}": rng.standard_normal(DIMENSION) for i in range(300)}
+    matrix = EmbeddingMatrix(DIMENSION, initial_capacity=8)
+    matrix.add(list(vectors), np.stack(list(vectors.values())))
+
+    for query in rng.standard_normal((10, DIMENSION)):
+        got = matrix_top_k(matrix, query, 10)
+        expected = brute_force(vectors, query, 10)
+        assert [doc_id for doc_id, _ in got] == [doc_id for doc_id, _ in expected]
+        np.testing.assert_allclose([s for _, s in got], [s for _, s in expected], rtol=1e-5)
+
+
+def test_replacements_and_deletes_stay_consistent(rng):
+    vectors = {f"doc-{i}": rng.standard_normal(DIMENSION) for i in range(200)}
+    matrix = EmbeddingMatrix(DIMENSION, initial_capacity=16, compaction_ratio=0.25)
+    matrix.add(list(vectors), np.stack(list(vectors.values())))
+
+    # Replace some rows, delete others (enough to trigger compaction)
+    for doc_id in list(vectors)[:30]:
+        vectors[doc_id] = rng.standard_normal(DIMENSION)
+    matrix.add(list(vectors)[:30], np.stack([vectors[doc_id] for doc_id in list(vectors)[:30]]))
+    deleted = list(vectors)[50:120]
+    assert matrix.remove(deleted + ["missing"]) == len(deleted)
+    for doc_id in deleted:
+        del vectors[doc_id]
+
+    assert len(matrix) == len(vectors)
+    assert matrix.tombstones < matrix.compaction_ratio * matrix.size + 1
+    for query in rng.standard_normal((5, DIMENSION)):
+        got = matrix_top_k(matrix, query, 15)
+        expected = brute_force(vectors, query, 15)
+        assert [doc_id for doc_id, _ in got] == [doc_id for doc_id, _ in expected]
+
+
+def test_last_occurrence_in_a_batch_wins(rng):
+    matrix = EmbeddingMatrix(DIMENSION)
+    first, second = rng.standard_normal((2, DIMENSION))
+    matrix.add(["a", "a"], np.stack([first, second]))
+
+    assert len(matrix) == 1
+    np.testing.assert_allclose(matrix.vectors[matrix.id_to_row["a"]], second / np.linalg.norm(second), rtol=1e-6)
+
+
+def test_scores_batch_matches_single_queries(rng):
+    matrix = EmbeddingMatrix(DIMENSION)
+    matrix.add([f"doc-{i}" for i in range(50)], rng.standard_normal((50, DIMENSION)))
+    matrix.remove(["doc-3", "doc-4"])
+    queries = rng.standard_normal((4, DIMENSION))
+
+    batch = matrix.scores_batch(queries)
+    for query, row in zip(queries, batch):
+        np.testing.assert_allclose(row, matrix.scores(query), atol=1e-6)
+
+
+def test_top_k_edge_cases():
+    scores = np.array([0.1, 0.9, 0.5])
+    rows = np.arange(3)
+    assert EmbeddingMatrix.top_k(scores, rows, 0).tolist() == []
+    assert EmbeddingMatrix.top_k(scores, rows, 10).tolist() == [1, 2, 0]
+    assert EmbeddingMatrix.top_k(scores, rows[:0], 3).tolist() == []
+
+
+@pytest.mark.asyncio
+async def test_memory_store_search_matches_brute_force(rng):
+    store = MemoryVectorStore(VectorStoreConfig(embedding_dimension=DIMENSION, similarity_threshold=-1.0))
+    await store.initialize()
+    vectors = {f"doc-{i}": rng.standard_normal(DIMENSION) for i in range(100)}
+    await store.add_documents([
+        VectorDocument(id=doc_id, content=doc_id, metadata={}, embedding=vector)
+        for doc_id, vector in vectors.items()
+    ])
+
+    query = rng.standard_normal(DIMENSION)
+    results = await store.search(query, limit=5)
+    assert [result.document.id for result in results] == [doc_id for doc_id, _ in brute_force(vectors, query, 5)]
+    await store.close()
@@ -0,0 +1,109 @@
+"""PostingList set algebra and MetadataIndex filtering and facet counts."""
+
+import numpy as np
+import pytest
+
+from jama_mcp_server.vector_store import MetadataIndex, PostingList, matches_filter
+
+
+def test_posting_list_packs_dense_lists_into_bitmaps():
+    posting = PostingList()
+    for item_id in range(0, 500, 2):
+        posting.add(item_id)
+    assert posting.dense
+    assert len(posting) == 250
+    assert 498 in posting and 499 not in posting
+
+    posting.discard(498)
+    posting.discard(499)
+    assert len(posting) == 249
+    assert posting.to_array().tolist() == list(range(0, 498, 2))
+
+
+def test_posting_list_stays_sparse_for_scattered_ids():
+    posting = PostingList({1, 100000, 5000000})
+    posting.add(42)
+    assert not posting.dense
+    assert posting.to_array().tolist() == [1, 42, 100000, 5000000]
+
+
+@pytest.mark.parametrize("left_dense", [False, True])
+@pytest.mark.parametrize("right_dense", [False, True])
+def test_union_and_intersection_match_sets(left_dense, right_dense):
+    rng = np.random.default_rng(left_dense * 2 + right_dense)
+
+    def make(dense):
+        ids = set(rng.choice(2000, size=1500 if dense else 40, replace=False).tolist())
+        return ids, PostingList(set(ids)) if not dense else PostingList(words=PostingList(set(ids)).bitmap())
+
+    left_ids, left = make(left_dense)
+    right_ids, right = make(right_dense)
+
+    assert set(PostingList.union([left, right]).to_array().tolist()) == left_ids | right_ids
+    assert set(left.intersection(right).to_array().tolist()) == left_ids & right_ids
+    assert left.intersection_count(right) == len(left_ids & right_ids)
+
+
+def build_index(rows):
+    index = MetadataIndex()
+    for item_id, metadata in enumerate(rows):
+        index.add(item_id, metadata)
+    return index
+
+
+ROWS = [
+    {"type": "functional", "priority": 1, "approved": True, "tags": ["a", "b"]},
+    {"type": "functional", "priority": 2, "approved": False, "tags": ["b"]},
+    {"type": "non_functional", "priority": 1, "approved": True, "tags": []},
+    {"type": "business_rule", "priority": 3.0, "approved": 1, "tags": ["c"]},
+    {"type": "functional", "priority": None, "approved": True},
+]
+
+
+@pytest.mark.parametrize("filter_dict", [
+    {"type": "functional"},
+    {"type": ["functional", "business_rule"]},
+    {"type": "functional", "priority": 1},
+    {"priority": 3},
+    {"priority": {"$gte": 2}},
+    {"approved": True},
+    {"approved": 1},
+    {"tags": "b"},
+    {"type": "functional", "tags": "a"},
+    {"type": "missing"},
+])
+def test_candidates_match_filter_semantics(filter_dict):
+    index = build_index(ROWS)
+    expected = [item_id for item_id, metadata in enumerate(ROWS) if matches_filter(metadata, filter_dict)]
+
+    candidates = index.candidates(filter_dict, lambda item_id: matches_filter(ROWS[item_id], filter_dict))
+    assert candidates.to_array().tolist() == expected
+
+
+def test_true_and_one_are_counted_as_distinct_facets():
+    index = build_index(ROWS)
+    facets = index.facet_counts(["type", "approved", "priority"])
+
+    assert facets["type"] == {"functional": 3, "business_rule": 1, "non_functional": 1}
+    assert facets["approved"] == {"true": 3, "1": 1, "false": 1}
+    assert facets["priority"] == {"1": 2, "2": 1, "3": 1, "null": 1}
+
+
+def test_facet_counts_within_a_selection_and_after_removal():
+    index = build_index(ROWS)
+    selection = PostingList({0, 1, 2})
+    assert index.facet_counts(["type"], selection) == {"type": {"functional": 2, "non_functional": 1}}
+
+    index.remove(0, ROWS[0])
+    facets = index.facet_counts(["type"], max_values=1)
+    assert facets == {"type": {"functional": 2}}
+
+
+def test_segment_postings_share_keys_with_raw_values():
+    index = MetadataIndex()
+    index.add_rows("priority", 1, np.array([0, 1]))  # As decoded from a segment's JSON
+    index.add(2, {"priority": 1.0})
+    index.add(3, {"priority": True})
+
+    assert index.candidates({"priority": 1}, lambda item_id: True).to_array().tolist() == [0, 1, 2]
+    assert index.facet_counts(["priority"]) == {"priority": {"1": 3, "true": 1}}
@@ -0,0 +1,106 @@
+"""SegmentWriter/Segment round trip, partial opens and checksum verification."""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from jama_mcp_server.segment import Segment, SegmentWriter
+
+DIMENSION = 4
+
+ROWS = [
+    ("REQ-1", 10, "The system shall log in users.", {"type": "functional", "priority": 1}),
+    ("REQ-2", 11, "", {"type": "functional", "tags": ["a", "b"]}),
+    ("REQ-3", 15, "Zusätzliche Prüfung ✓", {"type": "business_rule", "approved": True}),
+]
+
+
+@pytest.fixture
+def segment_path(tmp_path):
+    path = str(tmp_path / "seg")
+    rng = np.random.default_rng(0)
+    writer = SegmentWriter(path, len(ROWS), DIMENSION)
+    for document_id, key, content, metadata in ROWS:
+        created = datetime(2024, 1, key % 28 + 1, 12, 30)
+        writer.append(document_id, key, content, metadata, created_at=created, vector=rng.standard_normal(DIMENSION))
+    writer.close(attributes={"next_index": 16}, extras={"tombstones": np.array([3, 7], dtype=np.int64)})
+    return path
+
+
+def test_round_trip(segment_path):
+    segment = Segment(segment_path)
+    rng = np.random.default_rng(0)
+
+    assert len(segment) == len(ROWS)
+    assert segment.attributes == {"next_index": 16}
+    assert segment.extra("tombstones").tolist() == [3, 7]
+    assert segment.extra("missing") is None
+    for row, (document_id, key, content, metadata) in enumerate(ROWS):
+        vector = rng.standard_normal(DIMENSION).astype(np.float32)
+        assert segment.document_id(row) == document_id
+        assert segment.content(row) == content
+        assert segment.metadata(row) == metadata
+        assert segment.created(row) == datetime(2024, 1, key % 28 + 1, 12, 30)
+        np.testing.assert_array_equal(segment.vector(row), vector)
+        assert segment.norms[row] == pytest.approx(np.linalg.norm(vector), rel=1e-6)
+        assert segment.row_of_id(document_id) == row
+        assert segment.row_of_key(key) == row
+
+    assert segment.row_of_id("REQ-404") is None
+    assert segment.row_of_key(12) is None
+    assert segment.rows_of_keys(np.array([15, 10])).tolist() == [2, 0]
+
+
+def test_postings_by_json_value(segment_path):
+    postings = {(key, json.dumps(value)): rows.tolist() for key, value, rows in Segment(segment_path).postings()}
+    assert postings[("type", '"functional"')] == [0, 1]
+    assert postings[("type", '"business_rule"')] == [2]
+    assert postings[("approved", "true")] == [2]
+    assert postings[("tags", '["a", "b"]')] == [1]
+
+
+def test_partial_open_skips_content_and_vectors(segment_path):
+    segment = Segment(segment_path, content=False, vectors=False)
+    assert segment.document_id(0) == "REQ-1"
+    assert segment.metadata(2)["approved"] is True
+    assert segment.vector(0) is None
+    with pytest.raises(ValueError):
+        segment.content(0)
+
+
+def test_verify_detects_corruption(segment_path):
+    Segment(segment_path, verify=True)
+
+    with open(os.path.join(segment_path, "content.blob"), "r+b") as f:
+        f.write(b"X")
+    with pytest.raises(ValueError, match="content.blob"):
+        Segment(segment_path, verify=True)
+
+    os.remove(os.path.join(segment_path, "content.blob"))
+    with pytest.raises(ValueError, match="missing content.blob"):
+        Segment(segment_path, content=False).verify()
+
+
+def test_writer_rejects_out_of_order_keys_and_short_segments(tmp_path):
+    path = str(tmp_path / "seg")
+    writer = SegmentWriter(path, 2, DIMENSION, with_vectors=False)
+    writer.append("a", 5, "", {})
+    with pytest.raises(ValueError):
+        writer.append("b", 5, "", {})
+    with pytest.raises(ValueError):
+        writer.close()
+    writer.abort()
+    assert not os.path.exists(path) and not os.path.exists(writer.tmp_path)
+
+
+def test_empty_segment(tmp_path):
+    path = str(tmp_path / "seg")
+    SegmentWriter(path, 0, DIMENSION).close()
+
+    segment = Segment(path, verify=True)
+    assert len(segment) == 0
+    assert segment.row_of_id("anything") is None
+    assert list(segment.postings()) == []
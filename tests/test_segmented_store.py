@@ -0,0 +1,140 @@
+"""SegmentedVectorStore sealing, merging and visibility of replaced and deleted documents."""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from jama_mcp_server.vector_store import SegmentedVectorStore, VectorDocument, VectorStoreConfig
+
+DIMENSION = 8
+
+
+def make_config(directory=None, **overrides):
+    settings = dict(
+        store_type="segmented",
+        persist_directory=str(directory) if directory else None,
+        embedding_dimension=DIMENSION,
+        similarity_threshold=-1.0,
+        ingest_commit_batch_size=5,
+        segment_seal_rows=10,
+        segment_merge_factor=2,
+        faiss_wal_fsync=False
+    )
+    settings.update(overrides)
+    return VectorStoreConfig(**settings)
+
+
+def documents(vectors, start, count, version=0):
+    return [
+        VectorDocument(id=f"doc-{i}", content=f"text {i} v{version}", metadata={"n": i, "version": version},
+                       embedding=vectors[i])
+        for i in range(start, start + count)
+    ]
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(3).standard_normal((200, DIMENSION)).astype(np.float32)
+
+
+async def settle(store):
+    """Wait for background merges to finish."""
+    while store._merge_task is not None and not store._merge_task.done():
+        await store._merge_task
+
+
+async def visible_ids(store, vectors, count):
+    """Ids found as the nearest neighbour of their own vector (None where not found)."""
+    results = await store.search_batch(vectors[:count], limits=1)
+    return [hits[0].document.id if hits and hits[0].score > 0.999 else None for hits in results]
+
+
+@pytest.mark.asyncio
+async def test_seals_and_merges_keep_every_document_visible(vectors):
+    store = SegmentedVectorStore(make_config(segment_flat_max_rows=15))
+    await store.initialize()
+    await store.add_documents(documents(vectors, 0, 45))
+    await settle(store)
+
+    stats = await store.get_stats()
+    assert stats["document_count"] == 45
+    assert stats["seals"] == 4 and stats["merges"] >= 2
+    assert sum(segment["documents"] for segment in stats["segments"]) + stats["memtable_documents"] == 45
+    assert any(segment["index_type"] == "HNSW" for segment in stats["segments"])
+
+    assert await visible_ids(store, vectors, 45) == [f"doc-{i}" for i in range(45)]
+    for i in (0, 17, 44):
+        assert (await store.get_document(f"doc-{i}")).content == f"text {i} v0"
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_replaced_and_deleted_documents_are_invisible(vectors):
+    store = SegmentedVectorStore(make_config())
+    await store.initialize()
+    await store.add_documents(documents(vectors, 0, 25))  # Two segments and a memtable of 5
+    await settle(store)
+
+    await store.add_documents(documents(vectors, 3, 2, version=1))  # Replace sealed documents
+    await store.delete_documents(["doc-5", "doc-22", "missing"])  # One sealed, one in the memtable
+    await settle(store)
+
+    assert (await store.get_stats())["document_count"] == 23
+    assert await store.get_document("doc-5") is None
+    assert await store.get_document("doc-22") is None
+    assert (await store.get_document("doc-3")).content == "text 3 v1"
+
+    hits = await store.search(vectors[3], limit=25)
+    ids = [hit.document.id for hit in hits]
+    assert len(ids) == len(set(ids)) == 23
+    assert "doc-5" not in ids and "doc-22" not in ids
+    assert hits[0].document.id == "doc-3" and hits[0].document.metadata["version"] == 1
+
+    facets = await store.facet_counts(["version"])
+    assert facets["version"] == {"0": 21, "1": 2}
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_deletes_during_a_merge_are_applied_to_its_output(vectors):
+    store = SegmentedVectorStore(make_config(segment_merge_factor=8))  # No automatic merges
+    await store.initialize()
+    await store.add_documents(documents(vectors, 0, 30))
+    assert len(store.segments) == 3
+
+    merge = asyncio.ensure_future(store.merge(list(store.segments[:2])))
+    await asyncio.sleep(0)
+    await store.delete_documents(["doc-1", "doc-12"])
+    await merge
+
+    assert len(store.segments) == 2
+    assert await visible_ids(store, vectors, 30) == [
+        None if i in (1, 12) else f"doc-{i}" for i in range(30)
+    ]
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_persisted_store_reopens_after_close_and_after_a_crash(tmp_path, vectors):
+    store = SegmentedVectorStore(make_config(tmp_path))
+    await store.initialize()
+    await store.add_documents(documents(vectors, 0, 25))
+    await store.delete_documents(["doc-2"])
+    await store.close()
+
+    reopened = SegmentedVectorStore(make_config(tmp_path))
+    await reopened.initialize()
+    assert (await reopened.get_stats())["document_count"] == 24
+    # Crash after more writes: sealed segments come from the manifest, the rest from the log
+    await reopened.add_documents(documents(vectors, 25, 13))
+    await reopened.delete_documents(["doc-3", "doc-36"])
+    await settle(reopened)
+
+    recovered = SegmentedVectorStore(make_config(tmp_path))
+    await recovered.initialize()
+    await settle(recovered)
+    expected = [None if i in (2, 3, 36) else f"doc-{i}" for i in range(38)]
+    assert (await recovered.get_stats())["document_count"] == 35
+    assert await visible_ids(recovered, vectors, 38) == expected
+    await recovered.close()
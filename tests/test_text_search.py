@@ -0,0 +1,162 @@
+"""BM25 and SQLite FTS5 ranking, tokenization and reciprocal rank fusion."""
+
+import math
+
+import pytest
+
+from jama_mcp_server.text_search import (
+    FTS5_AVAILABLE,
+    BM25Index,
+    SQLiteFTSIndex,
+    TextDocument,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+
+DOCUMENTS = [
+    TextDocument("REQ-1", "The system shall encrypt stored passwords.", name="Password storage",
+                 metadata={"type": "security"}),
+    TextDocument("REQ-2", "Passwords expire after 90 days and passwords cannot be reused.",
+                 metadata={"type": "security"}),
+    TextDocument("REQ-3", "The loan officer reviews the credit report per 21.CFR.11.", metadata={"type": "business"}),
+    TextDocument("REQ-4", "Export the pipeline report to a spreadsheet.", tags="reporting",
+                 metadata={"type": "functional"}),
+]
+
+
+def test_tokenize_keeps_identifiers_whole_and_as_parts():
+    assert tokenize("See REQ-1042 and 21.CFR.11") == ["see", "req-1042", "req", "1042", "21.cfr.11", "21", "cfr", "11"]
+
+
+def reference_bm25(documents, query, k1=1.2, b=0.75):
+    """Okapi BM25 computed from scratch over whole documents."""
+    tokenized = {
+        document.id: tokenize(" ".join(p for p in (document.name, document.text, document.tags, document.rules) if p))
+        for document in documents
+    }
+    average_length = sum(len(terms) for terms in tokenized.values()) / len(tokenized)
+    scores = {}
+    for term in set(tokenize(query)):
+        df = sum(term in terms for terms in tokenized.values())
+        if not df:
+            continue
+        idf = math.log(1 + (len(tokenized) - df + 0.5) / (df + 0.5))
+        for document_id, terms in tokenized.items():
+            tf = terms.count(term)
+            if tf:
+                norm = k1 * (1 - b + b * len(terms) / average_length)
+                scores[document_id] = scores.get(document_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+@pytest.mark.parametrize("query", ["passwords", "credit report", "report spreadsheet", "21.CFR.11", "nothing"])
+def test_bm25_matches_reference_scores(query):
+    index = BM25Index()
+    index.add_documents(DOCUMENTS)
+
+    got = index.search(query, limit=10)
+    expected = reference_bm25(DOCUMENTS, query)
+    assert [document_id for document_id, _ in got] == [document_id for document_id, _ in expected]
+    assert [score for _, score in got] == pytest.approx([score for _, score in expected])
+
+
+def test_bm25_updates_statistics_incrementally():
+    index = BM25Index()
+    index.add_documents(DOCUMENTS)
+    index.add(TextDocument("REQ-4", "Passwords are hashed with a salt.", metadata={"type": "security"}))
+    assert index.remove("REQ-3")
+    assert not index.remove("REQ-3")
+
+    current = [DOCUMENTS[0], DOCUMENTS[1], TextDocument("REQ-4", "Passwords are hashed with a salt.")]
+    assert len(index) == 3
+    got = index.search("passwords report")
+    expected = reference_bm25(current, "passwords report")
+    assert [document_id for document_id, _ in got] == [document_id for document_id, _ in expected]
+    assert [score for _, score in got] == pytest.approx([score for _, score in expected])
+
+
+def test_bm25_filters_by_metadata():
+    index = BM25Index()
+    index.add_documents(DOCUMENTS)
+    hits = index.search("report", filter_metadata={"type": "functional"})
+    assert [document_id for document_id, _ in hits] == ["REQ-4"]
+    assert index.ids_matching({"type": "security"}) == ["REQ-1", "REQ-2"]
+
+
+requires_fts5 = pytest.mark.skipif(not FTS5_AVAILABLE, reason="SQLite built without FTS5")
+
+
+@pytest.fixture
+def fts_index(tmp_path):
+    index = SQLiteFTSIndex(str(tmp_path / "text.db"))
+    index.add_documents(DOCUMENTS)
+    yield index
+    index.close()
+
+
+@requires_fts5
+def test_fts_ranks_by_weighted_bm25(fts_index):
+    fts_index.add_documents([
+        TextDocument("A", "unrelated words here", name="audit trail"),
+        TextDocument("B", "audit trail words here"),
+    ])
+    hits = fts_index.search("audit")
+    assert [document_id for document_id, _ in hits] == ["A", "B"]  # Name matches weigh double
+    assert hits[0][1] > hits[1][1] > 0
+
+
+@requires_fts5
+def test_fts_matches_identifiers_and_ignores_operators(fts_index):
+    assert [document_id for document_id, _ in fts_index.search("21.CFR.11")] == ["REQ-3"]
+    assert fts_index.search('NOT passwords OR "') != []
+    assert fts_index.search("the and of") == []
+    assert fts_index.search("passwords", limit=0) == []
+
+
+@requires_fts5
+def test_fts_upserts_removes_and_filters(fts_index):
+    fts_index.add(TextDocument("REQ-4", "Passwords are hashed with a salt.", metadata={"type": "security"}))
+    assert fts_index.remove("REQ-1")
+    assert not fts_index.remove("REQ-1")
+
+    assert len(fts_index) == 3
+    assert {document_id for document_id, _ in fts_index.search("passwords")} == {"REQ-2", "REQ-4"}
+    assert [document_id for document_id, _ in fts_index.search("spreadsheet report")] == ["REQ-3"]  # REQ-4 replaced
+    hits = fts_index.search("passwords", filter_metadata={"type": "security"}, limit=1)
+    assert len(hits) == 1 and hits[0][0] in ("REQ-2", "REQ-4")
+    assert fts_index.ids_matching({"type": "business"}) == ["REQ-3"]
+
+
+@requires_fts5
+def test_fts_snippets_and_persistence(tmp_path):
+    path = str(tmp_path / "text.db")
+    index = SQLiteFTSIndex(path)
+    index.add_documents(DOCUMENTS)
+    snippets = index.snippets("credit", ["REQ-3", "REQ-1"])
+    assert list(snippets) == ["REQ-3"]
+    assert "**credit**" in snippets["REQ-3"]
+    index.close()
+
+    reopened = SQLiteFTSIndex(path)
+    assert len(reopened) == len(DOCUMENTS)
+    assert reopened.get_text("REQ-3") == DOCUMENTS[2].text
+    assert reopened.get_metadata("REQ-3") == {"type": "business"}
+    assert [document_id for document_id, _ in reopened.search("credit")] == ["REQ-3"]
+    reopened.close()
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion({"vector": ["a", "b", "c"], "keyword": ["c", "a"]}, k=60)
+    scores = dict(fused)
+
+    assert [item_id for item_id, _ in fused] == ["a", "c", "b"]
+    assert scores["a"] == pytest.approx(1 / 61 + 1 / 62)
+    assert scores["c"] == pytest.approx(1 / 63 + 1 / 61)
+    assert scores["b"] == pytest.approx(1 / 62)
+
+
+def test_reciprocal_rank_fusion_weights():
+    rankings = {"vector": ["a", "b"], "keyword": ["b", "a"]}
+    assert reciprocal_rank_fusion(rankings, weights={"keyword": 2.0})[0][0] == "b"
+    assert reciprocal_rank_fusion(rankings, weights={"keyword": 0.0}) == reciprocal_rank_fusion({"vector": ["a", "b"]})
+    assert reciprocal_rank_fusion({}) == []
@@ -0,0 +1,147 @@
+"""WriteAheadLog recovery and FAISSStore replay after a crash."""
+
+import os
+
+import numpy as np
+import pytest
+
+from jama_mcp_server.vector_store import FAISSStore, VectorDocument, VectorStoreConfig, WriteAheadLog
+
+DIMENSION = 8
+
+
+def write_records(path, count):
+    wal = WriteAheadLog(path, fsync=False)
+    assert wal.open() == []
+    for i in range(count):
+        wal.append({"op": "add", "n": i}, bytes([i]) * (i + 1))
+    wal.close()
+
+
+def test_records_round_trip_in_order(tmp_path):
+    path = str(tmp_path / "log.wal")
+    write_records(path, 5)
+
+    wal = WriteAheadLog(path, fsync=False)
+    records = wal.open()
+    assert [(header["n"], header["seq"], payload) for header, payload in records] == [
+        (i, i + 1, bytes([i]) * (i + 1)) for i in range(5)
+    ]
+    assert wal.append({"op": "delete"}) == 6  # Sequence numbers continue after reopening
+    wal.close()
+
+
+def test_torn_tail_is_truncated(tmp_path):
+    path = str(tmp_path / "log.wal")
+    write_records(path, 3)
+    intact_size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(WriteAheadLog.MAGIC + b"\x10\x00")  # Crash part way through the next prefix
+
+    wal = WriteAheadLog(path, fsync=False)
+    assert len(wal.open()) == 3
+    wal.close()
+    assert os.path.getsize(path) == intact_size
+
+
+def test_checksum_mismatch_drops_the_record_and_everything_after(tmp_path):
+    path = str(tmp_path / "log.wal")
+    write_records(path, 1)
+    first_size = os.path.getsize(path)
+    wal = WriteAheadLog(path, fsync=False)
+    wal.open()
+    for i in range(1, 4):
+        wal.append({"op": "add", "n": i}, b"payload")
+    wal.close()
+
+    # Flip one byte inside the second record
+    with open(path, "r+b") as f:
+        f.seek(first_size + WriteAheadLog._PREFIX.size + 20)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    wal = WriteAheadLog(path, fsync=False)
+    records = wal.open()
+    wal.close()
+    assert [header["n"] for header, _ in records] == [0]
+    assert os.path.getsize(path) == first_size
+
+
+def test_reset_discards_records(tmp_path):
+    path = str(tmp_path / "log.wal")
+    wal = WriteAheadLog(path, fsync=False)
+    wal.open()
+    wal.append({"op": "add"}, b"x")
+    wal.reset()
+    assert wal.size_bytes() == 0
+    wal.close()
+
+    assert WriteAheadLog(path, fsync=False).open() == []
+
+
+def make_config(directory):
+    return VectorStoreConfig(
+        store_type="faiss",
+        persist_directory=str(directory),
+        embedding_dimension=DIMENSION,
+        faiss_wal_fsync=False
+    )
+
+
+def documents(rng, start, count):
+    return [
+        VectorDocument(id=f"doc-{i}", content=f"text {i}", metadata={"n": i}, embedding=rng.standard_normal(DIMENSION))
+        for i in range(start, start + count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_faiss_store_replays_the_log_after_a_crash(tmp_path):
+    rng = np.random.default_rng(0)
+    store = FAISSStore(make_config(tmp_path))
+    await store.initialize()
+    await store.add_documents(documents(rng, 0, 20))
+    await store.checkpoint()
+    await store.add_documents(documents(rng, 20, 5))
+    await store.delete_documents(["doc-3", "doc-21"])
+    replaced = documents(rng, 4, 1)[0]
+    replaced.content = "replaced"
+    await store.add_documents([replaced])
+    # Crash: the store is never closed, and the last append is torn
+    with open(store.wal.path, "ab") as f:
+        f.write(WriteAheadLog.MAGIC)
+
+    recovered = FAISSStore(make_config(tmp_path))
+    await recovered.initialize()
+    assert len(recovered.table) == 23
+    assert await recovered.get_document("doc-3") is None
+    assert await recovered.get_document("doc-21") is None
+    assert (await recovered.get_document("doc-4")).content == "replaced"
+    assert (await recovered.get_document("doc-24")).metadata == {"n": 24}
+
+    results = await recovered.search(replaced.embedding, limit=1)
+    assert results[0].document.id == "doc-4"
+    await recovered.close()
+
+
+@pytest.mark.asyncio
+async def test_faiss_store_ignores_a_corrupted_last_record(tmp_path):
+    rng = np.random.default_rng(1)
+    store = FAISSStore(make_config(tmp_path))
+    await store.initialize()
+    await store.add_documents(documents(rng, 0, 10))
+    size_before = store.wal.size_bytes()
+    await store.add_documents(documents(rng, 10, 1))
+
+    with open(store.wal.path, "r+b") as f:
+        f.seek(size_before + WriteAheadLog._PREFIX.size + 4)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    recovered = FAISSStore(make_config(tmp_path))
+    await recovered.initialize()
+    assert len(recovered.table) == 10
+    assert await recovered.get_document("doc-10") is None
+    await recovered.close()